@@ -0,0 +1,103 @@
+import io
+import time
+import uuid
+from decimal import Decimal
+
+from core.models import Coupon
+from django.core.management import BaseCommand
+from django.utils import timezone
+from django.utils.translation import gettext as _
+from exchange.services import load_rates
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+import registar.settings as settings
+from api.parsers import FastJSONParser
+from api.renderers import FastJSONRenderer, orjson
+from api.serializers import CouponSerializer
+
+
+class Command(BaseCommand):
+    """
+    Benchmarks the fast JSON renderer and parser against the ones of DRF.
+    """
+    help = _(
+        'Compares the throughput of the JSON renderers and parsers on pages of coupons as represented by the '
+        'serializers, and on the rows of values() with UUIDs, decimals and datetimes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--coupons", type=int, default=1000, help=_("Number of coupons of every page."))
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=20,
+            help=_("How many times every page is rendered and parsed, the best time is reported."),
+        )
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING("orjson is not installed, the fast renderer uses the json module."))
+
+        coupons = self._coupons(options["coupons"])
+        context = {"currency": settings.EXCHANGE_RATE_DEFAULT_CURRENCY, "rates": load_rates()}
+        payloads = {
+            "serialized": {
+                "next": "http://localhost/en/api/coupons/?cursor=cD0yMDI0LTA2LTAx",
+                "previous": None,
+                "results": CouponSerializer(coupons, many=True, context=context).data,
+            },
+            "values": [
+                {field: getattr(coupon, field) for field in ("id", "title", "barcode", "amount", "store_id", "date_added")}
+                for coupon in coupons
+            ],
+        }
+        repeat = max(options["repeat"], 1)
+
+        for name, payload in payloads.items():
+            self.stdout.write(f"==== { name } ====")
+            content = JSONRenderer().render(payload)
+            runs = {
+                "render drf": lambda: JSONRenderer().render(payload),
+                "render fast": lambda: FastJSONRenderer().render(payload),
+                "parse drf": lambda: JSONParser().parse(io.BytesIO(content)),
+                "parse fast": lambda: FastJSONParser().parse(io.BytesIO(content)),
+            }
+
+            for run_name, run in runs.items():
+                best = min(self._time(run) for _run in range(repeat))
+
+                self.stdout.write(
+                    f"{ run_name:12} { best * 1000:8.2f} ms { len(content) / best / 2 ** 20:8.1f} MiB/s "
+                    f"{ len(coupons) / best:10.0f} coupons/s"
+                )
+
+            if FastJSONRenderer().render(payload) != content:
+                self.stdout.write(self.style.ERROR(f"The rendered { name } differ."))
+
+    @staticmethod
+    def _time(run) -> float:
+        start = time.perf_counter()
+        run()
+        return time.perf_counter() - start
+
+    @staticmethod
+    def _coupons(count: int) -> list[Coupon]:
+        now = timezone.now()
+        stores = [uuid.uuid4() for _store in range(20)]
+
+        return [
+            Coupon(
+                id=uuid.uuid4(),
+                title=f"Coupon { index }",
+                barcode=f"{ index:014d}",
+                amount=Decimal(index % 50 + 1) / 4,
+                store_id=stores[index % len(stores)],
+                owner_id=1,
+                is_used=index % 3 == 0,
+                is_shared=index % 10 == 1,
+                date_added=now - timezone.timedelta(minutes=index),
+                date_modified=now,
+            )
+            for index in range(count)
+        ]
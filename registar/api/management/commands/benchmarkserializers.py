@@ -0,0 +1,100 @@
+import time
+import uuid
+
+from benchmarks.factory import DatasetSize, seed
+from core.models import Coupon, Shop
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.utils.translation import gettext as _
+from exchange.services import load_rates
+from rest_framework.renderers import JSONRenderer
+
+import registar.settings as settings
+from api.serializers import (CouponSerializer, MarketplaceSerializer,
+                             ValuesListSerializer, values_converters)
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    """
+    Benchmarks the `values()` fast path of the API lists against the model serializers.
+    """
+    help = _(
+        'Compares the timings of the coupon and marketplace lists represented by the model serializers and by '
+        'the rows of values(), on generated data, which is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--page-sizes",
+            type=int,
+            nargs="+",
+            default=[10, 100, 1000],
+            help=_("Numbers of objects represented at once."),
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help=_("How many times every page is represented, the best time is reported."),
+        )
+
+    def handle(self, *args, **options):
+        page_sizes = options["page_sizes"]
+
+        try:
+            with transaction.atomic():
+                size = max(page_sizes)
+                dataset = seed(
+                    DatasetSize(users=10, shops=10, coupons=size, groups=1, marketplace=size),
+                    prefix=f"benchmark-{ uuid.uuid4().hex[:8] }",
+                )
+                self._compare(dataset.user, page_sizes, max(options["repeat"], 1))
+                raise Rollback()
+
+        except Rollback:
+            pass
+
+    def _compare(self, user, page_sizes, repeat):
+        context = {"currency": settings.EXCHANGE_RATE_DEFAULT_CURRENCY, "rates": load_rates()}
+        lists = {
+            "coupons": (CouponSerializer, Coupon.objects.filter(owner=user)),
+            "marketplace": (MarketplaceSerializer, Shop.objects.filter(is_on_marketplace=True)),
+        }
+        renderer = JSONRenderer()
+
+        for name, (serializer_class, queryset) in lists.items():
+            self.stdout.write(f"==== { name } ====")
+
+            for page_size in page_sizes:
+                page = queryset.order_by("-date_added", "-id")[:page_size]
+                runs = {
+                    "serializer": lambda: renderer.render(serializer_class(list(page.all()), many=True, context=context).data),
+                    "values": lambda: renderer.render(self._values(serializer_class(context=context), page, context)),
+                }
+                results = {}
+
+                for run_name, run in runs.items():
+                    best = None
+
+                    for _run in range(repeat):
+                        start = time.perf_counter()
+                        results[run_name] = run()
+                        elapsed = time.perf_counter() - start
+                        best = elapsed if best is None else min(best, elapsed)
+
+                    self.stdout.write(f"{ page_size:6} { run_name:10} { best * 1000:8.2f} ms")
+
+                if results["values"] != results["serializer"]:
+                    self.stdout.write(self.style.ERROR(f"The { name } differ at page size { page_size }."))
+
+    @staticmethod
+    def _values(child, page, context):
+        converters = values_converters(child)
+        lookups = {lookup for _name, lookup, _convert in converters if lookup is not None}
+        rows = list(page.values(*lookups))
+
+        return ValuesListSerializer(rows, child=child, converters=converters, context=context).data
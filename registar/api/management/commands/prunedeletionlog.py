@@ -0,0 +1,24 @@
+import datetime
+
+from django.core.management import BaseCommand
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+import registar.settings as settings
+from api.models import DeletionLog
+
+
+class Command(BaseCommand):
+    """
+    Deletes the tombstones the sync no longer sends.
+    """
+    help = _(
+        'Deletes the deletion log entries older than SYNC_DELETION_LOG_DAYS, clients with older sync tokens '
+        'download everything again.'
+    )
+
+    def handle(self, *args, **options):
+        date = timezone.now() - datetime.timedelta(days=settings.SYNC_DELETION_LOG_DAYS)
+        count, _deleted = DeletionLog.objects.filter(date_deleted__lt=date).delete()
+
+        self.stdout.write(f"Deleted { count } deletion log entries.\n")
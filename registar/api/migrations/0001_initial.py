@@ -0,0 +1,37 @@
+# Generated by Django 5.0.6 on 2026-10-17 15:35
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('core', '0014_keyset_indexes'),
+        ('groups', '0013_invitation_date_modified'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletionLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('coupons', 'coupon'), ('shops', 'shop'), ('groups', 'group'), ('invitations', 'invitation')], max_length=20, verbose_name='kind')),
+                ('object_id', models.CharField(max_length=36, verbose_name='object id')),
+                ('date_deleted', models.DateTimeField(default=django.utils.timezone.now, verbose_name='deleted at')),
+                ('group', models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='groups.group', verbose_name='group')),
+                ('shop', models.ForeignKey(db_constraint=False, db_index=False, help_text='the shop whose coupons or groups changed', null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.shop', verbose_name='shop')),
+                ('user', models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='user')),
+            ],
+            options={
+                'verbose_name': 'deletion log',
+                'verbose_name_plural': 'deletion logs',
+                'indexes': [models.Index(fields=['user', 'date_deleted'], name='deletionlog_user_idx'), models.Index(fields=['group', 'date_deleted'], name='deletionlog_group_idx'), models.Index(fields=['date_deleted'], name='deletionlog_date_idx')],
+            },
+        ),
+    ]
@@ -1,3 +1,41 @@
+from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
 
-# Create your models here.
+
+class DeletionLog(models.Model):
+    """
+    An object that was deleted or is no longer visible to some users, sent to them by the sync as a tombstone.
+
+    The tombstone is for the `user` or for the members of the `group`, and for the coupons also for the users
+    who get the tombstone of their `shop`. The `group` and the `shop` changed, they are sent again to the users
+    who still see them. The references are not constrained, the logged objects are gone and the rows outlive
+    the users and groups that are deleted later.
+    """
+
+    class Kind(models.TextChoices):
+        COUPON = "coupons", _("coupon")
+        SHOP = "shops", _("shop")
+        GROUP = "groups", _("group")
+        INVITATION = "invitations", _("invitation")
+
+    kind            = models.CharField(max_length=20, choices=Kind.choices, verbose_name=_('kind'))
+    object_id       = models.CharField(max_length=36, verbose_name=_('object id'))
+    user            = models.ForeignKey(get_user_model(), on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, null=True, related_name='+', verbose_name=_('user'))
+    group           = models.ForeignKey('groups.Group', on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, null=True, related_name='+', verbose_name=_('group'))
+    shop            = models.ForeignKey('core.Shop', on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, null=True, related_name='+', verbose_name=_('shop'), help_text=_("the shop whose coupons or groups changed"))
+    date_deleted    = models.DateTimeField(default=timezone.now, verbose_name=_('deleted at'))
+
+    class Meta:
+        verbose_name = _('deletion log')
+        verbose_name_plural = _('deletion logs')
+
+        indexes = [
+            models.Index(fields=['user', 'date_deleted'], name='deletionlog_user_idx'),
+            models.Index(fields=['group', 'date_deleted'], name='deletionlog_group_idx'),
+            models.Index(fields=['date_deleted'], name='deletionlog_date_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f"{ self.kind } { self.object_id }"
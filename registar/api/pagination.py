@@ -0,0 +1,105 @@
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+from rest_framework.response import Response
+
+SEPARATOR = "|"
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Paginates on a unique `(date, id)` key instead of offsets. A page is one index range scan after the last
+    object of the previous page, so deep pages are as fast as the first one, and objects added in the
+    meantime do not shift the pages.
+
+    The total is not counted, unless the client asks for it with `?count=true`.
+    """
+    ordering = ("-date_added", "-id")
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    count_query_param = "count"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+        self.count = queryset.count() if request.query_params.get(self.count_query_param) in ("1", "true") else None
+
+        reverse = self.cursor is not None and self.cursor.reverse
+        ordering = self.ordering if not reverse else [self._flip(field) for field in self.ordering]
+        queryset = queryset.order_by(*ordering)
+
+        if self.cursor is not None:
+            try:
+                queryset = queryset.filter(self._after(self.cursor.position, ordering))
+            except (ValidationError, ValueError) as exc:
+                raise NotFound(self.invalid_cursor_message) from exc
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        position = self._get_position_from_instance(self.page[-1], self.ordering) if self.page else self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+
+        position = self._get_position_from_instance(self.page[0], self.ordering) if self.page else self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def get_paginated_response(self, data):
+        response = {"next": self.get_next_link(), "previous": self.get_previous_link(), "results": data}
+
+        if self.count is not None:
+            response = {"count": self.count, **response}
+
+        return Response(response)
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+
+        if cursor is not None and (cursor.offset or SEPARATOR not in (cursor.position or "")):
+            raise NotFound(self.invalid_cursor_message)
+
+        return cursor
+
+    def _get_position_from_instance(self, instance, ordering):
+        return SEPARATOR.join(str(self._get_value(instance, field.lstrip("-"))) for field in ordering)
+
+    @staticmethod
+    def _get_value(instance, field: str):
+        # The lists on the fast path paginate the rows of `values()`.
+        return instance[field] if isinstance(instance, dict) else getattr(instance, field)
+
+    def _after(self, position: str, ordering) -> Q:
+        """
+        Returns the condition of the objects following the position in the ordering.
+        """
+        (date_field, date), (id_field, pk) = zip((field.lstrip("-") for field in ordering), position.split(SEPARATOR, 1))
+        lookup = "lt" if ordering[0].startswith("-") else "gt"
+
+        return Q(**{f"{ date_field }__{ lookup }": date}) | Q(**{date_field: date, f"{ id_field }__{ lookup }": pk})
+
+    @staticmethod
+    def _flip(field: str) -> str:
+        return field[1:] if field.startswith("-") else f"-{ field }"
+
+
+class InvitationPagination(KeysetPagination):
+    ordering = ("-date_sent", "-id")
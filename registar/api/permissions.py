@@ -7,10 +7,7 @@ class IsMemberOrOwnerShop(permissions.BasePermission):
     """
 
     def has_object_permission(self, request, view, obj):
-        is_owner = obj.owner == request.user
-        is_member = obj.groups.filter(members=request.user.pk).exists()
-
-        return is_owner or is_member
+        return obj.is_visible_to(request.user)
 
 
 class IsMemberOrOwnerCoupon(permissions.BasePermission):
@@ -19,10 +16,7 @@ class IsMemberOrOwnerCoupon(permissions.BasePermission):
     """
 
     def has_object_permission(self, request, view, obj):
-        is_owner = obj.owner == request.user
-        is_member = obj.store.groups.filter(members=request.user.pk).exists()
-
-        return is_owner or is_member
+        return obj.is_visible_to(request.user)
 
 
 class IsMemberOrOwnerGroup(permissions.BasePermission):
@@ -31,10 +25,7 @@ class IsMemberOrOwnerGroup(permissions.BasePermission):
     """
 
     def has_object_permission(self, request, view, obj):
-        is_owner = obj.owner == request.user
-        is_member = obj.members.all().filter(pk=request.user.pk).exists()
-
-        return is_owner or is_member
+        return obj.is_visible_to(request.user)
 
 
 class IsRequestUser(permissions.BasePermission):
@@ -52,7 +43,7 @@ class IsSenderOrRecipient(permissions.BasePermission):
     """
 
     def has_object_permission(self, request, view, obj):
-        return obj.sender == request.user or obj.recipient == request.user
+        return request.user.pk in (obj.sender_id, obj.recipient_id)
 
 
 class IsOnMarketplace(permissions.BasePermission):
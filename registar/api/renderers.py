@@ -0,0 +1,37 @@
+from rest_framework import renderers
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Aware datetimes in UTC end with "Z", dictionary keys are converted to strings, like the encoder of DRF.
+ORJSON_OPTIONS = 0 if orjson is None else orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """
+    Renders JSON with orjson if it is installed, with the output of the JSON renderer of DRF. UUIDs,
+    datetimes, lists and dictionaries are encoded by orjson itself, other types like lazy translations and
+    decimals by the encoder of DRF. Decimal fields are already strings in the representation of the
+    serializers.
+
+    Indented output, as in the browsable API, is rendered by the JSON renderer of DRF.
+    """
+    encoder = encoders.JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if data is None:
+            return b''
+
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=self.encoder.default, option=ORJSON_OPTIONS)
+
+        # Escaped like the JSON renderer of DRF, so the output is a strict subset of JavaScript.
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
@@ -1,43 +1,315 @@
+import datetime
+import functools
+
 from core.models import Coupon, Shop
 from django.contrib.auth import get_user_model
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.db.models import Prefetch
+from django.utils import timezone
+from exchange.services import get_rates
 from groups.models import Group, Invitation
-from rest_framework import permissions, serializers
+from rest_framework import ISO_8601, permissions, serializers
+from rest_framework.fields import SkipField
+from rest_framework.relations import (ManyRelatedField, PKOnlyObject,
+                                      PrimaryKeyRelatedField)
+from rest_framework.settings import api_settings
+
+import registar.settings as settings
+
+
+class CurrencyField(serializers.Field):
+    """
+    The currency the converted amounts are in, taken from the serializer context.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(source="*", read_only=True, **kwargs)
+
+    def to_representation(self, value):
+        return self.context.get("currency", settings.EXCHANGE_RATE_DEFAULT_CURRENCY)
+
+
+class ConvertedAmountField(CurrencyField):
+    """
+    An amount converted into the currency from the serializer context, with the rates from the context.
+    The views look the rates up once per request, so converting a page adds no queries.
+    """
+
+    def __init__(self, field: str, **kwargs):
+        self.field = field
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return self.convert(getattr(value, self.field))
+
+    def convert(self, amount):
+        rates = self.context["rates"] if "rates" in self.context else get_rates()
+        converted = rates.convert(amount or 0, super().to_representation(None))
+
+        return None if converted is None else str(converted)
+
+
+def selected_fields(names, query_params) -> list[str] | None:
+    """
+    Returns the names of the fields selected with `?fields=` and not excluded with `?omit=`, in the order of
+    `names`, or None if the request selects no fields.
+    """
+    if "fields" not in query_params and "omit" not in query_params:
+        return None
+
+    selected, omitted = (
+        {name.strip() for name in query_params.get(param, "").split(",") if name.strip()} for param in ("fields", "omit")
+    )
+    unknown = (selected | omitted).difference(names)
+
+    if unknown:
+        raise serializers.ValidationError({"fields": f"Unknown fields: { ', '.join(sorted(unknown)) }."})
+
+    return [name for name in names if (not selected or name in selected) and name not in omitted]
+
+
+class SparseFieldsMixin:
+    """
+    Represents only the fields selected in the request of the context, see `selected_fields()`, unless
+    `sparse_fields` is false in the context.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        sparse = request is not None and self.context.get("sparse_fields", True)
+        fields = selected_fields(self.fields, request.query_params) if sparse else None
+
+        for name in set(self.fields).difference(self.fields if fields is None else fields):
+            self.fields.pop(name)
+
+
+class CompactListSerializer(serializers.ListSerializer):
+    """
+    Represents every object as an array of the values of its fields, in the order of `field_names`, so the
+    names are not repeated for every object.
+    """
+
+    @property
+    def field_names(self) -> list[str]:
+        return [field.field_name for field in self.child._readable_fields]
+
+    def to_representation(self, data):
+        fields = list(self.child._readable_fields)
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+
+        return [[self._value(field, item) for field in fields] for item in iterable]
+
+    @staticmethod
+    def _value(field, instance):
+        try:
+            attribute = field.get_attribute(instance)
+        except SkipField:
+            return None
+
+        value = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+
+        return None if value is None else field.to_representation(attribute)
+
+
+class ValuesListSerializer(CompactListSerializer):
+    """
+    Represents the rows of a `values()` queryset as the child represents the objects, byte for byte, with
+    the converters of `values_converters()`. No model is instantiated and no field is walked per object.
+    """
+
+    def __init__(self, *args, converters: list[tuple], compact: bool = False, **kwargs):
+        self.converters = converters
+        self.compact = compact
+        super().__init__(*args, **kwargs)
+
+    def to_representation(self, data):
+        rows = (
+            [(name, _convert_row(lookup, convert, row)) for name, lookup, convert in self.converters] for row in data
+        )
+
+        if self.compact:
+            return [[value for _name, value in row] for row in rows]
+        return [dict(row) for row in rows]
+
 
+def values_converters(serializer, annotations=()) -> list[tuple] | None:
+    """
+    Returns the name, the `values()` lookup and the converter of every field of the serializer, or None if
+    a field does not read a column or one of the `annotations`. The converters take the value of the column,
+    None is kept. Fields without lookup are constant, their converter takes no value.
+    """
+    model = serializer.Meta.model
+    converters = []
 
-class UserSerializer(serializers.ModelSerializer):
+    for field in serializer._readable_fields:
+        if isinstance(field, ConvertedAmountField):
+            lookup, convert = field.field, field.convert
+        elif isinstance(field, CurrencyField):
+            lookup, convert = None, functools.partial(field.to_representation, None)
+        elif isinstance(field, (ManyRelatedField, serializers.BaseSerializer)):
+            return None
+        else:
+            lookup, convert = field.source, _converter(field)
+
+        if lookup is not None and lookup not in annotations and not _is_column(model, lookup):
+            return None
+
+        converters.append((field.field_name, lookup, convert))
+
+    return converters
+
+
+def _is_column(model, name: str) -> bool:
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return False
+
+    return field.concrete and not field.many_to_many
+
+
+def _converter(field):
+    """
+    Returns a function doing what `field.to_representation()` does to the value of the column.
+    """
+    output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+
+    if isinstance(field, serializers.UUIDField) and field.uuid_format == "hex_verbose":
+        return str
+    if isinstance(field, serializers.DateTimeField) and isinstance(output_format, str) and output_format.lower() == ISO_8601:
+        return functools.partial(_isoformat, getattr(field, "timezone", field.default_timezone()))
+    if isinstance(field, (serializers.CharField, serializers.BooleanField, serializers.IntegerField, serializers.ReadOnlyField)):
+        return _identity
+    if isinstance(field, PrimaryKeyRelatedField) and field.pk_field is None:
+        return _identity
+    return field.to_representation
+
+
+def _convert_row(lookup, convert, row):
+    if lookup is None:
+        return convert()
+
+    value = row[lookup]
+    return None if value is None else convert(value)
+
+
+def _isoformat(field_timezone, value) -> str:
+    if field_timezone is None:
+        value = timezone.make_naive(value, datetime.timezone.utc) if timezone.is_aware(value) else value
+    else:
+        value = value.astimezone(field_timezone) if timezone.is_aware(value) else timezone.make_aware(value, field_timezone)
+
+    value = value.isoformat()
+    return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+
+def _identity(value):
+    return value
+
+
+class EagerLoadingMixin:
+    """
+    Declares the relations the serializer reads, so the views load them with the objects instead of
+    running queries per object.
+    """
+    select_related = ()
+    prefetch_related = ()
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, fields: list[str] | None = None, required=()):
+        """
+        Loads the relations of the fields, or of all fields if None. If fields are selected, only the columns
+        they read and the `required` ones are fetched.
+        """
+        if fields is None:
+            sources = None
+        else:
+            declared = cls().fields
+            sources = {_source(declared[name]) for name in fields}
+            queryset = queryset.only(*cls._columns(queryset.model, sources | set(required)))
+
+        select_related = [lookup for lookup in cls.select_related if sources is None or _root(lookup) in sources]
+        prefetch_related = [lookup for lookup in cls.prefetch_related if sources is None or _root(lookup) in sources]
+
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
+
+    @staticmethod
+    def _columns(model, sources) -> list[str]:
+        columns = [model._meta.pk.name]
+
+        for source in sources:
+            try:
+                field = model._meta.get_field(source)
+            except FieldDoesNotExist:
+                continue
+
+            if field.concrete and not field.many_to_many:
+                columns.append(field.name)
+
+        return columns
+
+
+def _source(field) -> str:
+    return field.field if isinstance(field, ConvertedAmountField) else field.source.split(".")[0]
+
+
+def _root(lookup) -> str:
+    return (lookup.prefetch_through if isinstance(lookup, Prefetch) else lookup).split("__")[0]
+
+
+class UserSerializer(SparseFieldsMixin, EagerLoadingMixin, serializers.ModelSerializer):
     class Meta:
         model = get_user_model()
-        fields = ['id', 'username', 'first_name', 'last_name', 'email', 'password', 'date_joined', 'last_login', 'is_active', 'is_staff', 'is_superuser']
+        fields = ['id', 'username', 'first_name', 'last_name', 'email', 'date_joined', 'last_login', 'is_active', 'is_staff', 'is_superuser']
 
 
-class ShopSerializer(serializers.ModelSerializer):
-    owner = serializers.ReadOnlyField(source='owner.pk')
+class ShopSerializer(SparseFieldsMixin, EagerLoadingMixin, serializers.ModelSerializer):
+    owner = serializers.ReadOnlyField(source='owner_id')
     groups = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+    amount_unused = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    amount_unused_converted = ConvertedAmountField("amount_unused")
+    currency = CurrencyField()
+
+    prefetch_related = (Prefetch('groups', queryset=Group.objects.only('pk')),)
 
     class Meta:
         model = Shop
-        fields = ['id', 'title', 'groups', 'is_pinned', 'is_on_marketplace', 'owner', 'date_added', 'date_modified']
+        fields = ['id', 'title', 'groups', 'is_pinned', 'is_on_marketplace', 'amount_unused', 'amount_unused_converted', 'currency', 'owner', 'date_added', 'date_modified']
         permisions = [permissions.IsAuthenticated]
 
 
-class CouponSerializer(serializers.ModelSerializer):
-    owner = serializers.ReadOnlyField(source='owner.pk')
+class CouponSerializer(SparseFieldsMixin, EagerLoadingMixin, serializers.ModelSerializer):
+    owner = serializers.ReadOnlyField(source='owner_id')
+    amount_converted = ConvertedAmountField("amount")
+    currency = CurrencyField()
 
     class Meta:
         model = Coupon
-        fields = ['id', 'title', 'barcode', 'is_used', 'is_pinned', 'is_shared', 'amount', 'store', 'owner', 'date_added', 'date_modified']
+        fields = ['id', 'title', 'barcode', 'is_used', 'is_pinned', 'is_shared', 'amount', 'amount_converted', 'currency', 'store', 'owner', 'date_added', 'date_modified']
 
 
-class GroupSerializer(serializers.ModelSerializer):
+class GroupSerializer(SparseFieldsMixin, EagerLoadingMixin, serializers.ModelSerializer):
     members = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
-    invitations = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+    invitations = serializers.PrimaryKeyRelatedField(source='invitation_set', many=True, read_only=True)
+
+    prefetch_related = (
+        Prefetch('members', queryset=get_user_model().objects.only('pk')),
+        Prefetch('shops', queryset=Shop.objects.only('pk')),
+        Prefetch('invitation_set', queryset=Invitation.objects.only('pk', 'group')),
+    )
 
     class Meta:
         model = Group
         fields = ['id', 'title', 'is_pinned', 'owner', 'members', 'invitations', 'access_password', 'shops', 'date_added', 'date_modified']
 
 
-class InvitationSerializer(serializers.ModelSerializer):
+class InvitationSerializer(SparseFieldsMixin, EagerLoadingMixin, serializers.ModelSerializer):
     class Meta:
         model = Invitation
         fields = ['id', 'group', 'sender', 'recipient', 'is_accepted', 'is_processed', 'date_sent', 'date_accepted', 'date_rejected']
@@ -45,6 +317,8 @@ class InvitationSerializer(serializers.ModelSerializer):
 
 
 class MarketplaceSerializer(ShopSerializer):
+    prefetch_related = ()
+
     class Meta:
         model = Shop
         fields = ['id', 'title', 'owner', 'date_added', 'date_modified']
@@ -0,0 +1,81 @@
+from core.models import Coupon, Shop
+from core.signals import deleted_in_cascade
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import receiver
+from groups.models import Group, GroupMembership, Invitation, ShopGroup
+
+from .models import DeletionLog
+
+Kind = DeletionLog.Kind
+
+# Every deletion is logged with one insert, except the coupons deleted with their shop or owner, which are
+# logged with one bulk insert per shop or owner on pre_delete. Who gets the tombstones of the coupons and shops
+# that are no longer shared is resolved by the sync, see `api.sync.tombstones()`.
+
+
+def log(kind: str, object_id, **audience):
+    DeletionLog.objects.create(kind=kind, object_id=str(object_id), **audience)
+
+
+def log_coupons(coupons):
+    DeletionLog.objects.bulk_create(
+        DeletionLog(kind=Kind.COUPON, object_id=str(pk), user_id=owner_id, shop_id=store_id)
+        for pk, owner_id, store_id in coupons.values_list("pk", "owner", "store")
+    )
+
+
+@receiver(post_delete, sender=Coupon)
+def log_deleted_coupon(sender, instance, origin=None, **kwargs):
+    if deleted_in_cascade(origin, Coupon):
+        return
+
+    log(Kind.COUPON, instance.pk, user_id=instance.owner_id, shop_id=instance.store_id)
+
+
+@receiver(pre_delete, sender=Shop)
+def log_deleted_shop_coupons(sender, instance, **kwargs):
+    log_coupons(Coupon.objects.filter(store=instance))
+
+
+@receiver(pre_delete, sender=get_user_model())
+def log_deleted_owner_coupons(sender, instance, **kwargs):
+    """
+    Logs the coupons of the deleted user in the shops of other users, the coupons in the shops of the user
+    are logged by `log_deleted_shop_coupons`.
+    """
+    log_coupons(Coupon.objects.filter(owner=instance).exclude(store__owner=instance))
+
+
+@receiver(post_delete, sender=Shop)
+def log_deleted_shop(sender, instance, **kwargs):
+    log(Kind.SHOP, instance.pk, user_id=instance.owner_id, shop_id=instance.pk)
+
+
+@receiver(post_delete, sender=Group)
+def log_deleted_group(sender, instance, **kwargs):
+    log(Kind.GROUP, instance.pk, user_id=instance.owner_id, group_id=instance.pk)
+
+
+@receiver(post_delete, sender=Invitation)
+def log_deleted_invitation(sender, instance, **kwargs):
+    DeletionLog.objects.bulk_create(
+        DeletionLog(kind=Kind.INVITATION, object_id=str(instance.pk), user_id=user_id, group_id=instance.group_id)
+        for user_id in {instance.sender_id, instance.recipient_id}
+    )
+
+
+@receiver(post_delete, sender=ShopGroup)
+def log_removed_shop(sender, instance, **kwargs):
+    """
+    Logs the shop for the members of the group it was removed from.
+    """
+    log(Kind.SHOP, instance.shop_id, group_id=instance.group_id, shop_id=instance.shop_id)
+
+
+@receiver(post_delete, sender=GroupMembership)
+def log_removed_member(sender, instance, **kwargs):
+    """
+    Logs the group for the member who left it or was removed from it.
+    """
+    log(Kind.GROUP, instance.group_id, user_id=instance.user_id, group_id=instance.group_id)
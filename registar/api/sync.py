@@ -0,0 +1,139 @@
+import datetime
+from typing import NamedTuple
+
+from core.models import Coupon, Shop
+from django.core import signing
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+from groups.models import Group, GroupMembership, Invitation, ShopGroup
+
+import registar.settings as settings
+
+from .models import DeletionLog
+
+SALT = "api.sync"
+
+Kind = DeletionLog.Kind
+
+
+class Changes(NamedTuple):
+    """
+    The objects visible to a user that were created or changed since the watermark, and the tombstones of
+    the objects the user no longer sees. If `reset`, they are all the visible objects and the client drops
+    the objects it did not get.
+    """
+    coupons: QuerySet
+    shops: QuerySet
+    groups: QuerySet
+    invitations: QuerySet
+    deleted: dict[str, list[str]]
+    reset: bool
+
+
+def make_token(watermark: datetime.datetime) -> str:
+    return signing.dumps(watermark.isoformat(), salt=SALT)
+
+
+def read_token(token: str) -> datetime.datetime:
+    """
+    Returns the watermark of the token, raises `signing.BadSignature` if it was not made by `make_token`.
+    """
+    return datetime.datetime.fromisoformat(signing.loads(token, salt=SALT))
+
+
+def next_watermark(start: datetime.datetime) -> datetime.datetime:
+    return start - datetime.timedelta(seconds=settings.SYNC_WATERMARK_LAG)
+
+
+def visible(user) -> dict[str, QuerySet]:
+    """
+    Returns the objects visible to the user by the kind of the deletion log.
+    """
+    return {
+        "coupons": Coupon.objects.visible_to(user),
+        "shops": Shop.objects.visible_to(user).with_amount_unused(),
+        "groups": Group.objects.visible_to(user),
+        "invitations": Invitation.objects.filter(Q(sender=user) | Q(recipient=user)),
+    }
+
+
+def changes(user, since: datetime.datetime | None) -> Changes:
+    """
+    Returns the changes of the objects visible to the user since the watermark, everything if it is None or
+    older than the deletion log.
+    """
+    querysets = visible(user)
+
+    if since is None or since < timezone.now() - datetime.timedelta(days=settings.SYNC_DELETION_LOG_DAYS):
+        return Changes(**querysets, deleted={kind: [] for kind in Kind.values}, reset=True)
+
+    logged = DeletionLog.objects.filter(date_deleted__gt=since)
+    joined = GroupMembership.objects.filter(user=user, date_joined__gt=since).values("group")
+    # The shops shared since the watermark with a group of the user, or in a group the user joined since.
+    shared = ShopGroup.objects.filter(Q(date_added__gt=since) | Q(group__in=joined))
+
+    return Changes(
+        coupons=querysets["coupons"].filter(Q(date_modified__gt=since) | Q(store__in=shared.values("shop"))),
+        shops=querysets["shops"].filter(
+            Q(date_modified__gt=since)
+            | Q(pk__in=shared.values("shop"))
+            # The unused amount and the groups of the shops.
+            | Q(pk__in=Coupon.objects.filter(date_modified__gt=since).values("store"))
+            | Q(pk__in=logged.filter(shop__isnull=False).values("shop"))
+        ),
+        groups=querysets["groups"].filter(
+            Q(date_modified__gt=since)
+            | Q(pk__in=joined)
+            # The members, shops and invitations of the groups.
+            | Q(pk__in=GroupMembership.objects.filter(date_joined__gt=since).values("group"))
+            | Q(pk__in=ShopGroup.objects.filter(date_added__gt=since).values("group"))
+            | Q(pk__in=Invitation.objects.filter(date_modified__gt=since).values("group"))
+            | Q(pk__in=logged.filter(group__isnull=False).values("group"))
+        ),
+        invitations=querysets["invitations"].filter(date_modified__gt=since),
+        deleted=tombstones(user, logged, querysets),
+        reset=False,
+    )
+
+
+def tombstones(user, logged: QuerySet, querysets: dict[str, QuerySet]) -> dict[str, list[str]]:
+    """
+    Returns the ids of the logged objects the user does not see, which were logged for the user, for the
+    groups the user is or was a member of or, for coupons, for the shops the user sees. The coupons of the
+    logged shops are added, and the shops of the groups the user left. Objects the user still sees through
+    another group are not sent.
+    """
+    # The groups the user left since the watermark. The members of a deleted group are removed first.
+    left = logged.filter(kind=Kind.GROUP, user=user).values("group")
+    rows = (
+        logged.filter(
+            Q(user=user)
+            | Q(group__in=querysets["groups"].values("pk"))
+            | Q(group__in=left)
+            | Q(kind=Kind.COUPON, shop__in=querysets["shops"].values("pk"))
+        )
+        .exclude(~Q(user=user), kind=Kind.INVITATION)
+        .values_list("kind", "object_id")
+        .distinct()
+    )
+    object_ids = {kind: set() for kind in Kind.values}
+
+    for kind, object_id in rows:
+        object_ids[kind].add(object_id)
+
+    object_ids["shops"].update(str(pk) for pk in ShopGroup.objects.filter(group__in=left).values_list("shop", flat=True))
+
+    if object_ids["shops"]:
+        shops = list(object_ids["shops"])
+        object_ids["coupons"].update(logged.filter(kind=Kind.COUPON, shop__in=shops).values_list("object_id", flat=True))
+        object_ids["coupons"].update(str(pk) for pk in Coupon.objects.filter(store__in=shops).values_list("pk", flat=True))
+
+    deleted = {}
+
+    for kind, ids in object_ids.items():
+        if ids:
+            ids -= {str(pk) for pk in querysets[kind].filter(pk__in=ids).values_list("pk", flat=True)}
+
+        deleted[kind] = sorted(ids)
+
+    return deleted
@@ -1,3 +1,588 @@
-from django.test import TestCase
+import datetime
+import io
+import json
+import uuid
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from benchmarks.factory import DatasetSize, seed
+from core.models import Coupon, Shop
+from core.tests import TEST_CACHES
+from groups.models import Group, Invitation
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone, translation
+from django.utils.translation import gettext_lazy
+from exchange.services import RATES_CACHE_KEY, RateTable
+from rest_framework import parsers, renderers
+from rest_framework.exceptions import ParseError
+
+import registar.settings as settings
+
+from . import sync
+from .parsers import FastJSONParser
+from .renderers import FastJSONRenderer
+from .serializers import ValuesListSerializer
+
+
+@override_settings(CACHES=TEST_CACHES)
+class KeysetPaginationTests(TestCase):
+    """
+    Tests of the pagination of the API list views on `(date_added, id)`.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initgroups", "--nooutput")
+
+        cls.user = get_user_model().objects.create_user(username="user", password="password")
+        shop = Shop.objects.create(title="Shop", owner=cls.user)
+        Coupon.objects.bulk_create(
+            Coupon(barcode=str(index), amount=Decimal("1.00"), store=shop, owner=cls.user) for index in range(25)
+        )
+
+        # Half of the coupons share the date, so only the id orders them.
+        now = timezone.now()
+        Coupon.objects.filter(pk__in=Coupon.objects.order_by("pk").values("pk")[:12]).update(date_added=now)
+
+        cls.expected = [
+            str(pk) for pk in Coupon.objects.order_by("-date_added", "-id").values_list("pk", flat=True)
+        ]
+
+    def setUp(self):
+        translation.activate("en")
+        self.addCleanup(translation.deactivate)
+        cache.set(RATES_CACHE_KEY, RateTable({"USD": Decimal("1.08")}, timezone.now()), None)
+        self.client.force_login(self.user)
+
+    def pages(self, url: str, direction: str) -> list[dict]:
+        pages = []
+
+        while url:
+            pages.append(self.client.get(url).json())
+            url = pages[-1][direction]
+
+        return pages
+
+    def test_forward_and_back(self):
+        pages = self.pages(reverse("api:coupon_list") + "?page_size=10", "next")
+
+        self.assertEqual([len(page["results"]) for page in pages], [10, 10, 5])
+        self.assertEqual([coupon["id"] for page in pages for coupon in page["results"]], self.expected)
+        self.assertNotIn("count", pages[0])
+        self.assertIsNone(pages[0]["previous"])
+
+        back = self.pages(pages[-1]["previous"], "previous")
+
+        self.assertEqual([page["results"] for page in back], [page["results"] for page in reversed(pages[:-1])])
+
+    def test_count(self):
+        response = self.client.get(reverse("api:coupon_list"), {"count": "true"})
+
+        self.assertEqual(response.json()["count"], 25)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse("api:coupon_list"), {"cursor": "invalid"})
+
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class EagerLoadingTests(TestCase):
+    """
+    Tests that the API lists run the same number of queries whatever the page size.
+    """
+    views = ["api:shop_list", "api:coupon_list", "api:group_list", "api:invitation_list", "api:marketplace_list"]
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initgroups", "--nooutput")
+
+        cls.dataset = seed(DatasetSize(users=5, shops=10, coupons=20, groups=10, marketplace=10))
+
+    def setUp(self):
+        translation.activate("en")
+        self.addCleanup(translation.deactivate)
+        cache.set(RATES_CACHE_KEY, RateTable({"USD": Decimal("1.08")}, timezone.now()), None)
+        self.client.force_login(self.dataset.user)
+
+    def queries(self, url: str, page_size: int) -> int:
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, {"page_size": page_size})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["results"]), page_size)
+
+        return len(context.captured_queries)
+
+    def test_lists(self):
+        for view in self.views:
+            with self.subTest(view):
+                self.assertEqual(self.queries(reverse(view), 1), self.queries(reverse(view), 5))
+
+    def test_group_detail(self):
+        response = self.client.get(reverse("api:group_detail", kwargs={"pk": self.dataset.group.pk}))
+
+        self.assertEqual(len(response.json()["members"]), 5)
+        self.assertEqual(len(response.json()["shops"]), 10)
+        self.assertEqual(len(response.json()["invitations"]), 5)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SparseFieldsTests(TestCase):
+    """
+    Tests of the field selection and the compact representation of the API.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initgroups", "--nooutput")
+
+        cls.dataset = seed(DatasetSize(users=2, shops=2, coupons=4, groups=2, marketplace=2))
+
+    def setUp(self):
+        translation.activate("en")
+        self.addCleanup(translation.deactivate)
+        cache.set(RATES_CACHE_KEY, RateTable({"USD": Decimal("1.08")}, timezone.now()), None)
+        self.client.force_login(self.dataset.user)
+
+    def test_fields(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse("api:coupon_list"), {"fields": "id,amount_converted,title"})
+
+        self.assertEqual([list(coupon) for coupon in response.json()["results"]], [["id", "title", "amount_converted"]] * 4)
+        self.assertFalse(any("barcode" in query["sql"] for query in context.captured_queries))
+
+    def test_omit(self):
+        response = self.client.get(reverse("api:group_list"), {"omit": "members,shops,invitations"})
+        group = response.json()["results"][0]
+
+        self.assertNotIn("members", group)
+        self.assertIn("title", group)
+
+    def test_unknown_field(self):
+        response = self.client.get(reverse("api:shop_list"), {"fields": "id,unknown"})
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_detail(self):
+        url = reverse("api:invitation_detail", kwargs={"pk": self.dataset.invitation.pk})
+
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+
+        with self.assertNumQueries(len(context.captured_queries)):
+            response = self.client.get(url, {"fields": "group"})
+
+        self.assertEqual(response.json(), {"group": str(self.dataset.invitation.group_id)})
+
+    def test_compact(self):
+        url = reverse("api:shop_list")
+        shops = self.client.get(url).json()["results"]
+        compact = self.client.get(url, {"compact": "true"}).json()
+
+        self.assertEqual([dict(zip(compact["fields"], values)) for values in compact["results"]], shops)
+
+        compact = self.client.get(url, {"compact": "true", "fields": "id,title"}).json()
+
+        self.assertEqual(compact["fields"], ["id", "title"])
+        self.assertEqual(compact["results"], [[shop["id"], shop["title"]] for shop in shops])
+
+    def test_user_password(self):
+        response = self.client.get(reverse("api:user_detail", kwargs={"pk": self.dataset.user.pk}))
+
+        self.assertNotIn("password", response.json())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ValuesFastPathTests(TestCase):
+    """
+    Tests that the lists on the `values()` fast path render the same bytes as the model serializers.
+    """
+    views = ["api:coupon_list", "api:invitation_list", "api:marketplace_list"]
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initgroups", "--nooutput")
+
+        cls.dataset = seed(DatasetSize(users=3, shops=3, coupons=12, groups=2, marketplace=12))
+        Coupon.objects.filter(pk=cls.dataset.coupon.pk).update(title=None)
+
+    def setUp(self):
+        translation.activate("en")
+        self.addCleanup(translation.deactivate)
+        cache.set(RATES_CACHE_KEY, RateTable({"USD": Decimal("1.08")}, timezone.now()), None)
+        self.client.force_login(self.dataset.user)
+
+    def get(self, url: str, **params) -> bytes:
+        with mock.patch("api.views.ValuesListSerializer", wraps=ValuesListSerializer) as serializer:
+            fast = self.client.get(url, params)
+
+        self.assertTrue(serializer.called)
+
+        with mock.patch("api.views.values_converters", return_value=None):
+            slow = self.client.get(url, params)
+
+        self.assertEqual(fast.content, slow.content)
+        return fast.content
+
+    def test_identical(self):
+        for view in self.views:
+            for params in ({}, {"currency": "USD"}, {"compact": "true"}, {"fields": "id"}):
+                with self.subTest(view, **params):
+                    self.get(reverse(view), **params)
+
+    def test_next_page(self):
+        page = json.loads(self.get(reverse("api:coupon_list"), page_size=5))
+
+        self.get(page["next"])
+
+
+class FastJSONTests(TestCase):
+    """
+    Tests that the fast JSON renderer and parser work like the ones of DRF, with and without orjson.
+    """
+    data = {
+        "id": uuid.UUID("5c1b3c5e-59f8-4a0c-9d4f-0e0d3a1c2b3a"),
+        "amount": Decimal("12.50"),
+        "utc": datetime.datetime(2024, 6, 1, 12, 30, 15, 250, tzinfo=datetime.timezone.utc),
+        "offset": datetime.datetime(2024, 6, 1, 12, 30, tzinfo=datetime.timezone(datetime.timedelta(hours=2))),
+        "title": gettext_lazy("Shops"),
+        "text": "Kupón \u2028 \u2029",
+        1: [None, True, 1.5, {"nested": []}],
+    }
+
+    def backends(self):
+        yield "orjson"
+
+        with mock.patch("api.renderers.orjson", None), mock.patch("api.parsers.orjson", None):
+            yield "json"
+
+    def test_render(self):
+        expected = renderers.JSONRenderer().render(self.data)
+
+        for backend in self.backends():
+            with self.subTest(backend):
+                self.assertEqual(FastJSONRenderer().render(self.data), expected)
+                self.assertEqual(
+                    FastJSONRenderer().render(self.data, "application/json; indent=4"),
+                    renderers.JSONRenderer().render(self.data, "application/json; indent=4"),
+                )
+
+    def test_parse(self):
+        content = renderers.JSONRenderer().render(self.data)
+        expected = parsers.JSONParser().parse(io.BytesIO(content))
+
+        for backend in self.backends():
+            with self.subTest(backend):
+                self.assertEqual(FastJSONParser().parse(io.BytesIO(content)), expected)
+
+                with self.assertRaises(ParseError):
+                    FastJSONParser().parse(io.BytesIO(b'{"amount": NaN}'))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SyncTests(TestCase):
+    """
+    Tests of the changes and the tombstones sent by the sync.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initgroups", "--nooutput")
+
+        User = get_user_model()
+        cls.owner = User.objects.create_user(username="owner", password="password")
+        cls.member = User.objects.create_user(username="member", password="password")
+
+        cls.shared_shop = Shop.objects.create(title="Shared", owner=cls.owner)
+        cls.own_shop = Shop.objects.create(title="Own", owner=cls.owner)
+        cls.coupons = Coupon.objects.bulk_create(
+            Coupon(barcode=str(index), amount=Decimal("1.00"), store=shop, owner=cls.owner)
+            for index, shop in enumerate([cls.shared_shop, cls.shared_shop, cls.own_shop])
+        )
+
+        cls.group = Group.objects.create(title="Group", owner=cls.owner)
+        cls.group.members.add(cls.member)
+        cls.group.shops.add(cls.shared_shop)
+
+    def setUp(self):
+        translation.activate("en")
+        self.addCleanup(translation.deactivate)
+        cache.set(RATES_CACHE_KEY, RateTable({"USD": Decimal("1.08")}, timezone.now()), None)
+
+        patcher = mock.patch.object(settings, "SYNC_WATERMARK_LAG", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.tokens = {user: self.sync(user)["token"] for user in (self.owner, self.member)}
+
+    def sync(self, user, token: str | None = None) -> dict:
+        self.client.force_login(user)
+        response = self.client.get(reverse("api:sync"), {} if token is None else {"since": token})
+
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def changes(self, user) -> dict:
+        """
+        Returns the ids of the changed and deleted objects since the token of the user.
+        """
+        content = self.sync(user, self.tokens[user])
+
+        self.assertFalse(content["reset"])
+        return {
+            **{kind: sorted(str(item["id"]) for item in content[kind]) for kind in sync.visible(user)},
+            **{f"deleted { kind }": ids for kind, ids in content["deleted"].items()},
+        }
+
+    def expected(self, **changes) -> dict:
+        empty = {kind: [] for kind in sync.visible(self.owner)}
+
+        return {
+            **empty,
+            **{f"deleted { kind }": [] for kind in empty},
+            **{kind.replace("_", " "): sorted(str(pk) for pk in ids) for kind, ids in changes.items()},
+        }
+
+    def test_full(self):
+        content = self.sync(self.member)
+
+        self.assertTrue(content["reset"])
+        self.assertEqual(len(content["coupons"]), 2)
+        self.assertEqual([shop["id"] for shop in content["shops"]], [str(self.shared_shop.pk)])
+
+    def test_unchanged(self):
+        self.assertEqual(self.changes(self.member), self.expected())
+
+    def test_changed_coupon(self):
+        coupon = Coupon.objects.get(pk=self.coupons[0].pk)
+        coupon.is_used = True
+        coupon.save()
+
+        # The unused amount of the shop changed.
+        self.assertEqual(self.changes(self.member), self.expected(coupons=[coupon.pk], shops=[self.shared_shop.pk]))
+
+    def test_deleted_coupon(self):
+        Coupon.objects.get(pk=self.coupons[0].pk).delete()
+
+        changes = self.expected(shops=[self.shared_shop.pk], deleted_coupons=[self.coupons[0].pk])
+        self.assertEqual(self.changes(self.member), changes)
+        self.assertEqual(self.changes(self.owner), changes)
+
+    def test_deleted_shop(self):
+        Shop.objects.get(pk=self.shared_shop.pk).delete()
+
+        self.assertEqual(
+            self.changes(self.member),
+            self.expected(
+                groups=[self.group.pk],
+                deleted_shops=[self.shared_shop.pk],
+                deleted_coupons=[coupon.pk for coupon in self.coupons[:2]],
+            ),
+        )
+
+    def test_deleted_user(self):
+        coupon = Coupon.objects.create(barcode="member", amount=Decimal("2.00"), store=self.shared_shop, owner=self.member)
+        self.tokens[self.owner] = self.sync(self.owner)["token"]
+
+        get_user_model().objects.get(pk=self.member.pk).delete()
+
+        # The coupon of the member in the shop of the owner is logged with the member.
+        self.assertEqual(
+            self.changes(self.owner),
+            self.expected(shops=[self.shared_shop.pk], groups=[self.group.pk], deleted_coupons=[coupon.pk]),
+        )
+
+    def test_removed_member(self):
+        self.group.members.remove(self.member)
+
+        self.assertEqual(
+            self.changes(self.member),
+            self.expected(
+                deleted_groups=[self.group.pk],
+                deleted_shops=[self.shared_shop.pk],
+                deleted_coupons=[coupon.pk for coupon in self.coupons[:2]],
+            ),
+        )
+        self.assertEqual(self.changes(self.owner), self.expected(groups=[self.group.pk]))
+
+    def test_deleted_group(self):
+        Group.objects.get(pk=self.group.pk).delete()
+
+        self.assertEqual(
+            self.changes(self.member),
+            self.expected(
+                deleted_groups=[self.group.pk],
+                deleted_shops=[self.shared_shop.pk],
+                deleted_coupons=[coupon.pk for coupon in self.coupons[:2]],
+            ),
+        )
+
+    def test_still_shared(self):
+        other_group = Group.objects.create(title="Other", owner=self.owner)
+        other_group.members.add(self.member)
+        other_group.shops.add(self.shared_shop)
+        self.tokens[self.member] = self.sync(self.member)["token"]
+
+        self.group.shops.remove(self.shared_shop)
+
+        # The shop is still shared through the other group, only its groups changed.
+        self.assertEqual(self.changes(self.member), self.expected(shops=[self.shared_shop.pk], groups=[self.group.pk]))
+
+    def test_shared_shop(self):
+        self.group.shops.add(self.own_shop)
+
+        self.assertEqual(
+            self.changes(self.member),
+            self.expected(coupons=[self.coupons[2].pk], shops=[self.own_shop.pk], groups=[self.group.pk]),
+        )
+
+    def test_invitation(self):
+        invitation = Invitation.objects.create(
+            group=Group.objects.create(title="Invited", owner=self.owner), sender=self.owner, recipient=self.member
+        )
+
+        self.assertEqual(self.changes(self.member), self.expected(invitations=[invitation.pk]))
+
+        pk = invitation.pk
+        invitation.delete()
+
+        self.assertEqual(self.changes(self.member), self.expected(deleted_invitations=[pk]))
+
+    def test_sparse_fields_ignored(self):
+        self.client.force_login(self.member)
+        response = self.client.get(reverse("api:sync"), {"fields": "barcode", "omit": "id,date_modified"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["coupons"][0].keys(), self.sync(self.member)["coupons"][0].keys())
+        self.assertIn("id", response.json()["shops"][0])
+
+    def test_invalid_token(self):
+        self.client.force_login(self.member)
+
+        self.assertEqual(self.client.get(reverse("api:sync"), {"since": "invalid"}).status_code, 400)
+
+    def test_expired_token(self):
+        token = sync.make_token(timezone.now() - timezone.timedelta(days=settings.SYNC_DELETION_LOG_DAYS + 1))
+
+        self.assertTrue(self.sync(self.member, token)["reset"])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ConditionalGetTests(TestCase):
+    """
+    Tests that the API answers with 304 Not Modified while the objects of the response do not change.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initgroups", "--nooutput")
+
+        User = get_user_model()
+        cls.owner = User.objects.create_user(username="owner", password="password")
+        cls.member = User.objects.create_user(username="member", password="password")
+        cls.stranger = User.objects.create_user(username="stranger", password="password")
+
+        cls.shop = Shop.objects.create(title="Shop", owner=cls.owner)
+        cls.coupon = Coupon.objects.create(barcode="1", amount=Decimal("1.00"), store=cls.shop, owner=cls.owner)
+
+        cls.group = Group.objects.create(title="Group", owner=cls.owner)
+        cls.group.members.add(cls.member)
+        cls.group.shops.add(cls.shop)
+
+    def setUp(self):
+        translation.activate("en")
+        self.addCleanup(translation.deactivate)
+        cache.set(RATES_CACHE_KEY, RateTable({"USD": Decimal("1.08")}, timezone.now()), None)
+        self.client.force_login(self.member)
+
+    def urls(self) -> list[str]:
+        return [
+            reverse("api:shop_list"),
+            reverse("api:shop_detail", kwargs={"pk": self.shop.pk}),
+            reverse("api:coupon_list"),
+            reverse("api:coupon_detail", kwargs={"pk": self.coupon.pk}),
+            reverse("api:group_list"),
+            reverse("api:group_detail", kwargs={"pk": self.group.pk}),
+        ]
+
+    def etag(self, url: str, **params) -> str:
+        response = self.client.get(url, params)
+
+        self.assertEqual(response.status_code, 200)
+        return response["ETag"]
+
+    def test_not_modified(self):
+        for url in self.urls():
+            with self.subTest(url):
+                with CaptureQueriesContext(connection) as context:
+                    etag = self.etag(url)
+
+                with CaptureQueriesContext(connection) as conditional:
+                    response = self.client.get(url, headers={"If-None-Match": etag})
+
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b"")
+                self.assertEqual(response["ETag"], etag)
+                self.assertLess(len(conditional), len(context))
+
+    def test_changed_coupon(self):
+        etags = {url: self.etag(url) for url in self.urls()}
+
+        self.coupon.is_used = True
+        self.coupon.save()
+
+        changed = [url for url in self.urls() if self.etag(url) != etags[url]]
+        self.assertEqual(changed, self.urls()[:4])
+
+    def test_deleted_coupon(self):
+        coupon = Coupon.objects.create(barcode="2", amount=Decimal("1.00"), store=self.shop, owner=self.owner)
+        etags = {url: self.etag(url) for url in self.urls()}
+
+        coupon.delete()
+
+        changed = [url for url in self.urls() if self.etag(url) != etags[url]]
+        self.assertEqual(changed, self.urls()[:3])
+
+    def test_relations(self):
+        shop_url, group_url = self.urls()[1], self.urls()[5]
+        etags = {url: self.etag(url) for url in (shop_url, group_url)}
+
+        other = get_user_model().objects.create_user(username="other", password="password")
+        self.group.members.add(other)
+
+        self.assertEqual(self.etag(shop_url), etags[shop_url])
+        self.assertNotEqual(self.etag(group_url), etags[group_url])
+
+        self.client.force_login(self.owner)
+        etags = {url: self.etag(url) for url in (shop_url, group_url)}
+        self.group.shops.remove(self.shop)
+
+        self.assertNotEqual(self.etag(shop_url), etags[shop_url])
+        self.assertNotEqual(self.etag(group_url), etags[group_url])
+
+    def test_request(self):
+        url = self.urls()[1]
+        etag = self.etag(url)
+
+        self.assertNotEqual(self.etag(url, fields="id"), etag)
+        self.assertNotEqual(self.etag(url, currency="USD"), etag)
+
+        self.client.force_login(self.owner)
+        self.assertNotEqual(self.etag(url), etag)
+
+    def test_not_visible(self):
+        url = self.urls()[1]
+        etag = self.etag(url)
+
+        self.client.force_login(self.stranger)
+        response = self.client.get(url, headers={"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(response.has_header("ETag"))
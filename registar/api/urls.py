@@ -24,4 +24,6 @@ urlpatterns = [
     path("invitations/<int:pk>/", views.InvitationDetail.as_view(), name="invitation_detail"),
     
     path("marketplace/", views.MarketplaceList.as_view(), name="marketplace_list"),
+
+    path("sync/", views.Sync.as_view(), name="sync"),
 ]
@@ -1,21 +1,128 @@
+from core.mixins import ConditionalGetMixin
 from core.models import Coupon, Shop
 from django.contrib.auth import get_user_model
-from django.db.models import Q
-from groups.models import Group, Invitation
+from django.core import signing
+from django.db.models import OuterRef, Q
+from django.utils import timezone
+from exchange.services import get_currency, get_rates
+from groups.models import Group, GroupMembership, Invitation, ShopGroup
+from metrics.collectors import SERIALIZER_SECONDS
 from rest_framework import generics, permissions
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
 from rest_framework.views import APIView
 
+from . import sync
+from .pagination import InvitationPagination
 from .permissions import (IsMemberOrOwnerCoupon, IsMemberOrOwnerGroup,
                           IsMemberOrOwnerShop, IsOnMarketplace, IsRequestUser,
                           IsSenderOrRecipient)
-from .serializers import (CouponSerializer, GroupSerializer,
-                          InvitationSerializer, MarketplaceSerializer,
-                          ShopSerializer, UserSerializer)
+from .serializers import (CompactListSerializer, CouponSerializer,
+                          GroupSerializer, InvitationSerializer,
+                          MarketplaceSerializer, ShopSerializer,
+                          UserSerializer, ValuesListSerializer,
+                          selected_fields, values_converters)
 
 User = get_user_model()
 
+# The relations the representations read, for the ETags, see `core.conditional.fingerprint`.
+SHOP_RELATED = {
+    "coupons": (Coupon.objects.filter(store=OuterRef("pk")), "store", "date_modified"),
+    "groups": (ShopGroup.objects.filter(shop=OuterRef("pk")), "shop", "date_added"),
+}
+GROUP_RELATED = {
+    "members": (GroupMembership.objects.filter(group=OuterRef("pk")), "group", "date_joined"),
+    "shops": (ShopGroup.objects.filter(group=OuterRef("pk")), "group", "date_added"),
+    "invitations": (Invitation.objects.filter(group=OuterRef("pk")), "group", "date_modified"),
+}
+
+
+class CurrencyContextMixin:
+    """
+    Passes the currency picked by the user and the rates to the serializer, so they are looked up once per request.
+    """
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["currency"] = get_currency(self.request)
+        context["rates"] = get_rates()
+        return context
+
+
+class EagerLoadingMixin:
+    """
+    Loads the relations declared by the serializer with the objects, for the lists and the detail views.
+
+    If the request selects fields with `?fields=` or `?omit=`, only their columns are fetched, with the
+    `required_fields` the permissions read and the fields the pagination orders on.
+    """
+    required_fields = ()
+
+    def filter_queryset(self, queryset):
+        serializer_class = self.get_serializer_class()
+        fields = selected_fields(serializer_class().fields, self.request.query_params)
+
+        return serializer_class.setup_eager_loading(super().filter_queryset(queryset), fields, self.get_required_fields())
+
+    def get_required_fields(self) -> list[str]:
+        ordering = getattr(self.paginator, "ordering", ())
+
+        return [*self.required_fields, *(field.lstrip("-") for field in ordering)]
+
+
+class SerializerMetricsMixin:
+    """
+    Records the time spent serializing the objects of the response, including the queries of the related fields.
+
+    The lists take a fast path if every field reads a column: the rows are fetched with `values()` and
+    represented by a `ValuesListSerializer`, with the same output.
+
+    With `?compact=true`, the lists represent every object as an array of values, in the order of the
+    `fields` of the response.
+    """
+    compact_query_param = "compact"
+
+    def serialize(self, serializer):
+        with SERIALIZER_SECONDS.labels(self.request.resolver_match.view_name).time():
+            return serializer.data
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        compact = self.request.query_params.get(self.compact_query_param) in ("1", "true")
+        child = self.get_serializer()
+        converters = values_converters(child, queryset.query.annotations)
+
+        if converters is not None:
+            lookups = {lookup for _name, lookup, _convert in converters if lookup is not None}
+            queryset = queryset.prefetch_related(None).values(*lookups.union(self.get_required_fields()))
+
+        page = self.paginate_queryset(queryset)
+        instance = queryset if page is None else page
+        context = self.get_serializer_context()
+
+        if converters is not None:
+            serializer = ValuesListSerializer(instance, child=child, converters=converters, compact=compact, context=context)
+        elif compact:
+            serializer = CompactListSerializer(instance, child=child, context=context)
+        else:
+            serializer = self.get_serializer(instance, many=True)
+
+        data = self.serialize(serializer)
+
+        if page is not None:
+            response = self.get_paginated_response(data)
+        else:
+            response = Response({"results": data} if compact else data)
+
+        if compact:
+            response.data = {"fields": serializer.field_names, **response.data}
+
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(self.serialize(self.get_serializer(self.get_object())))
+
 
 class Index(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -28,83 +135,156 @@ class Index(APIView):
             'groups': reverse('api:group_list', request=request, format=format),
             'invitations': reverse('api:invitation_list', request=request, format=format),
             'marketplace': reverse('api:marketplace_list', request=request, format=format),
+            'sync': reverse('api:sync', request=request, format=format),
         }
         return Response(content)
 
 
-class UserDetail(generics.RetrieveAPIView):
+class UserDetail(SerializerMetricsMixin, EagerLoadingMixin, generics.RetrieveAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated, IsRequestUser]
 
 
-class ShopList(generics.ListAPIView):
+class ShopList(ConditionalGetMixin, SerializerMetricsMixin, EagerLoadingMixin, CurrencyContextMixin, generics.ListAPIView):
     serializer_class = ShopSerializer
     permission_classes = [permissions.IsAuthenticated]
+    fingerprint_related = SHOP_RELATED
 
     def get_queryset(self):
-        return Shop.objects.filter(Q(owner=self.request.user.pk) | Q(groups__members=self.request.user.pk)).distinct()
+        return Shop.objects.visible_to(self.request.user).with_amount_unused()
 
+    def get_fingerprint_queryset(self):
+        return Shop.objects.visible_to(self.request.user)
 
-class ShopDetail(generics.RetrieveAPIView):
+
+class ShopDetail(ConditionalGetMixin, SerializerMetricsMixin, EagerLoadingMixin, CurrencyContextMixin, generics.RetrieveAPIView):
     serializer_class = ShopSerializer
     permission_classes = [permissions.IsAuthenticated, IsMemberOrOwnerShop]
+    required_fields = ("owner",)
+    fingerprint_related = SHOP_RELATED
 
     def get_queryset(self):
-        return Shop.objects.all()
+        return Shop.objects.with_amount_unused()
+
+    def get_fingerprint_queryset(self):
+        return Shop.objects.visible_to(self.request.user).filter(pk=self.kwargs["pk"])
 
 
-class CouponList(generics.ListAPIView):
+class CouponList(ConditionalGetMixin, SerializerMetricsMixin, EagerLoadingMixin, CurrencyContextMixin, generics.ListAPIView):
     serializer_class = CouponSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Coupon.objects.filter(Q(owner=self.request.user.pk) | Q(store__groups__members=self.request.user.pk)).distinct()
+        return Coupon.objects.visible_to(self.request.user)
+
+    def get_fingerprint_queryset(self):
+        return Coupon.objects.visible_to(self.request.user)
 
 
-class CouponDetail(generics.RetrieveAPIView):
+class CouponDetail(ConditionalGetMixin, SerializerMetricsMixin, EagerLoadingMixin, CurrencyContextMixin, generics.RetrieveAPIView):
     serializer_class = CouponSerializer
     permission_classes = [permissions.IsAuthenticated, IsMemberOrOwnerCoupon]
+    required_fields = ("owner",)
 
     def get_queryset(self):
         return Coupon.objects.all()
 
+    def get_fingerprint_queryset(self):
+        return Coupon.objects.visible_to(self.request.user).filter(pk=self.kwargs["pk"])
 
-class GroupList(generics.ListAPIView):
+
+class GroupList(ConditionalGetMixin, SerializerMetricsMixin, EagerLoadingMixin, generics.ListAPIView):
     serializer_class = GroupSerializer
     permission_classes = [permissions.IsAuthenticated]
+    fingerprint_related = GROUP_RELATED
 
     def get_queryset(self):
-        return Group.objects.filter(Q(owner=self.request.user.pk) | Q(members=self.request.user.pk)).distinct()
+        return Group.objects.visible_to(self.request.user)
+
+    def get_fingerprint_queryset(self):
+        return Group.objects.visible_to(self.request.user)
 
 
-class GroupDetail(generics.RetrieveAPIView):
+class GroupDetail(ConditionalGetMixin, SerializerMetricsMixin, EagerLoadingMixin, generics.RetrieveAPIView):
     serializer_class = GroupSerializer
     permission_classes = [permissions.IsAuthenticated, IsMemberOrOwnerGroup]
+    required_fields = ("owner",)
+    fingerprint_related = GROUP_RELATED
 
     def get_queryset(self):
         return Group.objects.all()
 
+    def get_fingerprint_queryset(self):
+        return Group.objects.visible_to(self.request.user).filter(pk=self.kwargs["pk"])
+
 
-class InvitationList(generics.ListAPIView):
+class InvitationList(ConditionalGetMixin, SerializerMetricsMixin, EagerLoadingMixin, generics.ListAPIView):
     serializer_class = InvitationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = InvitationPagination
     
     def get_queryset(self):
-        return Invitation.objects.filter(Q(sender=self.request.user.pk) | Q(recipient=self.request.user.pk)).distinct()
+        return Invitation.objects.filter(Q(sender=self.request.user.pk) | Q(recipient=self.request.user.pk))
 
+    def get_fingerprint_queryset(self):
+        return self.get_queryset()
 
-class InvitationDetail(generics.RetrieveAPIView):
+
+class InvitationDetail(ConditionalGetMixin, SerializerMetricsMixin, EagerLoadingMixin, generics.RetrieveAPIView):
     serializer_class = InvitationSerializer
     permission_classes = [permissions.IsAuthenticated, IsSenderOrRecipient]
+    required_fields = ("sender", "recipient")
 
     def get_queryset(self):
         return Invitation.objects.all()
 
+    def get_fingerprint_queryset(self):
+        return Invitation.objects.filter(Q(sender=self.request.user.pk) | Q(recipient=self.request.user.pk), pk=self.kwargs["pk"])
+
 
-class MarketplaceList(generics.ListAPIView):
+class MarketplaceList(ConditionalGetMixin, SerializerMetricsMixin, EagerLoadingMixin, generics.ListAPIView):
     serializer_class = MarketplaceSerializer
     permission_classes = [permissions.IsAuthenticated, IsOnMarketplace]
 
     def get_queryset(self):
         return Shop.objects.filter(is_on_marketplace=True)
+
+    def get_fingerprint_queryset(self):
+        return self.get_queryset()
+
+
+class Sync(SerializerMetricsMixin, CurrencyContextMixin, generics.GenericAPIView):
+    """
+    Returns the objects created or changed since the watermark of the `since` token and the ids of the
+    `deleted` ones, with the `token` of the next sync. Without a token, or with one older than the deletion
+    log, all objects are returned and `reset` is set. `?fields=` and `?omit=` are ignored, the clients merge
+    whole objects by their ids.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_classes = {
+        "coupons": CouponSerializer,
+        "shops": ShopSerializer,
+        "groups": GroupSerializer,
+        "invitations": InvitationSerializer,
+    }
+
+    def get(self, request, format=None):
+        start = timezone.now()
+        token = request.query_params.get("since")
+
+        try:
+            since = None if token is None else sync.read_token(token)
+        except (signing.BadSignature, ValueError):
+            raise ValidationError({"since": "Invalid token."})
+
+        changes = sync.changes(request.user, since)
+        context = {**self.get_serializer_context(), "sparse_fields": False}
+        content = {"token": sync.make_token(sync.next_watermark(start)), "reset": changes.reset}
+
+        for kind, serializer_class in self.serializer_classes.items():
+            queryset = serializer_class.setup_eager_loading(getattr(changes, kind))
+            content[kind] = self.serialize(serializer_class(queryset, many=True, context=context))
+
+        content["deleted"] = changes.deleted
+        return Response(content)
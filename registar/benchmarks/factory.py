@@ -0,0 +1,157 @@
+from decimal import Decimal
+from typing import Iterable, NamedTuple
+
+from core.models import Coupon, Shop
+from core.stats import rebuild_stats
+from django.contrib.auth import get_user_model
+from django.contrib.auth.base_user import AbstractBaseUser
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group as Role
+from django.db.models import Model
+from groups.models import Group, GroupMembership, Invitation, ShopGroup
+
+import registar.settings as settings
+
+PASSWORD = "benchmark"
+
+
+class DatasetSize(NamedTuple):
+    """
+    Size of the generated dataset.
+    """
+    users: int = 50
+    shops: int = 20
+    coupons: int = 2000
+    groups: int = 5
+    marketplace: int = 1000
+
+    def scaled(self, factor: int) -> "DatasetSize":
+        return DatasetSize(*(value * factor for value in self))
+
+
+class Dataset(NamedTuple):
+    """
+    The generated objects the benchmarked URLs point to.
+    """
+    user: AbstractBaseUser
+    shop: Shop
+    coupon: Coupon
+    shared_coupon: Coupon
+    group: Group
+    invitation: Invitation
+    marketplace_shop: Shop
+    # The objects of the actions that accept an object in a certain state only, by URL name. Small datasets
+    # may have no object in the state an action accepts.
+    objects: dict[str, Model]
+
+
+def seed(size: DatasetSize = DatasetSize(), prefix: str = "benchmark") -> Dataset:
+    """
+    Generates the dataset, with bulk inserts and the counters and statistics rebuilt afterwards.
+
+    The main user owns `size.shops` shops with `size.coupons` coupons and `size.groups` groups. The other
+    `size.users` users own a tenth of that each, are members of all groups of the main user and own the
+    `size.marketplace` shops on the marketplace. The main user is a member of a group of another user
+    and has a pending invitation, and the last shop of the main user is on the marketplace.
+    """
+    users = _create_users(prefix, size.users + 1)
+    user, others = users[0], users[1:]
+
+    shops = _create_shops(user, size.shops, prefix)
+    shops[-1].is_on_marketplace = True
+    Shop.objects.bulk_update([shops[-1]], ["is_on_marketplace"])
+    coupons = _create_coupons(user, shops, size.coupons)
+
+    for index, other in enumerate(others):
+        other_shops = _create_shops(other, max(size.shops // 10, 1), f"{ prefix } { index }")
+        _create_coupons(other, other_shops, size.coupons // 10)
+
+    groups = Group.objects.bulk_create(
+        Group(title=f"{ prefix } group { index }", owner=user, is_pinned=index == 0) for index in range(size.groups)
+    )
+    GroupMembership.objects.bulk_create(
+        GroupMembership(user=other, group=group) for group in groups for other in others
+    )
+    ShopGroup.objects.bulk_create(
+        ShopGroup(shop=shop, group=group, is_pinned=index == 0) for group in groups for index, shop in enumerate(shops)
+    )
+
+    other_group = Group.objects.create(title=f"{ prefix } foreign group", owner=others[0])
+    GroupMembership.objects.create(user=user, group=other_group)
+    invitation = Invitation.objects.create(
+        sender=others[0], recipient=user, group=Group.objects.create(title=f"{ prefix } invited group", owner=others[0])
+    )
+    Invitation.objects.bulk_create(Invitation(sender=user, recipient=other, group=groups[0]) for other in others)
+
+    marketplace_shops = Shop.objects.bulk_create(
+        Shop(title=f"{ prefix } marketplace { index }", owner=others[index % len(others)], is_on_marketplace=True)
+        for index in range(size.marketplace)
+    )
+
+    rebuild_stats([user.pk for user in users])
+    Group.objects.filter(owner__in=users).reconcile()
+
+    objects = {
+        "core:coupon_use": first(coupons, is_used=False),
+        "core:coupon_unuse": first(coupons, is_used=True),
+        "core:coupon_pin": first(coupons, is_pinned=False),
+        "core:coupon_unpin": first(coupons, is_pinned=True),
+        "core:coupon_share": first(coupons, is_shared=False),
+        "core:coupon_unshare": first(coupons, is_shared=True),
+        "core:shop_pin": first(shops, is_pinned=False),
+        "core:shop_unpin": first(shops, is_pinned=True),
+        "core:shop_upload_to_marketplace": first(shops, is_on_marketplace=False),
+        "core:shop_remove_from_marketplace": first(shops, is_on_marketplace=True),
+        "groups:group_pin": first(groups, is_pinned=False),
+        "groups:group_unpin": first(groups, is_pinned=True),
+        "groups:group_leave": other_group,
+    }
+    objects = {name: obj for name, obj in objects.items() if obj is not None}
+
+    return Dataset(
+        user, shops[0], coupons[0], first(coupons, is_shared=True), groups[0], invitation, marketplace_shops[0], objects
+    )
+
+
+def first(objects: Iterable[Model], **state) -> Model | None:
+    """
+    Returns the first of the objects whose fields have the given values, `None` if there is none.
+    """
+    return next((obj for obj in objects if all(getattr(obj, field) == value for field, value in state.items())), None)
+
+
+def _create_users(prefix: str, count: int) -> list:
+    password = make_password(PASSWORD)
+    usernames = [f"{ prefix }{ index or '' }" for index in range(count)]
+
+    get_user_model().objects.bulk_create(get_user_model()(username=username, password=password) for username in usernames)
+
+    # Not every database returns the primary keys of bulk inserted rows.
+    users = sorted(get_user_model().objects.filter(username__in=usernames), key=lambda user: usernames.index(user.username))
+
+    role = Role.objects.get(name=settings.REGULAR_USER_ROLE)
+    role.user_set.add(*users)
+
+    return users
+
+
+def _create_shops(owner, count: int, prefix: str) -> list[Shop]:
+    return Shop.objects.bulk_create(
+        Shop(title=f"{ prefix } shop { index }", owner=owner, is_pinned=index < 3) for index in range(count)
+    )
+
+
+def _create_coupons(owner, shops: list[Shop], count: int) -> list[Coupon]:
+    return Coupon.objects.bulk_create(
+        Coupon(
+            title=f"Coupon { index }",
+            barcode=f"{ owner.pk:06d}{ index:08d}",
+            amount=Decimal(index % 50 + 1) / 4,
+            store=shops[index % len(shops)],
+            owner=owner,
+            is_used=index % 3 == 0,
+            is_pinned=index % 100 == 1,
+            is_shared=index % 10 == 1,
+        )
+        for index in range(count)
+    )
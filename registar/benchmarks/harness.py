@@ -0,0 +1,308 @@
+import json
+import logging
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, NamedTuple
+
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.conf import settings
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import NoReverseMatch, get_resolver, resolve, reverse
+from django.utils import timezone, translation
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from exchange.services import RATES_CACHE_KEY, RateTable, load_rates
+
+from .factory import Dataset
+
+NAMESPACES = ("core", "groups", "marketplace", "account", "api")
+LANGUAGE = "en"
+# URLs requested logged out, their views refuse logged in users.
+ANONYMOUS = {"account:register"}
+# Endpoints answering with this status or above fail the run, unless the baseline allows it with `"allow_error": true`.
+ERROR_STATUS = 400
+
+
+class Endpoint(NamedTuple):
+    name: str
+    url: str
+    method: str
+
+
+class Measurement(NamedTuple):
+    status: int
+    queries: int
+    sql_ms: float
+    wall_ms: float
+    size: int
+
+
+class Regression(NamedTuple):
+    endpoint: str
+    metric: str
+    baseline: int
+    value: int
+
+
+def url_names(namespaces: Iterable[str] = NAMESPACES) -> list[str]:
+    """
+    Returns the names of all URLs in the namespaces, e.g. `core:shop_detail`.
+    """
+    names = []
+
+    with translation.override(LANGUAGE):
+        resolver = get_resolver()
+
+        for namespace in namespaces:
+            _prefix, namespace_resolver = resolver.namespace_dict[namespace]
+            names.extend(
+                f"{ namespace }:{ name }" for name in namespace_resolver.reverse_dict if isinstance(name, str)
+            )
+
+    return sorted(names)
+
+
+def url_kwargs(name: str, dataset: Dataset) -> dict:
+    """
+    Returns the arguments of the URL, pointing to the objects of the dataset the benchmarked user can access.
+    """
+    namespace, url_name = name.split(":")
+
+    if url_name == "password_reset_confirm":
+        return {
+            "uidb64": urlsafe_base64_encode(force_bytes(dataset.user.pk)),
+            "token": default_token_generator.make_token(dataset.user),
+        }
+
+    if name in dataset.objects:
+        obj = dataset.objects[name]
+    elif "invitation" in url_name:
+        obj = dataset.invitation
+    elif "group" in url_name:
+        obj = dataset.group
+    elif "shared" in url_name:
+        obj = dataset.shared_coupon
+    elif "coupon" in url_name:
+        obj = dataset.coupon
+    elif "shop" in url_name:
+        obj = dataset.marketplace_shop if namespace == "marketplace" else dataset.shop
+    else:
+        obj = dataset.user
+
+    return {"pk": obj.pk}
+
+
+def endpoints(dataset: Dataset, namespaces: Iterable[str] = NAMESPACES) -> list[Endpoint]:
+    """
+    Returns the benchmarked requests. Views that do not allow GET are posted to.
+    """
+    result = []
+
+    with translation.override(LANGUAGE):
+        for name in url_names(namespaces):
+            try:
+                url = reverse(name)
+            except NoReverseMatch:
+                url = reverse(name, kwargs=url_kwargs(name, dataset))
+
+            view_class = getattr(resolve(url).func, "view_class", None)
+            allows_get = view_class is None or (hasattr(view_class, "get") and "get" in view_class.http_method_names)
+            method = "get" if allows_get else "post"
+
+            result.append(Endpoint(name, url, method))
+
+    return result
+
+
+@contextmanager
+def test_database(interactive: bool = False):
+    """
+    Creates a test database with the initial groups and destroys it afterwards, like the test runner, with
+    the caches in local memory, so a benchmark neither touches the data nor the cache of the site.
+    """
+    setup_test_environment()
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=not interactive, serialize=False)
+
+    try:
+        caches = {
+            alias: {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": alias}
+            for alias in settings.CACHES
+        }
+
+        with override_settings(CACHES=caches):
+            call_command("initgroups", "--nooutput")
+            yield
+
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+@contextmanager
+def fresh_rates():
+    """
+    Marks the cached exchange rates as fresh during the run, so no background refresh competes with the requests.
+    """
+    original = cache.get(RATES_CACHE_KEY)
+    cache.set(RATES_CACHE_KEY, RateTable(load_rates().rates, timezone.now()), None)
+
+    try:
+        yield
+
+    finally:
+        if original is None:
+            cache.delete(RATES_CACHE_KEY)
+        else:
+            cache.set(RATES_CACHE_KEY, original, None)
+
+
+class QueryTimer:
+    """
+    Execute wrapper that counts the queries and the time spent in them.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+
+        try:
+            return execute(sql, params, many, context)
+
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.queries += 1
+
+
+def measure(client: Client, endpoint: Endpoint) -> Measurement:
+    """
+    Requests the endpoint once. Changes made by the request are rolled back.
+    """
+    timer = QueryTimer()
+
+    with transaction.atomic():
+        with connection.execute_wrapper(timer):
+            start = time.perf_counter()
+            response = getattr(client, endpoint.method)(endpoint.url)
+            wall_ms = (time.perf_counter() - start) * 1000
+
+        transaction.set_rollback(True)
+
+    content = b"".join(response.streaming_content) if response.streaming else response.content
+
+    return Measurement(
+        status=response.status_code,
+        queries=timer.queries,
+        sql_ms=timer.seconds * 1000,
+        wall_ms=wall_ms,
+        size=len(content),
+    )
+
+
+def run(dataset: Dataset, repeat: int = 3, namespaces: Iterable[str] = NAMESPACES, progress=None) -> dict[str, Measurement]:
+    """
+    Requests every endpoint as the main user of the dataset `repeat` times and keeps the fastest run.
+    """
+    client = Client(raise_request_exception=False)
+
+    # The rejected requests would log a warning each.
+    logging.disable(logging.WARNING)
+
+    try:
+        with fresh_rates(), override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            results = _run(client, dataset, repeat, namespaces, progress)
+
+    finally:
+        logging.disable(logging.NOTSET)
+
+    return results
+
+
+def _run(client, dataset, repeat, namespaces, progress) -> dict[str, Measurement]:
+    results = {}
+
+    for endpoint in endpoints(dataset, namespaces):
+        runs = []
+
+        for _attempt in range(max(repeat, 1)):
+            # Logging out or deleting the user ends the session, every run starts logged in.
+            if endpoint.name in ANONYMOUS:
+                client.logout()
+            else:
+                client.force_login(dataset.user)
+            runs.append(measure(client, endpoint))
+
+        results[endpoint.name] = min(runs, key=lambda measurement: measurement.wall_ms)
+
+        if progress is not None:
+            progress(endpoint, results[endpoint.name])
+
+    return results
+
+
+def errors(results: dict[str, Measurement], baseline: dict[str, dict]) -> list[Regression]:
+    """
+    Returns the endpoints that answered with a client or server error the baseline does not allow.
+    """
+    return [
+        Regression(name, "error", baseline.get(name, {}).get("status", 0), measurement.status)
+        for name, measurement in sorted(results.items())
+        if measurement.status >= ERROR_STATUS and not baseline.get(name, {}).get("allow_error", False)
+    ]
+
+
+def compare(results: dict[str, Measurement], baseline: dict[str, dict], query_threshold: int = 0) -> list[Regression]:
+    """
+    Returns the endpoints that answered with an error the baseline does not allow, the endpoints that run
+    more than `query_threshold` queries more than in the baseline, and the endpoints whose status code
+    changed. The timings are not compared, they depend on the machine.
+    """
+    regressions = errors(results, baseline)
+    failed = {regression.endpoint for regression in regressions}
+
+    for name, measurement in sorted(results.items()):
+        expected = baseline.get(name)
+
+        if expected is None:
+            continue
+
+        if measurement.status != expected["status"] and name not in failed:
+            regressions.append(Regression(name, "status", expected["status"], measurement.status))
+
+        if measurement.queries > expected["queries"] + query_threshold:
+            regressions.append(Regression(name, "queries", expected["queries"], measurement.queries))
+
+    return regressions
+
+
+def load_baseline(path: Path) -> dict:
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_baseline(path: Path, size: dict, results: dict[str, Measurement], allowed_errors: Iterable[str] = ()) -> None:
+    """
+    Writes the results to the baseline, allowing the errors of the endpoints in `allowed_errors`.
+    """
+    allowed_errors = set(allowed_errors)
+    endpoints = {}
+
+    for name, measurement in sorted(results.items()):
+        endpoints[name] = {"status": measurement.status, "queries": measurement.queries}
+
+        if name in allowed_errors and measurement.status >= ERROR_STATUS:
+            endpoints[name]["allow_error"] = True
+
+    baseline = {"dataset": size, "endpoints": endpoints}
+
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(baseline, file, indent=4)
+        file.write("\n")
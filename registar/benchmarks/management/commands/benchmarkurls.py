@@ -0,0 +1,122 @@
+from pathlib import Path
+
+from django.core.management import BaseCommand, CommandError
+from django.utils.translation import gettext as _
+
+from benchmarks import harness
+from benchmarks.factory import DatasetSize, seed
+
+BASELINE = Path(__file__).resolve().parents[2] / "baseline.json"
+
+
+class Command(BaseCommand):
+    """
+    Benchmarks every named URL on generated data and compares the results with the baseline.
+    """
+    help = _(
+        'Requests every URL of the core, groups, marketplace, accounts and api apps on generated data in a '
+        'test database, and fails when an endpoint runs more queries or returns another status than in the baseline, '
+        'or answers with an error the baseline does not allow.'
+    )
+
+    def add_arguments(self, parser):
+        defaults = DatasetSize()
+
+        parser.add_argument("--users", type=int, default=defaults.users, help=_("Number of other users."))
+        parser.add_argument("--shops", type=int, default=defaults.shops, help=_("Number of shops of the user."))
+        parser.add_argument("--coupons", type=int, default=defaults.coupons, help=_("Number of coupons of the user."))
+        parser.add_argument("--groups", type=int, default=defaults.groups, help=_("Number of groups of the user."))
+        parser.add_argument("--marketplace", type=int, default=defaults.marketplace, help=_("Number of shops on the marketplace."))
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help=_("How many times every URL is requested, the timings of the fastest run are reported."),
+        )
+        parser.add_argument("--baseline", type=Path, default=BASELINE, help=_("Baseline file."))
+        parser.add_argument(
+            "--update-baseline",
+            action="store_true",
+            help=_("Write the results to the baseline file instead of comparing them, unless an endpoint answers with an error."),
+        )
+        parser.add_argument("--query-threshold", type=int, default=0, help=_("Allowed number of additional queries."))
+        parser.add_argument(
+            "--noinput",
+            "--no-input",
+            action="store_false",
+            dest="interactive",
+            help=_("Destroy a leftover test database without asking."),
+        )
+
+    def handle(self, *args, **options):
+        size = DatasetSize(*(options[field] for field in DatasetSize._fields))
+
+        if options["update_baseline"]:
+            # The errors allowed by the old baseline stay allowed.
+            baseline = self._load_allowed_errors(options["baseline"])
+        else:
+            baseline = self._load_baseline(options["baseline"], size)
+
+        with harness.test_database(interactive=options["interactive"]):
+            dataset = seed(size)
+            results = harness.run(dataset, repeat=options["repeat"], progress=self._report)
+
+        if options["update_baseline"]:
+            errors = harness.errors(results, baseline)
+            self._report_regressions(errors)
+
+            if errors:
+                raise CommandError(
+                    f"{ len(errors) } URLs answered with an error, fix them or allow the error in the baseline with "
+                    f"\"allow_error\": true."
+                )
+
+            harness.save_baseline(options["baseline"], size._asdict(), results, allowed_errors=baseline)
+            self.stdout.write(f"Baseline of { len(results) } URLs written to { options['baseline'] }.\n")
+            return
+
+        for name in sorted(results.keys() - baseline.keys()):
+            self.stdout.write(self.style.WARNING(f"{ name } is not in the baseline."))
+
+        regressions = harness.compare(results, baseline, query_threshold=options["query_threshold"])
+        self._report_regressions(regressions)
+
+        if regressions:
+            raise CommandError(f"{ len(regressions) } regressions in { len({ regression.endpoint for regression in regressions }) } URLs.")
+
+        self.stdout.write(self.style.SUCCESS(f"No regressions in { len(results) } URLs.\n"))
+
+    def _report(self, endpoint, measurement):
+        self.stdout.write(
+            f"{ endpoint.name:40} { endpoint.method.upper():4} { measurement.status } "
+            f"{ measurement.queries:4} queries { measurement.sql_ms:8.2f} ms SQL "
+            f"{ measurement.wall_ms:8.2f} ms { measurement.size:8} B"
+        )
+
+    def _report_regressions(self, regressions):
+        for regression in regressions:
+            self.stdout.write(self.style.ERROR(
+                f"{ regression.endpoint }: { regression.metric } { regression.baseline } -> { regression.value }"
+            ))
+
+    @staticmethod
+    def _load_allowed_errors(path: Path) -> dict:
+        try:
+            endpoints = harness.load_baseline(path)["endpoints"]
+        except FileNotFoundError:
+            return {}
+
+        return {name: expected for name, expected in endpoints.items() if expected.get("allow_error", False)}
+
+    @staticmethod
+    def _load_baseline(path: Path, size: DatasetSize) -> dict:
+        try:
+            baseline = harness.load_baseline(path)
+
+        except FileNotFoundError as exc:
+            raise CommandError(f"Baseline { path } does not exist, create it with --update-baseline.") from exc
+
+        if baseline["dataset"] != size._asdict():
+            raise CommandError(f"The baseline was measured on a dataset of { baseline['dataset'] }, not { size._asdict() }.")
+
+        return baseline["endpoints"]
@@ -0,0 +1,134 @@
+import json
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from django.core.management import BaseCommand, CommandError
+from django.utils.translation import gettext as _
+
+from benchmarks.profiler import BUCKETS
+
+import registar.settings as settings
+
+SORT_KEYS = {
+    "total": lambda stats: stats["total_ms"],
+    "mean": lambda stats: stats["total_ms"] / stats["requests"],
+    "p95": lambda stats: percentile(stats, 0.95),
+    "max": lambda stats: stats["max_ms"],
+    "sql": lambda stats: stats["sql_ms"] / stats["requests"],
+    "queries": lambda stats: stats["queries"] / stats["requests"],
+    "duplicates": lambda stats: stats["duplicates"] / stats["requests"],
+}
+
+
+def percentile(stats: dict, fraction: float) -> float:
+    """
+    Returns the upper bound of the bucket the percentile falls in, at most the slowest request.
+    """
+    limit, seen = stats["requests"] * fraction, 0
+
+    for bound, count in zip((*BUCKETS, stats["max_ms"]), stats["buckets"]):
+        seen += count
+
+        if seen >= limit:
+            return min(bound, stats["max_ms"])
+
+    return stats["max_ms"]
+
+
+class Command(BaseCommand):
+    """
+    Merges the samples of the profiler middleware of all workers into a report of the slowest views.
+    """
+    help = _('Prints the slowest views measured by the profiler middleware, merged from the profile log and its backups.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--log",
+            type=Path,
+            default=Path(settings.LOGGING["handlers"]["profile_log"]["filename"]),
+            help=_("Profile log file, the rotated backups next to it are read too."),
+        )
+        parser.add_argument("--top", type=int, default=10, help=_("Number of views in the report."))
+        parser.add_argument("--sort", choices=SORT_KEYS, default="total", help=_("Order of the views."))
+        parser.add_argument(
+            "--since",
+            type=datetime.fromisoformat,
+            help=_("Only samples flushed after this ISO 8601 date and time."),
+        )
+        parser.add_argument("--sites", type=int, default=3, help=_("Call sites of duplicate queries shown per view."))
+
+    def handle(self, *args, **options):
+        views = self._merge(self._read(options["log"], options["since"]))
+
+        if not views:
+            self.stdout.write(_("No samples found.") + "\n")
+            return
+
+        requests = sum(stats["requests"] for stats in views.values())
+        self.stdout.write(f"{ requests } sampled requests of { len(views) } views, sorted by { options['sort'] }.\n")
+        self.stdout.write(
+            f"{ 'view':40} { 'requests':>8} { 'mean ms':>9} { 'p95 ms':>9} { 'max ms':>9} "
+            f"{ 'sql ms':>9} { 'tmpl ms':>9} { 'queries':>8} { 'dup':>6}"
+        )
+
+        ranking = sorted(views.items(), key=lambda item: SORT_KEYS[options["sort"]](item[1]), reverse=True)
+
+        for view, stats in ranking[:options["top"]]:
+            count = stats["requests"]
+            self.stdout.write(
+                f"{ view:40} { count:8} { stats['total_ms'] / count:9.1f} { percentile(stats, 0.95):9.1f} "
+                f"{ stats['max_ms']:9.1f} { stats['sql_ms'] / count:9.1f} { stats['template_ms'] / count:9.1f} "
+                f"{ stats['queries'] / count:8.1f} { stats['duplicates'] / count:6.1f}"
+            )
+
+            for site, site_count in stats["sites"].most_common(options["sites"]):
+                self.stdout.write(f"    { site_count:6} duplicate queries from { site }")
+
+    @staticmethod
+    def _read(path: Path, since: datetime | None):
+        paths = sorted(path.parent.glob(f"{ path.name }*"))
+
+        if not paths:
+            raise CommandError(f"Profile log { path } does not exist.")
+
+        for log_path in paths:
+            with open(log_path, encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+
+                    end = datetime.fromisoformat(record["end"])
+
+                    if since is not None and (end if since.tzinfo else end.replace(tzinfo=None)) < since:
+                        continue
+
+                    yield record
+
+    @staticmethod
+    def _merge(records) -> dict[str, dict]:
+        views = {}
+
+        for record in records:
+            stats = views.setdefault(record["view"], {
+                "requests": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "sql_ms": 0.0,
+                "template_ms": 0.0,
+                "queries": 0,
+                "duplicates": 0,
+                "buckets": [0] * (len(BUCKETS) + 1),
+                "sites": Counter(),
+            })
+
+            for key in ("requests", "total_ms", "sql_ms", "template_ms", "queries", "duplicates"):
+                stats[key] += record[key]
+
+            stats["max_ms"] = max(stats["max_ms"], record["max_ms"])
+            stats["buckets"] = [total + count for total, count in zip(stats["buckets"], record["buckets"])]
+            stats["sites"].update(record["sites"])
+
+        return views
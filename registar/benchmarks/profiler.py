@@ -0,0 +1,201 @@
+import atexit
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+
+import django.db
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.utils import timezone
+
+import registar.settings as settings
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in milliseconds of the buckets of the request times, the report estimates the percentiles from them
+BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+UNRESOLVED = "<unresolved>"
+TEMPLATE_MODULE = os.path.join("django", "template", "base.py")
+# The entry points, the project package and this module run every query, they are no call sites
+IGNORED_PATHS = (
+    os.path.join(settings.BASE_DIR, "manage.py"),
+    os.path.join(settings.BASE_DIR, "registar", ""),
+    os.path.dirname(__file__),
+)
+ORM_PATHS = (os.path.dirname(django.db.__file__), os.path.dirname(__file__))
+
+
+class Sample:
+    """
+    Measurements of one sampled request.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.template_ms = 0.0
+        self.statements = Counter()
+        self.sites = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+
+        try:
+            return execute(sql, params, many, context)
+
+        finally:
+            self.sql_ms += (time.perf_counter() - start) * 1000
+            self.queries += 1
+            self.statements[sql] += 1
+            self.sites[sql, call_site()] += 1
+
+    @property
+    def duplicates(self) -> int:
+        return sum(count - 1 for count in self.statements.values())
+
+    def duplicate_sites(self) -> Counter:
+        """
+        Returns the call sites of the queries run more than once, e.g. in a loop over a list.
+        """
+        return Counter({
+            site: count for (sql, site), count in self.sites.items() if self.statements[sql] > 1
+        })
+
+
+def call_site() -> str:
+    """
+    Returns the innermost template tag or frame of the apps' code the query is run from, or the innermost
+    frame of a library, e.g. a serializer field of the REST framework, outside of the ORM.
+    """
+    base_dir = str(settings.BASE_DIR)
+    frame = sys._getframe(2)
+    library = None
+
+    while frame is not None:
+        code = frame.f_code
+
+        if code.co_name == "render_annotated" and code.co_filename.endswith(TEMPLATE_MODULE):
+            node = frame.f_locals["self"]
+            return f"{ node.origin.template_name }:{ node.token.lineno }"
+
+        if code.co_filename.startswith(base_dir) and not code.co_filename.startswith(IGNORED_PATHS):
+            return f"{ os.path.relpath(code.co_filename, base_dir) }:{ frame.f_lineno } { code.co_name }"
+
+        if library is None and not code.co_filename.startswith(ORM_PATHS):
+            library = f"{ code.co_filename.rpartition('site-packages' + os.sep)[2] }:{ frame.f_lineno } { code.co_name }"
+
+        frame = frame.f_back
+
+    return library or UNRESOLVED
+
+
+class Aggregator:
+    """
+    Sums up the samples per view in the worker and writes them to the profile log every
+    `PROFILER_FLUSH_INTERVAL` seconds, one JSON line per view.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+        self.started = timezone.now()
+        self.flushed = time.monotonic()
+
+    def add(self, view: str, total_ms: float, sample: Sample) -> None:
+        with self.lock:
+            stats = self.views.setdefault(view, {
+                "requests": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "sql_ms": 0.0,
+                "template_ms": 0.0,
+                "queries": 0,
+                "duplicates": 0,
+                "buckets": [0] * (len(BUCKETS) + 1),
+                "sites": Counter(),
+            })
+            stats["requests"] += 1
+            stats["total_ms"] += total_ms
+            stats["max_ms"] = max(stats["max_ms"], total_ms)
+            stats["sql_ms"] += sample.sql_ms
+            stats["template_ms"] += sample.template_ms
+            stats["queries"] += sample.queries
+            stats["duplicates"] += sample.duplicates
+            stats["buckets"][bisect_left(BUCKETS, total_ms)] += 1
+            stats["sites"].update(sample.duplicate_sites())
+
+        if time.monotonic() - self.flushed >= settings.PROFILER_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self) -> None:
+        with self.lock:
+            views, self.views = self.views, {}
+            started, self.started = self.started, timezone.now()
+            self.flushed = time.monotonic()
+
+        for view, stats in views.items():
+            logger.info(json.dumps({
+                "view": view,
+                "pid": os.getpid(),
+                "start": started.isoformat(),
+                "end": self.started.isoformat(),
+                **stats,
+                "total_ms": round(stats["total_ms"], 2),
+                "max_ms": round(stats["max_ms"], 2),
+                "sql_ms": round(stats["sql_ms"], 2),
+                "template_ms": round(stats["template_ms"], 2),
+                "sites": dict(stats["sites"].most_common(settings.PROFILER_MAX_SITES)),
+            }))
+
+
+aggregator = Aggregator()
+atexit.register(aggregator.flush)
+
+
+class ProfilerMiddleware:
+    """
+    Measures `PROFILER_SAMPLE_RATE` of the requests: the number of queries, the duplicate queries
+    and where they are run from, the time spent in SQL, in rendering the template responses and in total.
+    Not used when the sample rate is 0.
+    """
+
+    def __init__(self, get_response):
+        if settings.PROFILER_SAMPLE_RATE <= 0:
+            raise MiddlewareNotUsed()
+
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.PROFILER_SAMPLE_RATE:
+            return self.get_response(request)
+
+        sample = request._profiler_sample = Sample()
+        start = time.perf_counter()
+
+        with connection.execute_wrapper(sample):
+            response = self.get_response(request)
+
+        total_ms = (time.perf_counter() - start) * 1000
+        match = request.resolver_match
+        aggregator.add(match.view_name if match is not None else UNRESOLVED, total_ms, sample)
+
+        return response
+
+    def process_template_response(self, request, response):
+        sample = getattr(request, "_profiler_sample", None)
+
+        if sample is not None:
+            start = time.perf_counter()
+
+            def measure_template(response):
+                sample.template_ms += (time.perf_counter() - start) * 1000
+
+            response.add_post_render_callback(measure_template)
+
+        return response
@@ -0,0 +1,179 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from core.tests import TEST_CACHES, ViewQueriesTestCase
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+import registar.settings as settings
+
+from . import harness, profiler
+from .factory import DatasetSize, seed
+from .management.commands.benchmarkurls import BASELINE
+
+
+@override_settings(CACHES=TEST_CACHES)
+class QueryCountTests(TestCase):
+    """
+    Tests that no URL runs more queries on the dataset of the baseline than recorded in it.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initgroups", "--nooutput")
+
+        cls.baseline = harness.load_baseline(BASELINE)
+        cls.dataset = seed(DatasetSize(**cls.baseline["dataset"]))
+
+    def test_queries(self):
+        results = harness.run(self.dataset, repeat=1)
+        endpoints = self.baseline["endpoints"]
+
+        self.assertEqual(results.keys(), endpoints.keys(), "Update the baseline with `benchmarkurls --update-baseline`.")
+
+        for name, measurement in results.items():
+            with self.subTest(name):
+                self.assertEqual(harness.errors({name: measurement}, endpoints), [])
+                self.assertEqual(measurement.status, endpoints[name]["status"])
+                self.assertLessEqual(measurement.queries, endpoints[name]["queries"])
+
+
+class CompareTests(TestCase):
+    """
+    Tests of the comparison with the baseline.
+    """
+    baseline = {"core:index": {"status": 200, "queries": 10}}
+
+    def compare(self, query_threshold: int = 0, baseline: dict | None = None, **values) -> list[tuple[str, str, int]]:
+        measurement = harness.Measurement(**{"sql_ms": 2.0, "wall_ms": 20.0, "size": 1000, **self.baseline["core:index"], **values})
+
+        return [
+            (regression.endpoint, regression.metric, regression.value)
+            for regression in harness.compare(
+                {"core:index": measurement, "core:overview": measurement}, baseline or self.baseline, query_threshold=query_threshold
+            )
+        ]
+
+    def test_unchanged(self):
+        self.assertEqual(self.compare(), [])
+
+    def test_improvement(self):
+        self.assertEqual(self.compare(queries=5), [])
+
+    def test_queries(self):
+        self.assertEqual(self.compare(queries=11), [("core:index", "queries", 11)])
+        self.assertEqual(self.compare(queries=11, query_threshold=1), [])
+
+    def test_status(self):
+        self.assertEqual(self.compare(status=302), [("core:index", "status", 302)])
+
+    def test_error(self):
+        # Endpoints that are not in the baseline must not fail either.
+        self.assertEqual(self.compare(status=403), [("core:index", "error", 403), ("core:overview", "error", 403)])
+
+    def test_allowed_error(self):
+        baseline = {"core:index": {"status": 403, "queries": 10, "allow_error": True}}
+
+        self.assertEqual(self.compare(status=403, baseline=baseline), [("core:overview", "error", 403)])
+
+    def test_timings_not_compared(self):
+        self.assertEqual(self.compare(sql_ms=200.0, wall_ms=2000.0, size=100000), [])
+
+    def test_save_baseline(self):
+        results = {"core:index": harness.Measurement(status=200, queries=10, sql_ms=2.0, wall_ms=20.0, size=1000)}
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "baseline.json"
+            harness.save_baseline(path, {"users": 1}, results)
+
+            self.assertEqual(harness.load_baseline(path), {"dataset": {"users": 1}, "endpoints": self.baseline})
+
+    def test_save_allowed_error(self):
+        results = {
+            name: harness.Measurement(status=403, queries=10, sql_ms=2.0, wall_ms=20.0, size=1000)
+            for name in ("core:index", "core:overview")
+        }
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "baseline.json"
+            harness.save_baseline(path, {"users": 1}, results, allowed_errors=["core:index"])
+
+            self.assertEqual(harness.load_baseline(path)["endpoints"], {
+                "core:index": {"status": 403, "queries": 10, "allow_error": True},
+                "core:overview": {"status": 403, "queries": 10},
+            })
+
+
+class ProfilerTests(ViewQueriesTestCase):
+    """
+    Tests of the profiler middleware and its report.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initgroups", "--nooutput")
+
+        cls.user = get_user_model().objects.create_user(username="user", password="password")
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(settings, "PROFILER_SAMPLE_RATE", 1.0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(profiler.aggregator.views.clear)
+
+        self.client.force_login(self.user)
+
+    def flush(self) -> dict[str, dict]:
+        with self.assertLogs("benchmarks.profiler") as logs:
+            profiler.aggregator.flush()
+
+        return {
+            record["view"]: record for record in (json.loads(record.getMessage()) for record in logs.records)
+        }
+
+    def test_sample(self):
+        self.client.get(reverse("core:coupon_list"))
+        self.client.get(reverse("core:coupon_list"))
+
+        record = self.flush()["core:coupon_list"]
+
+        self.assertEqual(record["requests"], 2)
+        self.assertGreater(record["queries"], 0)
+        self.assertGreater(record["template_ms"], 0)
+        self.assertLessEqual(record["sql_ms"] + record["template_ms"], record["total_ms"])
+        self.assertEqual(sum(record["buckets"]), 2)
+
+    def test_not_sampled(self):
+        with mock.patch.object(settings, "PROFILER_SAMPLE_RATE", 0.0):
+            self.client.get(reverse("core:coupon_list"))
+
+        with self.assertNoLogs("benchmarks.profiler"):
+            profiler.aggregator.flush()
+
+    def test_report(self):
+        self.client.get(reverse("core:coupon_list"))
+        self.client.get(reverse("core:shop_list"))
+        records = self.flush()
+
+        with tempfile.TemporaryDirectory() as directory:
+            log = Path(directory) / "profile.log"
+            log.write_text(json.dumps(records["core:coupon_list"]) + "\n", encoding="utf-8")
+            Path(f"{ log }.1").write_text(
+                "\n".join(json.dumps(record) for record in records.values()) + "\n", encoding="utf-8"
+            )
+
+            stdout = StringIO()
+            call_command("profilereport", "--log", log, "--sort", "queries", stdout=stdout)
+
+        lines = stdout.getvalue().splitlines()
+        self.assertEqual(lines[0], "3 sampled requests of 2 views, sorted by queries.")
+        self.assertEqual(
+            {line.split()[0]: int(line.split()[1]) for line in lines[2:]},
+            {"core:coupon_list": 2, "core:shop_list": 1},
+        )
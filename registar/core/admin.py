@@ -1,33 +1,51 @@
 from django.contrib import admin
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
-from .models import Shop, Coupon
+from .models import Shop, Coupon, UserCouponStats
+from .stats import rebuild_stats, update_coupons
 from groups.models import ShopGroup
 
 
+def update(queryset, **values):
+    """
+    Updates the queryset, coupons are updated through `update_coupons` to keep the statistics of their owners.
+    `date_modified` is set as well, `update()` skips it and the ETags and the sync of the API read it.
+    """
+    values["date_modified"] = timezone.now()
+
+    if queryset.model is Coupon:
+        update_coupons(queryset, **values)
+    else:
+        queryset.update(**values)
+
 @admin.action(description=_("Pin selected item"))
 def pin(modeladmin, request, queryset):
-    queryset.update(is_pinned=True)
+    update(queryset, is_pinned=True)
 
 @admin.action(description=_("Unpin selected item"))
 def unpin(modeladmin, request, queryset):
-    queryset.update(is_pinned=False)
+    update(queryset, is_pinned=False)
 
 @admin.action(description=_("Mark selected coupons as used"))
 def use(modeladmin, request, queryset):
-    queryset.update(is_used=True)
+    update(queryset, is_used=True)
 
 @admin.action(description=_("Mark selected coupons as unused"))
 def unuse(modeladmin, request, queryset):
-    queryset.update(is_used=False)
+    update(queryset, is_used=False)
+
+@admin.action(description=_("Rebuild selected statistics"))
+def rebuild(modeladmin, request, queryset):
+    rebuild_stats(queryset.values_list("user", flat=True))
     
 @admin.action(description=_("Upload selected shops to marketplace"))
 def upload_to_marketplace(modeladmin, request, queryset):
-    queryset.update(is_on_marketplace=True)
+    update(queryset, is_on_marketplace=True)
     
 @admin.action(description=_("Remove selected shops from marketplace"))
 def remove_from_marketplace(modeladmin, request, queryset):
-    queryset.update(is_on_marketplace=False)
+    update(queryset, is_on_marketplace=False)
 
     
 class CouponInline(admin.TabularInline):
@@ -72,6 +90,21 @@ class CouponAdmin(admin.ModelAdmin):
         return obj.owner
 
 
+class UserCouponStatsAdmin(admin.ModelAdmin):
+    """
+    User coupon statistics admin.
+    """
+    actions = [rebuild]
+    list_display = ["user", "total_amount", "returned_amount", "coupon_count", "used_count", "date_modified"]
+    readonly_fields = [field.name for field in UserCouponStats._meta.fields]
+    search_fields = ["user__username", "user__email"]
+    search_help_text = _("Search by username, email")
+
+    def has_add_permission(self, request):
+        return False
+
+
 admin.site.register(Shop, ShopAdmin)
 admin.site.register(Coupon, CouponAdmin)
+admin.site.register(UserCouponStats, UserCouponStatsAdmin)
 
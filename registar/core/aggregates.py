@@ -0,0 +1,29 @@
+from django.db.models import (Count, DecimalField, IntegerField, Max,
+                              QuerySet, Subquery, Sum, Value)
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(queryset: QuerySet, group_by: str) -> Coalesce:
+    """
+    Returns the number of rows of the queryset as a scalar subquery. The queryset must be filtered
+    on an `OuterRef` and `group_by` must be the field it is filtered on.
+    """
+    count = queryset.order_by().values(group_by).annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(count), Value(0), output_field=IntegerField())
+
+
+def sum_subquery(queryset: QuerySet, group_by: str, field: str) -> Coalesce:
+    """
+    Returns the sum of the `field` over the queryset as a scalar subquery, see `count_subquery`.
+    """
+    total = queryset.order_by().values(group_by).annotate(total=Sum(field)).values('total')
+    return Coalesce(Subquery(total), Value(0), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def max_subquery(queryset: QuerySet, group_by: str, field: str) -> Subquery:
+    """
+    Returns the largest value of the `field` over the queryset as a scalar subquery, `NULL` if it is empty,
+    see `count_subquery`.
+    """
+    latest = queryset.order_by().values(group_by).annotate(latest=Max(field)).values('latest')
+    return Subquery(latest)
@@ -6,3 +6,6 @@ class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
     verbose_name = _('core')
+
+    def ready(self):
+        import core.signals
@@ -0,0 +1,265 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterable, Iterator
+
+from django.core.cache import caches
+from metrics.collectors import BARCODE_CACHE, BARCODE_FAILURES, BARCODE_SECONDS
+from numpy import frombuffer, memmap, uint8
+
+import registar.settings as settings
+
+from .utils import NoBarcodeData, NoBarcodeDetected, extract_barcode
+
+logger = logging.getLogger(__name__)
+
+
+class BarcodeServiceBusy(Exception):
+    pass
+
+class BarcodeTimeout(Exception):
+    pass
+
+
+def open_image_buffer(source):
+    """
+    Returns the encoded image as an `uint8` array without copying it. The source is either
+    a bytes-like object or the path of a file, which is memory-mapped.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        return memmap(source, dtype=uint8, mode="r")
+
+    return frombuffer(source, uint8)
+
+
+def decode_image(source) -> str:
+    """
+    Extracts the barcode from the encoded image. Runs inside a worker process.
+    """
+    return extract_barcode(open_image_buffer(source))
+
+
+class BarcodeDecodingService:
+    """
+    Decodes barcodes in a bounded pool of worker processes.
+
+    At most `queue_depth` jobs can be queued or running at the same time, any job above that
+    is rejected with `BarcodeServiceBusy` instead of waiting for a free worker. If `workers` is 0,
+    or the pool cannot be started, images are decoded in the current process.
+    """
+
+    def __init__(self, workers: int, queue_depth: int, timeout: float):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.timeout = timeout
+
+        self._slots = threading.BoundedSemaphore(queue_depth)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def decode(self, source) -> str:
+        """
+        Returns the barcode found in the image, given as bytes or as a file path. Raises
+        `BarcodeServiceBusy` if the queue is full and `BarcodeTimeout` if the worker did not finish in time.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise BarcodeServiceBusy("Too many images are being decoded at the moment.")
+
+        try:
+            future = self._submit(source)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        # The slot is held until the job really finishes, even if the caller gave up waiting.
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            return future.result(timeout=self.timeout)
+
+        except FutureTimeoutError as exc:
+            future.cancel()
+            raise BarcodeTimeout("Decoding the image took too long.") from exc
+
+        except BrokenProcessPool as exc:
+            logger.error("Barcode worker pool crashed, it will be restarted on the next job")
+            self._reset_executor()
+            raise BarcodeServiceBusy("Barcode worker pool is not available.") from exc
+
+    def decode_all(self, sources: Iterable) -> Iterator[Future]:
+        """
+        Submits the images, for an import, and yields the future of every image in order. Unlike `decode` it
+        waits up to `timeout` for a free slot of the queue instead of failing, so imports and uploads share
+        the workers without ever queueing more than `queue_depth` jobs. A future fails with `BarcodeServiceBusy`
+        if no slot was freed in time. Closing the iterator cancels the jobs that did not start yet.
+        """
+        pending = deque()
+
+        try:
+            for source in sources:
+                if self._slots.acquire(timeout=self.timeout):
+                    try:
+                        future = self._submit(source)
+                    except BaseException:
+                        self._slots.release()
+                        raise
+
+                    future.add_done_callback(lambda _: self._slots.release())
+                else:
+                    future = Future()
+                    future.set_exception(BarcodeServiceBusy("Too many images are being decoded at the moment."))
+
+                pending.append(future)
+
+                while pending and pending[0].done():
+                    yield pending.popleft()
+
+            while pending:
+                yield pending.popleft()
+
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def shutdown(self):
+        """
+        Stops the worker processes.
+        """
+        self._reset_executor()
+
+    def _submit(self, source) -> Future:
+        executor = self._get_executor()
+
+        if executor is not None:
+            try:
+                return executor.submit(decode_image, source)
+            except (BrokenProcessPool, RuntimeError):
+                logger.warning("Barcode worker pool is broken, decoding the image in-process")
+                self._reset_executor()
+
+        return self._decode_locally(source)
+
+    def _decode_locally(self, source) -> Future:
+        future = Future()
+
+        try:
+            future.set_result(decode_image(source))
+        except Exception as exc:
+            future.set_exception(exc)
+
+        return future
+
+    def _get_executor(self):
+        if self.workers <= 0:
+            return None
+
+        with self._lock:
+            if self._executor is None:
+                try:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                except (OSError, NotImplementedError):
+                    logger.warning("Could not start the barcode worker pool, decoding images in-process")
+                    self.workers = 0
+
+            return self._executor
+
+    def _reset_executor(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+_service = None
+_service_pid = None
+
+
+def get_barcode_service() -> BarcodeDecodingService:
+    """
+    Returns the barcode decoding service of the current process.
+    """
+    global _service, _service_pid
+
+    # Worker pools must not be shared between forked server processes.
+    if _service is None or _service_pid != os.getpid():
+        _service = BarcodeDecodingService(
+            workers=settings.BARCODE_WORKERS,
+            queue_depth=settings.BARCODE_QUEUE_DEPTH,
+            timeout=settings.BARCODE_TIMEOUT,
+        )
+        _service_pid = os.getpid()
+
+    return _service
+
+
+# Failures that depend only on the image bytes, so they are cached like barcodes.
+CACHEABLE_ERRORS = {exc.__name__: exc for exc in (NoBarcodeDetected, NoBarcodeData)}
+
+
+def image_digest(source) -> str:
+    """
+    Returns a hash of the image bytes, used as the cache key.
+    """
+    return hashlib.blake2b(open_image_buffer(source), digest_size=16).hexdigest()
+
+
+def barcode_cache_key(source) -> str:
+    """
+    Returns the key of the image in the barcode cache. Cached values are `(error, value)` pairs,
+    where `error` is the name of one of `CACHEABLE_ERRORS` or `None` if `value` is the barcode.
+    """
+    return f"barcode:{ image_digest(source) }"
+
+
+def decode_with_cache(source) -> str:
+    """
+    Returns the barcode found in the image, using the shared barcode cache to skip
+    decoding images that were already seen. Failures to find a barcode are cached as well.
+    """
+    cache = caches[settings.BARCODE_CACHE]
+    key = barcode_cache_key(source)
+
+    cached = cache.get(key)
+    BARCODE_CACHE.labels("miss" if cached is None else "hit").inc()
+
+    if cached is not None:
+        # Every hit extends the lifetime of the entry, so often uploaded images stay in the cache.
+        cache.touch(key)
+        error, value = cached
+
+        if error:
+            BARCODE_FAILURES.labels(error).inc()
+            raise CACHEABLE_ERRORS[error](value)
+
+        return value
+
+    start = time.perf_counter()
+    result = "error"
+
+    try:
+        barcode = get_barcode_service().decode(source)
+        result = "barcode"
+
+    except tuple(CACHEABLE_ERRORS.values()) as exc:
+        result = type(exc).__name__
+        BARCODE_FAILURES.labels(result).inc()
+        cache.set(key, (result, str(exc)))
+        raise
+
+    except (BarcodeServiceBusy, BarcodeTimeout) as exc:
+        result = type(exc).__name__
+        raise
+
+    finally:
+        BARCODE_SECONDS.labels(result).observe(time.perf_counter() - start)
+
+    cache.set(key, (None, barcode))
+
+    return barcode
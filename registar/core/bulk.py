@@ -0,0 +1,38 @@
+from typing import Iterable
+
+from django.db import models
+
+
+def bulk_upsert(model: type[models.Model], objs: Iterable[models.Model], unique_field: str, update_fields: list[str]) -> int:
+    """
+    Updates the `update_fields` of the rows whose `unique_field` equals the one of an object and inserts the
+    other objects, with a lookup, a `bulk_update` and a `bulk_create`. `bulk_create(update_conflicts=True)`
+    needs the conflicting field on SQLite and PostgreSQL, but MySQL rejects it, so it works on no backend alone.
+    Rows inserted concurrently between the lookup and the insert are kept. Returns the number of objects.
+    """
+    objs = list(objs)
+    field = model._meta.get_field(unique_field)
+    existing = dict(
+        model._default_manager.filter(**{f"{ unique_field }__in": [getattr(obj, field.attname) for obj in objs]})
+        .values_list(unique_field, "pk")
+    )
+    updated, created = [], []
+
+    for obj in objs:
+        pk = existing.get(getattr(obj, field.attname))
+
+        if pk is None:
+            created.append(obj)
+        else:
+            obj.pk = pk
+            # `bulk_update` does not call `pre_save`, which sets the `auto_now` fields.
+            for name in update_fields:
+                model._meta.get_field(name).pre_save(obj, add=False)
+            updated.append(obj)
+
+    if updated:
+        model._default_manager.bulk_update(updated, update_fields)
+    if created:
+        model._default_manager.bulk_create(created, ignore_conflicts=True)
+
+    return len(objs)
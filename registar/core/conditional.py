@@ -0,0 +1,44 @@
+import hashlib
+
+from django.db.models import Count, Max, QuerySet, Sum
+from django.utils import translation
+from exchange.services import get_currency, get_rates
+
+from .aggregates import count_subquery, max_subquery
+
+
+def fingerprint(queryset: QuerySet, field: str = "date_modified", related: dict | None = None) -> dict:
+    """
+    Returns the number of objects of the queryset and the latest `field`, in one query. Every related
+    queryset of `related` is a `(queryset, group_by, field)` tuple like the ones of `count_subquery`,
+    filtered on `OuterRef("pk")`, its rows are counted and their latest `field` is added.
+
+    Together they change whenever an object is added, changed or deleted, if every change sets the field.
+    """
+    aggregates = {"count": Count("pk"), "latest": Max(field)}
+
+    for name, (related_queryset, group_by, related_field) in (related or {}).items():
+        aggregates[f"{ name }_count"] = Sum(count_subquery(related_queryset, group_by))
+        aggregates[f"{ name }_latest"] = Max(max_subquery(related_queryset, group_by, related_field))
+
+    return queryset.order_by().aggregate(**aggregates)
+
+
+def make_etag(request, *parts) -> str:
+    """
+    Returns a weak ETag of the parts for the response to the request. The user, the path with the query,
+    the language, the currency and the date of the rates are added, so a response is not reused when one
+    of them changes. So is the session, the pages have the CSRF token of the login in their forms.
+    """
+    rates = get_rates()
+    parts = (
+        request.user.pk,
+        request.get_full_path(),
+        translation.get_language(),
+        get_currency(request),
+        rates.date_fetched,
+        request.session.session_key,
+        *parts,
+    )
+
+    return f'W/"{ hashlib.sha256(repr(parts).encode()).hexdigest() }"'
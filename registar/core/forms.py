@@ -1,19 +1,68 @@
+import zipfile
 from typing import Any
 from django import forms
 from django.core.exceptions import ValidationError
+from django.template.defaultfilters import filesizeformat
 from django.utils.translation import gettext_lazy as _
 
-from numpy import frombuffer, uint8
+import registar.settings as settings
 
+from .barcode import BarcodeServiceBusy, BarcodeTimeout, decode_with_cache
+from .importing import archive_members
 from .models import Coupon, Shop
-from .utils import extract_barcode, NoBarcodeData, NoBarcodeDetected
+from .uploadhandlers import image_source
+from .utils import NoBarcodeData, NoBarcodeDetected, sniff_image_format
+
+
+class CouponImageField(forms.FileField):
+    """
+    A file field for coupon images. Checks the size and the header of the file,
+    instead of decoding the whole image with Pillow like `ImageField` does.
+    """
+    default_error_messages = {
+        "invalid_image": _(
+            "Upload a valid image. The file you uploaded was either not an "
+            "image or a corrupted image."
+        ),
+        "too_large": _("The image is too large. The maximum size is %(max_size)s."),
+    }
+
+    def to_python(self, data):
+        image = super().to_python(data)
+
+        if image is None:
+            return None
+
+        if image.size > settings.COUPON_IMAGE_MAX_SIZE:
+            raise ValidationError(
+                self.error_messages["too_large"],
+                code="too_large",
+                params={"max_size": filesizeformat(settings.COUPON_IMAGE_MAX_SIZE)},
+            )
+
+        image.seek(0)
+        header = image.read(16)
+        image.seek(0)
+
+        if sniff_image_format(header) is None:
+            raise ValidationError(self.error_messages["invalid_image"], code="invalid_image")
+
+        return image
+
+    def widget_attrs(self, widget):
+        attrs = super().widget_attrs(widget)
+
+        if isinstance(widget, forms.FileInput) and "accept" not in widget.attrs:
+            attrs.setdefault("accept", "image/*")
+
+        return attrs
 
 
 class CouponForm(forms.ModelForm):
     """
     A form that creates a coupon.
     """
-    coupon_image = forms.ImageField(required=False, label=_("Coupon image"))
+    coupon_image = CouponImageField(required=False, label=_("Coupon image"))
     barcode = forms.CharField(required=False, label=_("Barcode"))
 
     class Meta:
@@ -54,10 +103,9 @@ class CouponForm(forms.ModelForm):
             return cleaned_data
 
         coupon_image = self.cleaned_data.get("coupon_image")
-        numpy_image = frombuffer(coupon_image.read(), uint8)
 
         try:
-            barcode = extract_barcode(numpy_image)
+            barcode = decode_with_cache(image_source(coupon_image))
 
         except NoBarcodeDetected:
             raise ValidationError(_("No barcode detected in the image."))
@@ -65,6 +113,80 @@ class CouponForm(forms.ModelForm):
         except NoBarcodeData:
             raise ValidationError(_("No data found in the barcode."))
 
+        except BarcodeServiceBusy:
+            raise ValidationError(_("Too many images are being processed right now. Please try again later."))
+
+        except BarcodeTimeout:
+            raise ValidationError(_("The image took too long to process. Please enter the barcode manually."))
+
         self.cleaned_data["barcode"] = barcode
 
         return cleaned_data
+
+
+class MultipleFileInput(forms.ClearableFileInput):
+    allow_multiple_selected = True
+
+
+class MultipleFileField(forms.FileField):
+    """
+    A file field, that accepts several files at once.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("widget", MultipleFileInput())
+        super().__init__(*args, **kwargs)
+
+    def clean(self, data, initial=None):
+        single_file_clean = super().clean
+
+        if isinstance(data, (list, tuple)):
+            return [single_file_clean(file, initial) for file in data]
+
+        return [single_file_clean(data, initial)] if data else []
+
+
+class CouponImportForm(forms.Form):
+    """
+    A form that imports coupons from a ZIP archive or from several images.
+    """
+    store = forms.ModelChoiceField(queryset=Shop.objects.none(), label=_("Store"))
+    amount = forms.DecimalField(max_digits=10, decimal_places=2, min_value=0, label=_("Amount"), localize=True)
+    archive = forms.FileField(required=False, label=_("ZIP archive"), widget=forms.ClearableFileInput(attrs={"accept": ".zip"}))
+    images = MultipleFileField(required=False, label=_("Coupon images"), widget=MultipleFileInput(attrs={"accept": "image/*"}))
+
+    def __init__(self, *args, **kwargs):
+        self.user = kwargs.pop('user', None)
+        super().__init__(*args, **kwargs)
+        self.fields['store'].queryset = Shop.objects.filter(owner=self.user.pk)
+
+    def clean_archive(self):
+        archive = self.cleaned_data["archive"]
+        self.archive_files = 0
+
+        if not archive:
+            return archive
+
+        try:
+            with zipfile.ZipFile(archive) as zip_file:
+                self.archive_files = len(archive_members(zip_file))
+        except zipfile.BadZipFile:
+            raise ValidationError(_("The uploaded file is not a ZIP archive."))
+
+        archive.seek(0)
+        return archive
+
+    def clean(self):
+        cleaned_data = super().clean()
+
+        if not cleaned_data.get("archive") and not cleaned_data.get("images"):
+            raise ValidationError(_("You must provide either a ZIP archive or images!"))
+
+        # The members of the archive are counted from its directory, before any of them is extracted.
+        if len(cleaned_data.get("images") or []) + getattr(self, "archive_files", 0) > settings.COUPON_IMPORT_MAX_FILES:
+            raise ValidationError(
+                _("You can upload at most %(count)d images at once."),
+                params={"count": settings.COUPON_IMPORT_MAX_FILES},
+            )
+
+        return cleaned_data
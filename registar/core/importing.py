@@ -0,0 +1,262 @@
+import logging
+import os
+import time
+import zipfile
+import zlib
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from decimal import Decimal
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple
+
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+
+import registar.settings as settings
+
+from .barcode import (CACHEABLE_ERRORS, BarcodeDecodingService,
+                      BarcodeServiceBusy, barcode_cache_key,
+                      get_barcode_service)
+from .models import Coupon, Shop
+from .stats import coupon_state, coupons_changed
+from .uploadhandlers import image_source
+from .utils import sniff_image_format
+
+logger = logging.getLogger(__name__)
+
+
+ERROR_MESSAGES = {
+    "NoBarcodeDetected": _("No barcode detected in the image."),
+    "NoBarcodeData": _("No data found in the barcode."),
+    "too_large": _("The image is too large."),
+    "invalid_image": _("The file is not a supported image."),
+    "unreadable": _("The image could not be read."),
+    "timeout": _("Decoding the image took too long."),
+    "busy": _("The barcode decoder is busy, upload the image again later."),
+    "time_limit": _("Not imported, the import took too long. Upload the image again."),
+}
+
+
+# Errors of reading a member of an archive: a corrupt or truncated member, a bad CRC, an encrypted member
+# or an unsupported compression method.
+ARCHIVE_ERRORS = (zipfile.BadZipFile, zlib.error, EOFError, RuntimeError, NotImplementedError)
+
+
+class ImportFile(NamedTuple):
+    """
+    An image to import. `source` is the image bytes or a file path, it is `None` when
+    the image is too large to be read, or could not be read, then `error` is the key of `ERROR_MESSAGES`.
+    """
+    name: str
+    source: bytes | str | None
+    size: int
+    error: str | None = None
+
+
+class ImportResult(NamedTuple):
+    name: str
+    coupon: Coupon | None = None
+    error: str | None = None
+
+
+def archive_members(zip_file: zipfile.ZipFile) -> list[zipfile.ZipInfo]:
+    """
+    Returns the members of a ZIP archive to import, without directories and hidden files.
+    """
+    return [
+        info for info in zip_file.infolist()
+        if not (info.is_dir() or info.filename.startswith("__MACOSX/") or Path(info.filename).name.startswith("."))
+    ]
+
+
+def files_from_archive(archive) -> Iterator[ImportFile]:
+    """
+    Yields the files of a ZIP archive, see `archive_members`. Members above `COUPON_IMAGE_MAX_SIZE`
+    are not extracted, members that cannot be extracted are yielded as unreadable.
+    """
+    with zipfile.ZipFile(archive) as zip_file:
+        for info in archive_members(zip_file):
+            if info.file_size > settings.COUPON_IMAGE_MAX_SIZE:
+                yield ImportFile(info.filename, None, info.file_size, "too_large")
+                continue
+
+            try:
+                source = zip_file.read(info)
+            except ARCHIVE_ERRORS as exc:
+                logger.warning("Could not extract %s from the archive: %s", info.filename, exc)
+                yield ImportFile(info.filename, None, info.file_size, "unreadable")
+            else:
+                yield ImportFile(info.filename, source, info.file_size)
+
+
+def files_from_uploads(uploaded_files) -> Iterator[ImportFile]:
+    """
+    Yields the uploaded images.
+    """
+    for uploaded_file in uploaded_files:
+        if uploaded_file.size > settings.COUPON_IMAGE_MAX_SIZE:
+            yield ImportFile(uploaded_file.name, None, uploaded_file.size)
+        else:
+            yield ImportFile(uploaded_file.name, image_source(uploaded_file), uploaded_file.size)
+
+
+def files_from_paths(paths) -> Iterator[ImportFile]:
+    """
+    Yields image files, the images inside directories and the contents of ZIP archives.
+    """
+    for path in map(Path, paths):
+        if path.is_dir():
+            yield from files_from_paths(sorted(child for child in path.rglob("*") if child.is_file() and not child.name.startswith(".")))
+
+        elif zipfile.is_zipfile(path):
+            yield from files_from_archive(path)
+
+        else:
+            yield ImportFile(str(path), str(path), path.stat().st_size)
+
+
+def decode_sources(service: BarcodeDecodingService, sources, deadline: float | None = None) -> Iterator[tuple[str | None, str | None, str | None]]:
+    """
+    Yields `(barcode, error code, error message)` for the images decoded by the service, in order, where the
+    error code is a key of `ERROR_MESSAGES`. Stops when `deadline`, a `time.monotonic()` value, passes.
+    """
+    futures = service.decode_all(sources)
+
+    try:
+        for future in futures:
+            timeout = service.timeout if deadline is None else min(service.timeout, deadline - time.monotonic())
+
+            try:
+                yield future.result(timeout=max(timeout, 0)), None, None
+
+            except FutureTimeoutError:
+                if deadline is not None and time.monotonic() >= deadline:
+                    return
+
+                future.cancel()
+                yield None, "timeout", "Decoding the image took too long."
+
+            except tuple(CACHEABLE_ERRORS.values()) as exc:
+                yield None, type(exc).__name__, str(exc)
+
+            except (BarcodeServiceBusy, BrokenProcessPool) as exc:
+                yield None, "busy", str(exc)
+
+            except Exception as exc:
+                yield None, "unreadable", str(exc)
+
+            if deadline is not None and time.monotonic() >= deadline:
+                return
+
+    finally:
+        futures.close()
+
+
+def import_coupons(owner, shop: Shop, amount: Decimal, files: Iterable[ImportFile],
+                   service: BarcodeDecodingService | None = None, batch_size: int | None = None,
+                   deadline: float | None = None) -> list[ImportResult]:
+    """
+    Creates a coupon for every image with a barcode. Barcodes are decoded by the `service`, the shared
+    barcode decoding service of the process by default, as many images at a time as its queue holds, so only
+    those are read into memory. The coupons are inserted in batches of `batch_size`, every batch in its own
+    transaction with the statistics. Once `deadline`, a `time.monotonic()` value, passes, no more images are
+    decoded: the coupons decoded so far are inserted, the batches inserted before are kept, and the other
+    images are reported as `time_limit`, so they can be imported again. Returns a result for every file, in order.
+    """
+    service = service or get_barcode_service()
+    batch_size = batch_size or settings.COUPON_IMPORT_BATCH_SIZE
+    results, coupons = [], []
+    files = iter(files)
+
+    while window := list(islice(files, service.queue_depth)):
+        for file, (barcode, error) in zip(window, _decode_window(window, service, deadline)):
+            if barcode is None:
+                results.append(ImportResult(file.name, error=ERROR_MESSAGES[error]))
+                continue
+
+            coupon = Coupon(barcode=barcode, amount=amount, store=shop, owner=owner)
+            coupon.title = coupon.get_default_title()
+
+            coupons.append(coupon)
+            results.append(ImportResult(file.name, coupon=coupon))
+
+        if len(coupons) >= batch_size:
+            _insert(coupons)
+            coupons = []
+
+    _insert(coupons)
+
+    logger.info("User %s (pk: %d) imported %d of %d coupons to shop %s (pk: %s)",
+                owner,
+                owner.pk,
+                sum(result.coupon is not None for result in results),
+                len(results),
+                shop.title,
+                shop.pk
+    )
+    return results
+
+
+def _decode_window(window, service, deadline) -> list[tuple[str | None, str | None]]:
+    """
+    Returns `(barcode, error code)` for every file of the window, from the barcode cache or decoded by the service.
+    """
+    cache = caches[settings.BARCODE_CACHE]
+    decoded = {}
+
+    for index, file in enumerate(window):
+        if file.error is not None:
+            decoded[index] = (None, file.error)
+        elif file.source is None or file.size > settings.COUPON_IMAGE_MAX_SIZE:
+            decoded[index] = (None, "too_large")
+        elif sniff_image_format(_header(file.source)) is None:
+            decoded[index] = (None, "invalid_image")
+
+    pending = [index for index in range(len(window)) if index not in decoded]
+    keys = {index: barcode_cache_key(window[index].source) for index in pending}
+    cached = cache.get_many(keys.values())
+
+    for index in pending:
+        if keys[index] in cached:
+            error, value = cached[keys[index]]
+            decoded[index] = (None, error) if error else (value, None)
+
+    misses = [index for index in pending if index not in decoded]
+    to_cache = {}
+
+    if deadline is None or time.monotonic() < deadline:
+        sources = [window[index].source for index in misses]
+
+        for index, (barcode, error, message) in zip(misses, decode_sources(service, sources, deadline)):
+            decoded[index] = (barcode, error)
+
+            if error in CACHEABLE_ERRORS:
+                to_cache[keys[index]] = (error, message)
+            elif barcode is not None:
+                to_cache[keys[index]] = (None, barcode)
+
+    for index in misses:
+        decoded.setdefault(index, (None, "time_limit"))
+
+    cache.set_many(to_cache)
+
+    return [decoded[index] for index in range(len(window))]
+
+
+def _insert(coupons: list[Coupon]):
+    if not coupons:
+        return
+
+    with transaction.atomic():
+        Coupon.objects.bulk_create(coupons)
+        coupons_changed([None] * len(coupons), map(coupon_state, coupons))
+
+
+def _header(source) -> bytes:
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as file:
+            return file.read(16)
+
+    return bytes(source[:16])
@@ -0,0 +1,85 @@
+import time
+from pathlib import Path
+
+from django.core.management import BaseCommand, CommandError
+from django.utils.translation import gettext as _
+from numpy import fromfile, uint8
+
+from core.utils import (DECODE_PASSES, DecodeContext, NoBarcodeData,
+                        NoBarcodeDetected, decode_barcode, run_decode_pass)
+
+
+class Command(BaseCommand):
+    """
+    Benchmarks the barcode decoding passes on a directory of coupon photos.
+    """
+    help = _('Measures decode time and hit rate of every barcode decoding pass.')
+    image_suffixes = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+
+    def add_arguments(self, parser):
+        parser.add_argument("directory", help=_("Directory with sample coupon photos."))
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help=_("How many times every image is decoded, the best time is reported."),
+        )
+
+    def handle(self, *args, **options):
+        directory = Path(options["directory"])
+        images = sorted(path for path in directory.rglob("*") if path.suffix.lower() in self.image_suffixes)
+
+        if not images:
+            raise CommandError(f"No images found in { directory }.")
+
+        repeat = max(options["repeat"], 1)
+        pass_stats = {name: {"hits": 0, "seconds": 0.0} for name, _decode_pass in DECODE_PASSES}
+        pyramid_stats = {"hits": 0, "seconds": 0.0, "winners": {name: 0 for name in pass_stats}}
+
+        for path in images:
+            image = fromfile(path, dtype=uint8)
+
+            for name, decode_pass in DECODE_PASSES:
+                seconds, barcodes = self._best_of(repeat, lambda: run_decode_pass(decode_pass, DecodeContext(image)))
+                pass_stats[name]["seconds"] += seconds
+                pass_stats[name]["hits"] += any(barcode.data for barcode in barcodes)
+
+            seconds, result = self._best_of(repeat, lambda: self._decode(image))
+            pyramid_stats["seconds"] += seconds
+
+            if result is not None:
+                pyramid_stats["hits"] += 1
+                pyramid_stats["winners"][result.decode_pass] += 1
+
+        total = len(images)
+        self.stdout.write(f"Decoded { total } images, best of { repeat } runs\n")
+        self.stdout.write(f"{ 'pass':<12}{ 'hit rate':>10}{ 'avg ms':>10}{ 'won':>6}")
+
+        for name, stats in pass_stats.items():
+            self.stdout.write(
+                f"{ name:<12}{ stats['hits'] / total:>10.1%}{ stats['seconds'] / total * 1000:>10.1f}"
+                f"{ pyramid_stats['winners'][name]:>6}"
+            )
+
+        self.stdout.write(
+            f"{ 'pyramid':<12}{ pyramid_stats['hits'] / total:>10.1%}{ pyramid_stats['seconds'] / total * 1000:>10.1f}"
+        )
+
+    @staticmethod
+    def _decode(image):
+        try:
+            return decode_barcode(image)
+        except (NoBarcodeDetected, NoBarcodeData):
+            return None
+
+    @staticmethod
+    def _best_of(repeat, func):
+        best, result = None, None
+
+        for _run in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        return best, result
@@ -0,0 +1,141 @@
+import time
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils.translation import gettext as _
+from groups.models import Group, GroupMembership, ShopGroup
+
+from core.models import Coupon, Shop
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    """
+    Benchmarks the visibility queries of the API lists against the former joined and deduplicated queries,
+    and against correlated `EXISTS` subqueries.
+    """
+    help = _(
+        'Compares the plans, timings and results of the queries of the objects visible to a user in many groups '
+        'on generated data, which is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--groups", type=int, default=50, help=_("Number of groups the user is a member of."))
+        parser.add_argument("--shops", type=int, default=5, help=_("Number of shops of every group."))
+        parser.add_argument("--coupons", type=int, default=20, help=_("Number of coupons of every shop."))
+        parser.add_argument("--own-coupons", type=int, default=1000, help=_("Number of coupons of the user."))
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help=_("How many times every query is run, the best time is reported."),
+        )
+        parser.add_argument("--explain", action="store_true", help=_("Print the query plans."))
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                user = self._create_data(options["groups"], options["shops"], options["coupons"], options["own_coupons"])
+                self._compare(user, max(options["repeat"], 1), options["explain"])
+                raise Rollback()
+
+        except Rollback:
+            pass
+
+    def _compare(self, user, repeat, explain):
+        shared = ShopGroup.objects.filter(group__groupmembership__user=user)
+        models = {
+            "coupons": {
+                "joined": Coupon.objects.filter(Q(owner=user.pk) | Q(store__groups__members=user.pk)).distinct(),
+                "exists": Coupon.objects.filter(Q(owner=user.pk) | Exists(shared.filter(shop=OuterRef("store")))),
+                "union": Coupon.objects.visible_to(user),
+            },
+            "shops": {
+                "joined": Shop.objects.filter(Q(owner=user.pk) | Q(groups__members=user.pk)).distinct(),
+                "exists": Shop.objects.filter(Q(owner=user.pk) | Exists(shared.filter(shop=OuterRef("pk")))),
+                "union": Shop.objects.visible_to(user),
+            },
+            "groups": {
+                "joined": Group.objects.filter(Q(owner=user.pk) | Q(members=user.pk)).distinct(),
+                "exists": Group.objects.filter(
+                    Q(owner=user.pk) | Exists(GroupMembership.objects.filter(group=OuterRef("pk"), user=user))
+                ),
+                "union": Group.objects.visible_to(user),
+            },
+        }
+
+        for model, querysets in models.items():
+            self.stdout.write(f"==== { model } ====")
+
+            for name, queryset in querysets.items():
+                ordered = queryset.order_by("-date_added", "-id")
+                queries = {
+                    "first page": lambda: list(ordered.values_list("pk", flat=True)[:11]),
+                    "count": ordered.count,
+                    "all": lambda: list(ordered.values_list("pk", flat=True)),
+                }
+
+                if explain:
+                    self.stdout.write(ordered[:11].explain())
+
+                results = {}
+
+                for query, run in queries.items():
+                    best = None
+
+                    for _run in range(repeat):
+                        start = time.perf_counter()
+                        results[query] = run()
+                        elapsed = time.perf_counter() - start
+                        best = elapsed if best is None else min(best, elapsed)
+
+                    self.stdout.write(f"{ name:8} { query:12} { best * 1000:8.2f} ms")
+
+                if name == "joined":
+                    expected = results["all"]
+                elif results["all"] != expected:
+                    self.stdout.write(self.style.ERROR(f"The { model } visible to the user differ."))
+
+            self.stdout.write(f"{ len(expected) } { model } visible\n")
+
+    @staticmethod
+    def _create_data(groups, shops, coupons, own_coupons):
+        User = get_user_model()
+        prefix = uuid.uuid4().hex[:8]
+
+        user, owner = User.objects.bulk_create(User(username=f"benchmark-{ prefix }-{ index }") for index in range(2))
+
+        groups = Group.objects.bulk_create(Group(title=f"Group { index }", owner=owner) for index in range(groups))
+        GroupMembership.objects.bulk_create(GroupMembership(user=user, group=group) for group in groups)
+
+        shared_shops = Shop.objects.bulk_create(
+            Shop(title=f"Shop { index }", owner=owner) for index in range(len(groups) * shops)
+        )
+        # Every shop is in two groups, so the joined query finds most coupons twice.
+        ShopGroup.objects.bulk_create(
+            ShopGroup(shop=shop, group=groups[(index // shops + offset) % len(groups)])
+            for index, shop in enumerate(shared_shops)
+            for offset in {0, 1 % len(groups)}
+        )
+
+        own_shop = Shop.objects.create(title="Own shop", owner=user)
+        Coupon.objects.bulk_create(
+            (
+                Coupon(barcode=str(index), amount=Decimal("1.25"), store=shop, owner=owner)
+                for index, shop in enumerate(shop for shop in shared_shops for _coupon in range(coupons))
+            ),
+            batch_size=1000,
+        )
+        Coupon.objects.bulk_create(
+            (Coupon(barcode=str(index), amount=Decimal("1.25"), store=own_shop, owner=user) for index in range(own_coupons)),
+            batch_size=1000,
+        )
+
+        return user
@@ -0,0 +1,91 @@
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.db import NotSupportedError, connection
+from django.db.models import Count, OuterRef
+from django.utils.translation import gettext as _
+from groups.models import Group, GroupMembership, Invitation, ShopGroup
+
+from core.aggregates import sum_subquery
+from core.models import Coupon, Shop
+
+
+class Command(BaseCommand):
+    """
+    Prints the query plans of the hot list queries.
+    """
+    help = _('Prints EXPLAIN output of the list queries of the views, to check which indexes they use.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "username",
+            nargs="?",
+            help=_("User the queries are run for, the user with the most coupons if omitted."),
+        )
+        parser.add_argument("--format", help=_("Output format of EXPLAIN, e.g. JSON or TREE on MySQL."))
+        parser.add_argument(
+            "--analyze",
+            action="store_true",
+            help=_("Run the queries and show the actual costs, where the database supports it."),
+        )
+
+    def handle(self, *args, **options):
+        user = self._get_user(options["username"])
+        explain_options = {"analyze": True} if options["analyze"] else {}
+
+        self.stdout.write(f"Query plans on { connection.vendor } for user { user } (pk: { user.pk })\n")
+
+        for name, queryset in self.get_queries(user).items():
+            self.stdout.write(f"==== { name } ====")
+
+            try:
+                self.stdout.write(queryset.explain(format=options["format"], **explain_options))
+            except (NotSupportedError, ValueError) as exc:
+                raise CommandError(str(exc)) from exc
+
+            self.stdout.write("")
+
+    @staticmethod
+    def get_queries(user) -> dict:
+        """
+        Returns the hot queries of the views, as they are built there.
+        """
+        coupons = Coupon.objects.filter(owner=user.pk)
+        shops = Shop.objects.filter(owner=user.pk)
+
+        return {
+            "core.IndexView pinned coupons": coupons.filter(is_used=False, is_pinned=True).order_by("-date_added")[:3],
+            "core.IndexView recent coupons": coupons.order_by("-date_added")[:3],
+            "core.IndexView pinned shops": shops.filter(is_pinned=True).order_by("-date_added")[:3],
+            "core.CouponListView": coupons.order_by("-is_pinned", "is_used", "-date_added")[:6],
+            "core.ShopListView": shops.annotate(count=Count("coupon", distinct=True)).order_by("-is_pinned", "-date_added")[:6],
+            "core.ShopDetailView coupons": Coupon.objects.filter(store__owner=user.pk, owner=user.pk).order_by("-is_pinned", "-date_added")[:6],
+            "Shop unused amounts": shops.annotate(
+                amount_unused=sum_subquery(Coupon.objects.filter(store=OuterRef("pk"), is_used=False), "store", "amount")
+            ),
+            "groups.GroupsListView": Group.objects.filter(owner=user.pk).order_by("-is_pinned", "-date_added")[:6],
+            "groups.GroupsListView memberships": GroupMembership.objects.filter(user=user.pk).select_related("group__owner").order_by("-is_pinned", "-date_joined"),
+            "groups.GroupDetailView shops": ShopGroup.objects.filter(group__owner=user.pk).order_by("-is_pinned", "-date_added"),
+            "groups.InvitationsListView": Invitation.objects.filter(recipient=user.pk, is_processed=False).order_by("-date_sent"),
+            "Group counters reconciliation": Group.objects.filter(owner=user.pk).with_actual_rollups(),
+            "marketplace.ShopListView": Shop.objects.filter(is_on_marketplace=True).order_by("-date_added")[:6],
+            "api.CouponList": Coupon.objects.visible_to(user).order_by("-date_added", "-id")[:11],
+            "api.ShopList": Shop.objects.visible_to(user).with_amount_unused().order_by("-date_added", "-id")[:11],
+            "api.GroupList": Group.objects.visible_to(user).order_by("-date_added", "-id")[:11],
+        }
+
+    @staticmethod
+    def _get_user(username):
+        users = get_user_model().objects.all()
+
+        if username is not None:
+            try:
+                return users.get(username=username)
+            except get_user_model().DoesNotExist as exc:
+                raise CommandError(f"User { username } does not exist.") from exc
+
+        user = users.annotate(coupons=Count("coupon")).order_by("-coupons").first()
+
+        if user is None:
+            raise CommandError("There are no users.")
+
+        return user
@@ -0,0 +1,98 @@
+import os
+from pathlib import Path
+
+from django import forms
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management import BaseCommand, CommandError
+from django.utils.translation import gettext as _
+
+from core.barcode import BarcodeDecodingService
+from core.importing import files_from_paths, import_coupons
+from core.models import Shop
+
+import registar.settings as settings
+
+
+class Command(BaseCommand):
+    """
+    Imports coupons from receipt images into a shop.
+    """
+    help = _('Imports coupons from images, directories of images and ZIP archives into a shop.')
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help=_("Owner of the shop."))
+        parser.add_argument("shop", help=_("UUID of the shop."))
+        parser.add_argument("amount", help=_("Amount of every imported coupon."))
+        parser.add_argument("paths", nargs="+", help=_("Images, directories or ZIP archives."))
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help=_("Number of processes decoding the barcodes, 0 decodes them in this process."),
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help=_("Number of coupons inserted at once."),
+        )
+        parser.add_argument(
+            "--failures-only",
+            action="store_true",
+            help=_("Report only the files that could not be imported."),
+        )
+
+    def handle(self, *args, **options):
+        try:
+            owner = get_user_model().objects.get(username=options["username"])
+            shop = Shop.objects.get(pk=options["shop"], owner=owner)
+
+        except get_user_model().DoesNotExist as exc:
+            raise CommandError(f"User { options['username'] } does not exist.") from exc
+
+        except (Shop.DoesNotExist, ValidationError) as exc:
+            raise CommandError(f"User { owner } has no shop { options['shop'] }.") from exc
+
+        # The coupons are bulk inserted without validation, the amount is validated like in CouponImportForm.
+        try:
+            amount = forms.DecimalField(max_digits=10, decimal_places=2, min_value=0).clean(options["amount"])
+
+        except ValidationError as exc:
+            raise CommandError(f"{ options['amount'] } is not a valid amount: { ' '.join(exc.messages) }") from exc
+
+        if options["workers"] < 0:
+            raise CommandError("The number of workers cannot be negative.")
+
+        for path in options["paths"]:
+            if not Path(path).exists():
+                raise CommandError(f"{ path } does not exist.")
+
+        # The command runs in its own process, so it gets its own pool instead of the one of the server.
+        # Without workers the images are decoded in this process, still two of them are read at a time.
+        service = BarcodeDecodingService(
+            workers=options["workers"],
+            queue_depth=max(options["workers"], 1) * 2,
+            timeout=settings.BARCODE_TIMEOUT,
+        )
+
+        try:
+            results = import_coupons(
+                owner,
+                shop,
+                amount,
+                files_from_paths(options["paths"]),
+                service=service,
+                batch_size=options["batch_size"],
+            )
+        finally:
+            service.shutdown()
+
+        for result in results:
+            if result.coupon is not None and not options["failures_only"]:
+                self.stdout.write(f"OK    { result.name }: { result.coupon.barcode }")
+            elif result.coupon is None:
+                self.stdout.write(f"ERROR { result.name }: { result.error }")
+
+        imported = sum(result.coupon is not None for result in results)
+        self.stdout.write(f"Imported { imported } of { len(results) } coupons.\n")
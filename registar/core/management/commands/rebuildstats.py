@@ -0,0 +1,24 @@
+from django.core.management import BaseCommand
+from django.utils.translation import gettext as _
+
+from core.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    """
+    Recomputes the coupon statistics of the users.
+    """
+    help = _('Recomputes the coupon statistics of all users, or of the given users.')
+
+    def add_arguments(self, parser):
+        parser.add_argument("users", nargs="*", type=int, help=_("Primary keys of the users, all users if omitted."))
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help=_("Number of users recomputed at once."),
+        )
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_stats(options["users"] or None, batch_size=options["batch_size"])
+        self.stdout.write(f"Rebuilt the statistics of { rebuilt } users.\n")
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.6 on 2026-10-17 14:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_alter_user_options'),
+        ('core', '0011_alter_shop_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCouponStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='coupon_stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='user')),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='total amount')),
+                ('returned_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='returned amount')),
+                ('coupon_count', models.IntegerField(default=0, verbose_name='coupons')),
+                ('used_count', models.IntegerField(default=0, verbose_name='used coupons')),
+                ('unused_count', models.IntegerField(default=0, verbose_name='unused coupons')),
+                ('shared_count', models.IntegerField(default=0, verbose_name='shared coupons')),
+                ('pinned_count', models.IntegerField(default=0, verbose_name='pinned coupons')),
+                ('date_modified', models.DateTimeField(auto_now=True, verbose_name='updated at')),
+            ],
+            options={
+                'verbose_name': 'user coupon statistics',
+                'verbose_name_plural': 'user coupon statistics',
+            },
+        ),
+    ]
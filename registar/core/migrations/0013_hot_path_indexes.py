@@ -0,0 +1,31 @@
+# Generated by Django 5.0.6 on 2026-10-17 15:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_usercouponstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='coupon',
+            index=models.Index(fields=['owner', '-is_pinned', 'is_used', '-date_added'], name='coupon_owner_pinned_used_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coupon',
+            index=models.Index(fields=['store', 'is_used', 'amount'], name='coupon_unused_store_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shop',
+            index=models.Index(fields=['owner', '-is_pinned', '-date_added'], name='shop_owner_pinned_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shop',
+            index=models.Index(fields=['is_on_marketplace', '-date_added', '-id'], name='shop_marketplace_idx'),
+        ),
+    ]
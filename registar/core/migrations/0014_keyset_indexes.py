@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-17 15:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='coupon',
+            index=models.Index(fields=['owner', '-date_added', '-id'], name='coupon_owner_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shop',
+            index=models.Index(fields=['owner', '-date_added', '-id'], name='shop_owner_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,97 @@
+from typing import Any
+
+from django.contrib import messages
+from django.db.models.query import QuerySet
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.generic.detail import SingleObjectMixin
+
+from .conditional import fingerprint, make_etag
+
+
+class CachedObjectMixin(SingleObjectMixin):
+    """
+    Fetches the object of the view once per request, the permission checks, handlers and logging reuse it.
+
+    Relations the view and its template follow are listed in `select_related` and `prefetch_related`.
+    Views that change the object in the database behind its back, e.g. through many-to-many relations
+    or the counters kept by signals, call `invalidate_object` afterwards.
+    """
+    select_related: tuple[str, ...] = ()
+    prefetch_related: tuple[str, ...] = ()
+    object = None
+
+    def get_queryset(self) -> QuerySet[Any]:
+        queryset = super().get_queryset()
+
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+
+        return queryset
+
+    def get_object(self, queryset=None):
+        if queryset is not None:
+            return super().get_object(queryset)
+
+        if not hasattr(self, "_cached_object"):
+            self._cached_object = super().get_object()
+
+        return self._cached_object
+
+    def invalidate_object(self) -> None:
+        """
+        Drops the fetched object, the next `get_object` call reads it again.
+        """
+        self.__dict__.pop("_cached_object", None)
+
+
+class ConditionalGetMixin:
+    """
+    Answers GET requests with 304 Not Modified if the ETag of the client matches, before the response is
+    serialized or rendered. The ETag is made from the values of `get_fingerprint`, see `make_etag`.
+
+    Pages with pending messages are always rendered, the messages are shown once.
+    """
+    fingerprint_related: dict = {}
+
+    def get_fingerprint_queryset(self) -> QuerySet:
+        """
+        Returns the objects of the response the user may see.
+        """
+        raise NotImplementedError
+
+    def get_fingerprint(self) -> tuple | None:
+        """
+        Returns values that change with the response, `None` if it is not conditional. By default the
+        `fingerprint` of the `get_fingerprint_queryset` and the `fingerprint_related` querysets, if the
+        user sees any of the objects.
+        """
+        state = fingerprint(self.get_fingerprint_queryset(), related=self.fingerprint_related)
+
+        return tuple(state.values()) if state["count"] else None
+
+    def get_etag(self) -> str | None:
+        if len(messages.get_messages(self.request)):
+            return None
+
+        values = self.get_fingerprint()
+
+        if values is None:
+            return None
+
+        return make_etag(self.request, self.request.resolver_match.view_name, *values)
+
+    def get(self, request, *args, **kwargs):
+        etag = self.get_etag()
+        response = get_conditional_response(request, etag=etag) if etag is not None else None
+
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+
+        if etag is not None and response.status_code in (200, 304):
+            response["ETag"] = etag
+            patch_cache_control(response, private=True, no_cache=True)
+
+        return response
@@ -2,9 +2,40 @@ import uuid
 
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import OuterRef, Q
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 
+from .aggregates import sum_subquery
+
+
+def shared_with(user) -> models.QuerySet:
+    """
+    Returns the ids of the shops shared with the user through any group they are a member of.
+
+    Used as `IN` subquery next to the owner lookup, the subquery does not depend on the outer row, so the
+    database runs it once and combines the owner and the shop index lookups into a union of the rows,
+    instead of joining all the groups of the user and deduplicating the result.
+    """
+    return Shop.groups.through.objects.filter(group__groupmembership__user=user).values("shop")
+
+
+class ShopQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """
+        Returns the shops the user owns or that are shared with them through a group.
+        """
+        return self.filter(Q(owner=user) | Q(pk__in=shared_with(user)))
+
+    def with_amount_unused(self):
+        """
+        Annotates the total amount of the unused coupons of every shop as `amount_unused`. A subquery is used,
+        so the annotation stays correct on querysets joined over groups and members.
+        """
+        return self.annotate(
+            amount_unused=sum_subquery(Coupon.objects.filter(store=OuterRef("pk"), is_used=False), "store", "amount")
+        )
+
 
 class Shop(models.Model):
     """
@@ -18,10 +49,20 @@ class Shop(models.Model):
     date_added          = models.DateTimeField(auto_now_add=True, verbose_name=_('created at'))
     date_modified       = models.DateTimeField(auto_now=True, verbose_name=_('updated at'))
 
+    objects = ShopQuerySet.as_manager()
+
     class Meta:
         ordering = ["-date_added", "title"]
         verbose_name = _('shop')
         verbose_name_plural = _('shops')
+
+        indexes = [
+            models.Index(fields=['owner', '-is_pinned', '-date_added'], name='shop_owner_pinned_idx'),
+            # Pages of the API, see api.pagination.KeysetPagination.
+            models.Index(fields=['owner', '-date_added', '-id'], name='shop_owner_keyset_idx'),
+            # Not a partial index, MySQL does not support them. The flag leads, so the marketplace is still one range.
+            models.Index(fields=['is_on_marketplace', '-date_added', '-id'], name='shop_marketplace_idx'),
+        ]
         
         permissions = [
             ("upload_to_marketplace_shop", _("Can upload shop to marketplace")),
@@ -31,10 +72,21 @@ class Shop(models.Model):
     def get_absolute_url(self):
         return reverse('core:shop_detail', kwargs={'pk': self.pk})
 
+    def is_visible_to(self, user) -> bool:
+        return self.owner_id == user.pk or Shop.objects.filter(pk=self.pk).visible_to(user).exists()
+
     def __str__(self) -> str:
         return self.title
 
 
+class CouponQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """
+        Returns the coupons the user owns or whose shop is shared with them through a group.
+        """
+        return self.filter(Q(owner=user) | Q(store__in=shared_with(user)))
+
+
 class Coupon(models.Model):
     """
     Coupon model.
@@ -51,10 +103,21 @@ class Coupon(models.Model):
     date_added      = models.DateTimeField(auto_now_add=True, verbose_name=_('created at'))
     date_modified   = models.DateTimeField(auto_now=True, verbose_name=_('updated at'))
 
+    objects = CouponQuerySet.as_manager()
+
     class Meta:
         ordering = ["-date_added", "title"]
         verbose_name = _('coupon')
         verbose_name_plural = _('coupons')
+
+        indexes = [
+            models.Index(fields=['owner', '-is_pinned', 'is_used', '-date_added'], name='coupon_owner_pinned_used_idx'),
+            # Pages of the API, see api.pagination.KeysetPagination.
+            models.Index(fields=['owner', '-date_added', '-id'], name='coupon_owner_keyset_idx'),
+            # Sums of the unused coupons of a shop, read only from the index. Not a partial index, MySQL does
+            # not support them, the state follows the shop so the unused coupons are still one range.
+            models.Index(fields=['store', 'is_used', 'amount'], name='coupon_unused_store_idx'),
+        ]
         
         permissions = [
             ("share_coupon", _("Can share coupon")),
@@ -65,5 +128,37 @@ class Coupon(models.Model):
     def get_absolute_url(self):
         return reverse('core:coupon_detail', kwargs={'pk': self.id})
 
+    def is_visible_to(self, user) -> bool:
+        return self.owner_id == user.pk or Coupon.objects.filter(pk=self.pk).visible_to(user).exists()
+
+    def get_default_title(self) -> str:
+        return f"Unnamed coupon for shop {self.store.title} ({self.amount}€)"
+
     def __str__(self) -> str:
         return self.title
+
+
+class UserCouponStats(models.Model):
+    """
+    Coupon statistics of a user, kept up to date incrementally by `core.stats`.
+    """
+    user            = models.OneToOneField(get_user_model(), on_delete=models.CASCADE, primary_key=True, related_name='coupon_stats', verbose_name=_('user'))
+    total_amount    = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name=_('total amount'))
+    returned_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name=_('returned amount'))
+    coupon_count    = models.IntegerField(default=0, verbose_name=_('coupons'))
+    used_count      = models.IntegerField(default=0, verbose_name=_('used coupons'))
+    unused_count    = models.IntegerField(default=0, verbose_name=_('unused coupons'))
+    shared_count    = models.IntegerField(default=0, verbose_name=_('shared coupons'))
+    pinned_count    = models.IntegerField(default=0, verbose_name=_('pinned coupons'))
+    date_modified   = models.DateTimeField(auto_now=True, verbose_name=_('updated at'))
+
+    class Meta:
+        verbose_name = _('user coupon statistics')
+        verbose_name_plural = _('user coupon statistics')
+
+    @property
+    def remaining_amount(self):
+        return self.total_amount - self.returned_amount
+
+    def __str__(self) -> str:
+        return f"Coupon statistics of { self.user }"
@@ -0,0 +1,85 @@
+from django.contrib.auth import get_user_model
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Coupon, Shop, UserCouponStats
+from .stats import coupon_state, coupons_changed, coupons_deleted, stored_coupon_state
+
+
+def deleted_in_cascade(origin, model) -> bool:
+    """
+    Whether an instance of the model is deleted because another object it depends on is, `origin` being
+    the object or queryset `delete()` was called on, as passed to `pre_delete` and `post_delete`.
+    """
+    if origin is None:
+        return False
+
+    return (origin.model if isinstance(origin, QuerySet) else type(origin)) is not model
+
+
+@receiver(post_save, sender=get_user_model())
+def create_coupon_stats(sender, instance, created, raw=False, **kwargs):
+    """
+    Creates the empty coupon statistics of a new user.
+    """
+    if created and not raw:
+        UserCouponStats.objects.create(user=instance)
+
+
+@receiver(post_init, sender=Coupon)
+def remember_coupon_state(sender, instance, **kwargs):
+    """
+    Remembers the loaded values of the coupon, so a save only applies the difference to the statistics.
+    """
+    instance._stats_state = coupon_state(instance)
+
+
+@receiver(pre_save, sender=Coupon)
+def read_stored_coupon_state(sender, instance, raw=False, **kwargs):
+    """
+    Reads the stored values of a coupon loaded with deferred fields before it is saved, as the loaded
+    values alone do not tell what the save changes.
+    """
+    if not raw and not instance._state.adding and instance._stats_state is None:
+        instance._stats_state = stored_coupon_state(instance.pk)
+
+
+@receiver(post_save, sender=Coupon)
+def update_stats_on_save(sender, instance, created, raw=False, **kwargs):
+    """
+    Updates the statistics of the owner of the saved coupon.
+    """
+    if raw:
+        return
+
+    old_state = None if created else instance._stats_state
+    # The deferred fields were not saved, they keep their stored values.
+    new_state = coupon_state(instance) or stored_coupon_state(instance.pk)
+
+    coupons_changed([old_state], [new_state])
+
+    instance._stats_state = new_state
+
+
+@receiver(pre_delete, sender=Shop)
+def update_stats_on_shop_delete(sender, instance, **kwargs):
+    """
+    Removes the coupons of the deleted shop from the statistics of their owners, all at once.
+    """
+    coupons_deleted(Coupon.objects.filter(store=instance))
+
+
+@receiver(post_delete, sender=Coupon)
+def update_stats_on_delete(sender, instance, origin=None, **kwargs):
+    """
+    Updates the statistics of the owner of the deleted coupon. The coupons deleted with their shop were
+    removed by `update_stats_on_shop_delete`, the statistics of a deleted owner are deleted with them.
+    """
+    if deleted_in_cascade(origin, Coupon):
+        return
+
+    state = coupon_state(instance)
+
+    if state is not None:
+        coupons_changed([state], [None])
@@ -0,0 +1,189 @@
+import logging
+from collections import defaultdict
+from decimal import Decimal
+from itertools import islice
+from typing import Iterable, NamedTuple
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.dispatch import Signal
+
+from .bulk import bulk_upsert
+from .models import Coupon, UserCouponStats
+
+logger = logging.getLogger(__name__)
+
+
+# How every field of `UserCouponStats` is computed from the coupons of the user.
+STATS_AGGREGATES = {
+    "total_amount": Sum("amount", default=0),
+    "returned_amount": Sum("amount", default=0, filter=Q(is_used=True)),
+    "coupon_count": Count("pk"),
+    "used_count": Count("pk", filter=Q(is_used=True)),
+    "unused_count": Count("pk", filter=Q(is_used=False)),
+    "shared_count": Count("pk", filter=Q(is_shared=True)),
+    "pinned_count": Count("pk", filter=Q(is_pinned=True)),
+}
+
+# Sent with `old_states` and `new_states` after coupons were created, changed or deleted, see `coupons_changed`.
+coupon_states_changed = Signal()
+
+
+class CouponState(NamedTuple):
+    """
+    Values of a coupon the statistics depend on.
+    """
+    owner_id: int
+    store_id: str
+    amount: Decimal
+    is_used: bool
+    is_shared: bool
+    is_pinned: bool
+
+
+COUPON_FIELDS = CouponState._fields
+
+
+def coupon_state(coupon: Coupon) -> CouponState | None:
+    """
+    Returns the state of the coupon, `None` if some of its fields are deferred.
+    """
+    try:
+        return CouponState(*(coupon.__dict__[field] for field in COUPON_FIELDS))
+    except KeyError:
+        return None
+
+
+def stored_coupon_state(pk) -> CouponState | None:
+    """
+    Returns the state of the coupon as stored in the database, `None` if it is not stored.
+    """
+    row = Coupon.objects.filter(pk=pk).values_list(*COUPON_FIELDS).first()
+    return row and CouponState(*row)
+
+
+def contribution(state: CouponState, sign: int = 1) -> dict:
+    """
+    Returns what a coupon in the given state adds to the statistics of its owner, or removes if `sign` is -1.
+    """
+    amount = Decimal(str(state.amount)) * sign
+
+    return {
+        "total_amount": amount,
+        "returned_amount": amount if state.is_used else 0,
+        "coupon_count": sign,
+        "used_count": sign if state.is_used else 0,
+        "unused_count": 0 if state.is_used else sign,
+        "shared_count": sign if state.is_shared else 0,
+        "pinned_count": sign if state.is_pinned else 0,
+    }
+
+
+def apply_deltas(deltas: dict[int, dict]):
+    """
+    Adds the deltas to the statistics of the users, given as `{user_id: {field: delta}}`.
+    Users without statistics are skipped, their statistics are computed when they are read first.
+    """
+    for user_id, delta in deltas.items():
+        changes = {field: F(field) + value for field, value in delta.items() if value}
+
+        if changes:
+            UserCouponStats.objects.filter(user=user_id).update(**changes)
+
+
+def add_deltas(deltas: defaultdict, state: CouponState, sign: int):
+    for field, value in contribution(state, sign).items():
+        deltas[state.owner_id][field] += value
+
+
+def coupons_changed(old_states: Iterable[CouponState | None], new_states: Iterable[CouponState | None]):
+    """
+    Updates the statistics after coupons changed from the old states to the new ones, `None` means that
+    the coupon did not exist before or does not exist anymore. Sends `coupon_states_changed` afterwards.
+    """
+    old_states, new_states = list(old_states), list(new_states)
+    deltas = defaultdict(lambda: defaultdict(int))
+
+    for old_state, new_state in zip(old_states, new_states):
+        if old_state is not None:
+            add_deltas(deltas, old_state, -1)
+        if new_state is not None:
+            add_deltas(deltas, new_state, 1)
+
+    apply_deltas(deltas)
+    coupon_states_changed.send(sender=Coupon, old_states=old_states, new_states=new_states)
+
+
+def coupons_deleted(queryset):
+    """
+    Removes the coupons of the queryset from the statistics of their owners before they are deleted, with one
+    aggregate query and one update per owner instead of one update per coupon. Sends no `coupon_states_changed`.
+    """
+    apply_deltas({
+        user_id: {field: -value for field, value in totals.items()}
+        for user_id, totals in _stats_by_user(queryset).items()
+    })
+
+
+def update_coupons(queryset, **values) -> int:
+    """
+    Updates the coupons like `queryset.update()` does, which sends no signals, and applies the changes
+    to the statistics. Only the updated coupons are read, not the other coupons of their owners.
+    """
+    with transaction.atomic():
+        coupons = Coupon.objects.filter(pk__in=list(queryset.values_list("pk", flat=True))).order_by("pk")
+
+        old_states = [CouponState(*row) for row in coupons.values_list(*COUPON_FIELDS)]
+        updated = coupons.update(**values)
+        new_states = [CouponState(*row) for row in coupons.values_list(*COUPON_FIELDS)]
+
+        coupons_changed(old_states, new_states)
+
+    return updated
+
+
+def rebuild_stats(user_ids: Iterable[int] | None = None, batch_size: int = 1000) -> int:
+    """
+    Recomputes the statistics of the users, of all users if `user_ids` is `None`, `batch_size` users at a time.
+    Returns the number of users.
+    """
+    users = get_user_model().objects.order_by("pk").values_list("pk", flat=True)
+
+    if user_ids is not None:
+        users = users.filter(pk__in=list(user_ids))
+
+    users = users.iterator(chunk_size=batch_size)
+    rebuilt = 0
+
+    while batch := list(islice(users, batch_size)):
+        totals = _stats_by_user(Coupon.objects.filter(owner__in=batch))
+
+        bulk_upsert(
+            UserCouponStats,
+            [UserCouponStats(user_id=user_id, **totals.get(user_id, {})) for user_id in batch],
+            unique_field="user",
+            update_fields=[*STATS_AGGREGATES, "date_modified"],
+        )
+        rebuilt += len(batch)
+
+    return rebuilt
+
+
+def get_stats(user_id: int) -> UserCouponStats:
+    """
+    Returns the statistics of the user, computing them first if they do not exist yet.
+    """
+    stats = UserCouponStats.objects.filter(user=user_id).first()
+
+    if stats is None:
+        logger.info("Computing the coupon statistics of user %s", user_id)
+        rebuild_stats([user_id])
+        stats = UserCouponStats.objects.get(user=user_id)
+
+    return stats
+
+
+def _stats_by_user(coupons) -> dict[int, dict]:
+    rows = coupons.order_by().values("owner").annotate(**STATS_AGGREGATES)
+    return {row.pop("owner"): row for row in rows}
@@ -11,3 +11,19 @@ def bootstrapify(form: Form):
     Applies Bootstrap styling to the given form.
     """
     return bootstrapify_form(form)
+
+@register.simple_tag(takes_context=True)
+def querystring(context, **kwargs) -> str:
+    """
+    Returns the query string of the current request with the given parameters replaced, a `None` value removes
+    the parameter. E.g. `{% querystring currency="USD" %}` keeps the filters and the page of a list.
+    """
+    params = context["request"].GET.copy()
+
+    for key, value in kwargs.items():
+        if value is None:
+            params.pop(key, None)
+        else:
+            params[key] = value
+
+    return f"?{ params.urlencode() }"
@@ -1,3 +1,1173 @@
-from django.test import TestCase
+import io
+import tempfile
+import zipfile
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from decimal import Decimal
+from pathlib import Path
+from typing import NamedTuple
+from unittest import mock
 
-# Create your tests here.
+import cv2
+import numpy
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import (InMemoryUploadedFile,
+                                            SimpleUploadedFile,
+                                            TemporaryUploadedFile)
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.template import Context, Template
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone, translation
+from exchange.services import RATES_CACHE_KEY, RateTable
+from groups.models import Group, GroupMembership
+
+import registar.settings as settings
+
+from .barcode import (BarcodeDecodingService, BarcodeServiceBusy,
+                      BarcodeTimeout, barcode_cache_key, decode_with_cache)
+from .forms import CouponForm, CouponImageField
+from .importing import ImportFile, import_coupons
+from .models import Coupon, Shop, UserCouponStats
+from .stats import STATS_AGGREGATES, get_stats, rebuild_stats
+from .utils import (DECODE_PASSES, DecodeContext, DecodeResult, NoBarcodeData,
+                    NoBarcodeDetected, _region_pass, decode_barcode,
+                    find_barcode_region, run_decode_pass)
+from .views import OverviewView
+
+
+class Decoded(NamedTuple):
+    """
+    A barcode as found by zbar.
+    """
+    data: bytes
+
+
+TEST_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "barcodes": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "barcodes"},
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class OverviewViewTests(TestCase):
+    """
+    Tests of the overview statistics.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initgroups", "--nooutput")
+
+        cls.user = get_user_model().objects.create_user(username="owner", password="password")
+        member = get_user_model().objects.create_user(username="member", password="password")
+
+        shop = Shop.objects.create(title="Shop", owner=cls.user, is_pinned=True)
+        Shop.objects.create(title="Other shop", owner=cls.user)
+
+        Coupon.objects.create(barcode="1", amount=Decimal("10.00"), store=shop, owner=cls.user, is_used=True)
+        Coupon.objects.create(barcode="2", amount=Decimal("5.00"), store=shop, owner=cls.user, is_shared=True)
+        Coupon.objects.create(barcode="3", amount=Decimal("2.50"), store=shop, owner=cls.user, is_pinned=True)
+        Coupon.objects.create(barcode="4", amount=Decimal("99.00"), store=shop, owner=member)
+
+        group = Group.objects.create(title="Group", owner=cls.user)
+        GroupMembership.objects.create(user=member, group=group)
+
+    def get_context(self, queries: int) -> dict:
+        request = RequestFactory().get("/overview/")
+        request.user = self.user
+        request.session = {}
+
+        view = OverviewView()
+        view.setup(request)
+        view.rates = RateTable({"USD": Decimal("1.08")}, timezone.now())
+
+        with self.assertNumQueries(queries):
+            return view.get_context_data()
+
+    def test_statistics_take_two_queries(self):
+        self.get_context(queries=2)
+
+        Coupon.objects.bulk_create(
+            Coupon(barcode=str(index), amount=Decimal("1.00"), store=Shop.objects.first(), owner=self.user)
+            for index in range(50)
+        )
+
+        self.get_context(queries=2)
+
+    def test_statistics(self):
+        context = self.get_context(queries=2)
+
+        self.assertEqual(context["total_amount"], Decimal("17.50"))
+        self.assertEqual(context["total_amount_returned"], Decimal("10.00"))
+        self.assertEqual(context["total_amount_remaining"], Decimal("7.50"))
+        self.assertEqual(context["returned_percentage"], Decimal("57.14"))
+        self.assertEqual(context["total_amount_converted"], Decimal("18.90"))
+
+        self.assertEqual(context["total_coupons"], 3)
+        self.assertEqual(context["total_shared_coupons"], 1)
+        self.assertEqual(context["total_pinned_coupons"], 1)
+        self.assertEqual(context["total_used_coupons"], 1)
+        self.assertEqual(context["total_unused_coupons"], 2)
+        self.assertEqual(context["used_percentage"], 33.33)
+
+        self.assertEqual(context["total_shops"], 2)
+        self.assertEqual(context["total_shops_pinned"], 1)
+        self.assertEqual(context["total_groups"], 1)
+        self.assertEqual(context["total_memberships"], 1)
+
+    def test_statistics_without_coupons(self):
+        self.user.coupon_set.all().delete()
+        context = self.get_context(queries=2)
+
+        self.assertEqual(context["total_amount"], 0)
+        self.assertEqual(context["returned_percentage"], 0)
+        self.assertEqual(context["used_percentage"], 0)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CouponStatsDeletionTests(TestCase):
+    """
+    Tests that deleting a shop or a user updates the coupon statistics once, not once per deleted coupon.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initgroups", "--nooutput")
+
+        cls.owner = get_user_model().objects.create_user(username="owner", password="password")
+        cls.member = get_user_model().objects.create_user(username="member", password="password")
+
+        cls.shop = Shop.objects.create(title="Shop", owner=cls.owner)
+        other_shop = Shop.objects.create(title="Other shop", owner=cls.member)
+
+        Coupon.objects.create(barcode="1", amount=Decimal("10.00"), store=cls.shop, owner=cls.owner, is_used=True)
+        Coupon.objects.create(barcode="2", amount=Decimal("5.00"), store=cls.shop, owner=cls.member, is_shared=True)
+        Coupon.objects.create(barcode="3", amount=Decimal("2.50"), store=other_shop, owner=cls.owner, is_pinned=True)
+        Coupon.objects.create(barcode="4", amount=Decimal("1.00"), store=other_shop, owner=cls.member)
+
+        Coupon.objects.bulk_create(
+            Coupon(barcode=str(index), amount=Decimal("1.00"), store=cls.shop, owner=cls.owner)
+            for index in range(100, 300)
+        )
+        rebuild_stats()
+
+    def stats(self) -> list[dict]:
+        return list(UserCouponStats.objects.order_by("user").values("user", *STATS_AGGREGATES))
+
+    def delete(self, obj, updates: int):
+        with CaptureQueriesContext(connection) as context:
+            obj.delete()
+
+        self.assertEqual(
+            len([query for query in context.captured_queries if query["sql"].startswith('UPDATE "core_usercouponstats"')]),
+            updates,
+        )
+
+        # The updated statistics equal the recomputed ones.
+        stats = self.stats()
+        rebuild_stats()
+        self.assertEqual(stats, self.stats())
+
+    def test_delete_shop(self):
+        self.delete(self.shop, updates=2)
+
+        self.assertEqual(UserCouponStats.objects.get(user=self.owner).coupon_count, 1)
+        self.assertEqual(UserCouponStats.objects.get(user=self.member).coupon_count, 1)
+
+    def test_delete_shop_queries(self):
+        # The coupons and links of the shop, the statistics of the 2 owners, the groups, the deletion log of the
+        # coupons and of the shop, and the deletes. SQLite splits the 202 coupons of the log and the delete into
+        # batches of its parameter limit, there is no query per coupon.
+        with self.assertNumQueries(14):
+            self.shop.delete()
+
+    def test_delete_user(self):
+        owner_id = self.owner.pk
+        self.delete(self.owner, updates=2)
+
+        self.assertFalse(UserCouponStats.objects.filter(user=owner_id).exists())
+        self.assertEqual(UserCouponStats.objects.get(user=self.member).coupon_count, 1)
+
+    def test_delete_coupon(self):
+        self.delete(Coupon.objects.get(barcode="1"), updates=1)
+
+        self.assertEqual(UserCouponStats.objects.get(user=self.owner).returned_amount, 0)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RebuildStatsTests(TestCase):
+    """
+    Tests that rebuilding the statistics updates the existing rows and creates the missing ones.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initgroups", "--nooutput")
+
+        cls.owner = get_user_model().objects.create_user(username="owner", password="password")
+        cls.member = get_user_model().objects.create_user(username="member", password="password")
+
+        shop = Shop.objects.create(title="Shop", owner=cls.owner)
+        Coupon.objects.create(barcode="1", amount=Decimal("10.00"), store=shop, owner=cls.owner, is_used=True)
+        Coupon.objects.create(barcode="2", amount=Decimal("5.00"), store=shop, owner=cls.member)
+
+    def test_rebuild(self):
+        # The statistics of the owner drifted, the ones of the member are missing.
+        UserCouponStats.objects.filter(user=self.owner).update(
+            total_amount=99, coupon_count=7, date_modified=timezone.now() - timezone.timedelta(days=1)
+        )
+        UserCouponStats.objects.filter(user=self.member).delete()
+
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(rebuild_stats(), 2)
+
+        # No upsert with a conflict target, which MySQL does not support.
+        self.assertFalse([query for query in context.captured_queries if "ON CONFLICT" in query["sql"]])
+
+        owner = UserCouponStats.objects.get(user=self.owner)
+        self.assertEqual((owner.total_amount, owner.returned_amount, owner.coupon_count, owner.used_count), (Decimal("10.00"), Decimal("10.00"), 1, 1))
+        self.assertGreater(owner.date_modified, timezone.now() - timezone.timedelta(minutes=1))
+
+        member = UserCouponStats.objects.get(user=self.member)
+        self.assertEqual((member.total_amount, member.coupon_count, member.unused_count), (Decimal("5.00"), 1, 1))
+
+    def test_get_stats(self):
+        UserCouponStats.objects.filter(user=self.member).delete()
+
+        with self.assertLogs("core.stats", "INFO"):
+            self.assertEqual(get_stats(self.member.pk).coupon_count, 1)
+
+    def test_command(self):
+        UserCouponStats.objects.update(coupon_count=0)
+
+        call_command("rebuildstats", stdout=io.StringIO())
+
+        self.assertEqual(sorted(UserCouponStats.objects.values_list("coupon_count", flat=True)), [1, 1])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ViewQueriesTestCase(TestCase):
+    """
+    Base of the tests that count the queries of the views working on a single object.
+    """
+
+    def setUp(self):
+        translation.activate("en")
+        self.addCleanup(translation.deactivate)
+        cache.set(RATES_CACHE_KEY, RateTable({"USD": Decimal("1.08")}, timezone.now()), None)
+
+    def assertQueries(self, method: str, url: str, table: str, queries: int, data: dict | None = None, headers: dict | None = None):
+        """
+        Requests the URL and checks the number of queries, and that the object was read from `table` only once.
+        """
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url, data, headers=headers)
+
+        self.assertLess(response.status_code, 400, url)
+
+        fetches = [
+            query["sql"] for query in context.captured_queries
+            if query["sql"].startswith("SELECT") and f'FROM "{ table }" ' in query["sql"]
+        ]
+        self.assertEqual(len(fetches), 1, "\n".join(fetches))
+        self.assertEqual(len(context), queries, "\n".join(query["sql"] for query in context.captured_queries))
+
+        return response
+
+
+class ShopViewQueriesTests(ViewQueriesTestCase):
+    """
+    Tests that the shop views read the shop once per request.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initgroups", "--nooutput")
+
+        cls.user = get_user_model().objects.create_user(username="owner", password="password")
+        cls.shop = Shop.objects.create(title="Shop", owner=cls.user)
+        Coupon.objects.create(barcode="1", amount=Decimal("10.00"), store=cls.shop, owner=cls.user)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def url(self, name: str) -> str:
+        return reverse(f"core:{ name }", kwargs={"pk": self.shop.pk})
+
+    def test_detail(self):
+        self.assertQueries("get", self.url("shop_detail"), "core_shop", queries=7)
+
+    def test_detail_not_modified(self):
+        etag = self.client.get(self.url("shop_detail"))["ETag"]
+        headers = {"If-None-Match": etag}
+
+        response = self.assertQueries("get", self.url("shop_detail"), "core_shop", queries=6, headers=headers)
+        self.assertEqual(response.status_code, 304)
+
+        Coupon.objects.create(barcode="2", amount=Decimal("5.00"), store=self.shop, owner=self.user)
+        self.assertEqual(self.client.get(self.url("shop_detail"), headers=headers).status_code, 200)
+
+    def test_update(self):
+        self.assertQueries("get", self.url("shop_update"), "core_shop", queries=5)
+
+        with self.assertLogs("core.views", "INFO") as logs:
+            self.assertQueries("post", self.url("shop_update"), "core_shop", queries=6, data={"title": "Updated"})
+
+        self.assertIn(f"updated shop Shop (pk: { self.shop.pk })", logs.output[-1])
+
+        self.shop.refresh_from_db()
+        self.assertEqual(self.shop.title, "Updated")
+
+    def test_delete(self):
+        self.assertQueries("get", self.url("shop_delete"), "core_shop", queries=5)
+        self.assertQueries("post", self.url("shop_delete"), "core_shop", queries=15)
+
+        self.assertFalse(Shop.objects.filter(pk=self.shop.pk).exists())
+
+    def test_pin(self):
+        self.assertQueries("post", self.url("shop_pin"), "core_shop", queries=6)
+        self.assertQueries("post", self.url("shop_unpin"), "core_shop", queries=6)
+
+    def test_marketplace(self):
+        self.assertQueries("post", self.url("shop_upload_to_marketplace"), "core_shop", queries=6)
+        self.assertQueries("post", self.url("shop_remove_from_marketplace"), "core_shop", queries=6)
+
+    def test_missing_shop(self):
+        response = self.client.post(reverse("core:shop_pin", kwargs={"pk": "00000000-0000-0000-0000-000000000000"}))
+        self.assertEqual(response.status_code, 404)
+
+
+class CouponViewQueriesTests(ViewQueriesTestCase):
+    """
+    Tests that the coupon views read the coupon once per request.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initgroups", "--nooutput")
+
+        cls.user = get_user_model().objects.create_user(username="owner", password="password")
+        cls.shop = Shop.objects.create(title="Shop", owner=cls.user)
+        cls.coupon = Coupon.objects.create(title="Coupon", barcode="1", amount=Decimal("10.00"), store=cls.shop, owner=cls.user)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def url(self, name: str) -> str:
+        return reverse(f"core:{ name }", kwargs={"pk": self.coupon.pk})
+
+    def test_detail(self):
+        self.assertQueries("get", self.url("coupon_detail"), "core_coupon", queries=5)
+
+    def test_detail_not_modified(self):
+        etag = self.client.get(self.url("coupon_detail"))["ETag"]
+        headers = {"If-None-Match": etag}
+
+        response = self.assertQueries("get", self.url("coupon_detail"), "core_coupon", queries=5, headers=headers)
+        self.assertEqual(response.status_code, 304)
+
+        # The title of the shop is shown with the coupon.
+        self.shop.title = "Renamed"
+        self.shop.save()
+        self.assertEqual(self.client.get(self.url("coupon_detail"), headers=headers).status_code, 200)
+
+    def test_update(self):
+        data = {"title": "Updated", "barcode": "2", "amount": "5.00", "store": self.shop.pk}
+
+        self.assertQueries("get", self.url("coupon_update"), "core_coupon", queries=6)
+
+        with self.assertLogs("core.views", "INFO") as logs:
+            self.assertQueries("post", self.url("coupon_update"), "core_coupon", queries=11, data=data)
+
+        # One message, with the title the coupon had before the update.
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn(f"updated coupon Coupon (pk: { self.coupon.pk })", logs.output[0])
+
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.barcode, "2")
+
+    def test_delete(self):
+        self.assertQueries("get", self.url("coupon_delete"), "core_coupon", queries=5)
+        self.assertQueries("post", self.url("coupon_delete"), "core_coupon", queries=9)
+
+        self.assertFalse(Coupon.objects.filter(pk=self.coupon.pk).exists())
+
+    def test_share(self):
+        self.assertQueries("post", self.url("coupon_share"), "core_coupon", queries=7)
+        self.assertQueries("get", self.url("coupon_shared_detail"), "core_coupon", queries=5)
+        self.assertQueries("post", self.url("coupon_unshare"), "core_coupon", queries=7)
+
+        response = self.client.get(self.url("coupon_shared_detail"))
+        self.assertEqual(response.status_code, 404)
+
+    def test_use(self):
+        self.assertQueries("post", self.url("coupon_use"), "core_coupon", queries=8)
+        self.assertQueries("post", self.url("coupon_unuse"), "core_coupon", queries=8)
+
+    def test_pin(self):
+        self.assertQueries("post", self.url("coupon_pin"), "core_coupon", queries=7)
+        self.assertQueries("post", self.url("coupon_unpin"), "core_coupon", queries=7)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class VisibilityTests(TestCase):
+    """
+    Tests that the shops and coupons are visible to their owner and to the members of the groups the shops
+    are shared with, and to nobody else.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initgroups", "--nooutput")
+
+        User = get_user_model()
+        cls.owner = User.objects.create_user(username="owner", password="password")
+        cls.member = User.objects.create_user(username="member", password="password")
+        cls.former_member = User.objects.create_user(username="former", password="password")
+        cls.other_member = User.objects.create_user(username="other", password="password")
+        cls.stranger = User.objects.create_user(username="stranger", password="password")
+
+        cls.shop = Shop.objects.create(title="Shop", owner=cls.owner)
+        cls.private_shop = Shop.objects.create(title="Private shop", owner=cls.owner)
+        cls.other_shop = Shop.objects.create(title="Other shop", owner=cls.other_member)
+
+        cls.coupon = Coupon.objects.create(barcode="1", amount=Decimal("10.00"), store=cls.shop, owner=cls.owner)
+        cls.private_coupon = Coupon.objects.create(barcode="2", amount=Decimal("5.00"), store=cls.private_shop, owner=cls.owner)
+        cls.other_coupon = Coupon.objects.create(barcode="3", amount=Decimal("2.50"), store=cls.other_shop, owner=cls.other_member)
+
+        group = Group.objects.create(title="Group", owner=cls.owner)
+        group.members.add(cls.owner, cls.member, cls.former_member)
+        group.shops.add(cls.shop)
+        group.members.remove(cls.former_member)
+
+        other_group = Group.objects.create(title="Other group", owner=cls.other_member)
+        other_group.members.add(cls.other_member, cls.former_member)
+        other_group.shops.add(cls.other_shop)
+
+    def assertVisibility(self, model, visible: dict):
+        """
+        Asserts that `visible_to` returns and `is_visible_to` allows exactly the expected objects of every user.
+        """
+        for user, expected in visible.items():
+            with self.subTest(model=model.__name__, user=user.username):
+                self.assertEqual(set(model.objects.visible_to(user)), set(expected))
+                self.assertEqual({obj for obj in model.objects.all() if obj.is_visible_to(user)}, set(expected))
+
+    def test_shops(self):
+        self.assertVisibility(Shop, {
+            self.owner: [self.shop, self.private_shop],
+            self.member: [self.shop],
+            self.former_member: [self.other_shop],
+            self.other_member: [self.other_shop],
+            self.stranger: [],
+        })
+
+    def test_coupons(self):
+        self.assertVisibility(Coupon, {
+            self.owner: [self.coupon, self.private_coupon],
+            self.member: [self.coupon],
+            self.former_member: [self.other_coupon],
+            self.other_member: [self.other_coupon],
+            self.stranger: [],
+        })
+
+    def test_owned_coupon_in_unshared_shop(self):
+        coupon = Coupon.objects.create(barcode="4", amount=Decimal("1.00"), store=self.private_shop, owner=self.stranger)
+
+        self.assertIn(coupon, Coupon.objects.visible_to(self.stranger))
+        self.assertTrue(coupon.is_visible_to(self.stranger))
+        self.assertNotIn(self.private_shop, Shop.objects.visible_to(self.stranger))
+        self.assertFalse(self.private_shop.is_visible_to(self.stranger))
+
+
+class BarcodeDecodingServiceTests(TestCase):
+    """
+    Tests of the bounded pool that decodes the barcodes, when it is full, slow or broken.
+    """
+
+    def setUp(self):
+        patcher = mock.patch("core.barcode.decode_image", return_value="123")
+        self.decode_image = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def service(self, workers: int = 1, queue_depth: int = 1) -> BarcodeDecodingService:
+        service = BarcodeDecodingService(workers=workers, queue_depth=queue_depth, timeout=0.01)
+        self.addCleanup(service.shutdown)
+
+        return service
+
+    def assertSlotsFree(self, service: BarcodeDecodingService, queue_depth: int = 1):
+        for _ in range(queue_depth):
+            self.assertTrue(service._slots.acquire(blocking=False))
+
+        self.assertFalse(service._slots.acquire(blocking=False))
+
+    def test_in_process(self):
+        service = self.service(workers=0)
+
+        self.assertEqual(service.decode(b"image"), "123")
+        self.decode_image.assert_called_once_with(b"image")
+        self.assertSlotsFree(service)
+
+    def test_busy(self):
+        service = self.service(workers=0, queue_depth=1)
+        service._slots.acquire()
+
+        with self.assertRaises(BarcodeServiceBusy):
+            service.decode(b"image")
+
+        self.decode_image.assert_not_called()
+
+    def test_timeout(self):
+        service = self.service()
+        pending = Future()
+
+        with mock.patch.object(service, "_submit", return_value=pending), self.assertRaises(BarcodeTimeout):
+            service.decode(b"image")
+
+        # The job was cancelled and gave its slot back.
+        self.assertTrue(pending.cancelled())
+        self.assertSlotsFree(service)
+
+    def test_timeout_of_running_job(self):
+        service = self.service()
+        running = Future()
+        running.set_running_or_notify_cancel()
+
+        with mock.patch.object(service, "_submit", return_value=running), self.assertRaises(BarcodeTimeout):
+            service.decode(b"image")
+
+        # A running job cannot be cancelled, it holds its slot until it finishes.
+        self.assertFalse(service._slots.acquire(blocking=False))
+
+        running.set_result("123")
+        self.assertSlotsFree(service)
+
+    def test_pool_not_started(self):
+        service = self.service()
+
+        with mock.patch("core.barcode.ProcessPoolExecutor", side_effect=OSError):
+            self.assertEqual(service.decode(b"image"), "123")
+
+        self.assertEqual(service.workers, 0)
+
+    def test_broken_pool_on_submit(self):
+        service = self.service()
+        executor = service._executor = mock.Mock()
+        executor.submit.side_effect = BrokenProcessPool
+
+        self.assertEqual(service.decode(b"image"), "123")
+        executor.shutdown.assert_called_once()
+        self.assertIsNone(service._executor)
+        self.assertSlotsFree(service)
+
+    def test_broken_pool_on_result(self):
+        service = self.service()
+        executor = service._executor = mock.Mock()
+        future = executor.submit.return_value = Future()
+        future.set_exception(BrokenProcessPool())
+
+        with self.assertRaises(BarcodeServiceBusy):
+            service.decode(b"image")
+
+        executor.shutdown.assert_called_once()
+        self.assertSlotsFree(service)
+
+    def test_decode_all(self):
+        service = self.service(workers=0, queue_depth=2)
+        self.decode_image.side_effect = lambda source: source.decode()
+
+        futures = list(service.decode_all([b"1", b"2", b"3", b"4", b"5"]))
+
+        self.assertEqual([future.result() for future in futures], ["1", "2", "3", "4", "5"])
+        self.assertSlotsFree(service, queue_depth=2)
+
+    def test_decode_all_shares_the_queue(self):
+        service = self.service(queue_depth=2)
+        jobs = [Future(), Future()]
+
+        with mock.patch.object(service, "_submit", side_effect=jobs) as submit:
+            futures = service.decode_all([b"1", b"2", b"3"])
+            first = next(futures)
+
+            # The third image waited for a slot, the two queued jobs did not finish in time.
+            self.assertEqual(submit.call_count, 2)
+            self.assertIs(first, jobs[0])
+            self.assertIsInstance(list(futures)[-1].exception(), BarcodeServiceBusy)
+
+        # An upload does not get a slot while the jobs of the import are queued.
+        with self.assertRaises(BarcodeServiceBusy):
+            service.decode(b"image")
+
+        jobs[0].set_result("1")
+        jobs[1].set_result("2")
+        self.assertSlotsFree(service, queue_depth=2)
+
+    def test_decode_all_closed(self):
+        service = self.service(queue_depth=2)
+        jobs = [Future(), Future()]
+
+        with mock.patch.object(service, "_submit", side_effect=jobs):
+            futures = service.decode_all([b"1", b"2"])
+            next(futures)
+            futures.close()
+
+        # The job that was not yielded yet is cancelled and gives its slot back.
+        self.assertTrue(jobs[1].cancelled())
+        self.assertFalse(jobs[0].cancelled())
+        jobs[0].set_result("1")
+        self.assertSlotsFree(service, queue_depth=2)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class DecodeWithCacheTests(TestCase):
+    """
+    Tests of the barcode cache: barcodes and missing barcodes are cached, a busy or slow pool is reported
+    to the caller and not cached.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initgroups", "--nooutput")
+
+        cls.user = get_user_model().objects.create_user(username="owner", password="password")
+        cls.shop = Shop.objects.create(title="Shop", owner=cls.user)
+
+    def setUp(self):
+        self.addCleanup(caches[settings.BARCODE_CACHE].clear)
+
+    def decode(self, error: Exception) -> None:
+        service = mock.Mock()
+        service.decode.side_effect = error
+
+        with mock.patch("core.barcode.get_barcode_service", return_value=service):
+            decode_with_cache(b"image")
+
+    def test_not_cached(self):
+        for error in (BarcodeServiceBusy, BarcodeTimeout):
+            with self.subTest(error.__name__), self.assertRaises(error):
+                self.decode(error("failed"))
+
+            self.assertIsNone(caches[settings.BARCODE_CACHE].get(barcode_cache_key(b"image")))
+
+        service = mock.Mock()
+        service.decode.return_value = "123"
+
+        with mock.patch("core.barcode.get_barcode_service", return_value=service):
+            self.assertEqual(decode_with_cache(b"image"), "123")
+            self.assertEqual(decode_with_cache(b"image"), "123")
+
+        service.decode.assert_called_once()
+
+    def test_failures_cached(self):
+        for error in (NoBarcodeDetected, NoBarcodeData):
+            with self.subTest(error.__name__):
+                caches[settings.BARCODE_CACHE].clear()
+                service = mock.Mock()
+                service.decode.side_effect = error("Nothing found")
+
+                with mock.patch("core.barcode.get_barcode_service", return_value=service):
+                    for _ in range(2):
+                        with self.assertRaisesMessage(error, "Nothing found"):
+                            decode_with_cache(b"image")
+
+                # The second call raised the cached failure without decoding the image again.
+                service.decode.assert_called_once_with(b"image")
+                self.assertEqual(
+                    caches[settings.BARCODE_CACHE].get(barcode_cache_key(b"image")),
+                    (error.__name__, "Nothing found"),
+                )
+
+    def test_hit_touches_entry(self):
+        cache_ = caches[settings.BARCODE_CACHE]
+        key = barcode_cache_key(b"image")
+        service = mock.Mock()
+        service.decode.return_value = "123"
+
+        with mock.patch("core.barcode.get_barcode_service", return_value=service), \
+                mock.patch.object(cache_, "touch", wraps=cache_.touch) as touch:
+            decode_with_cache(b"image")
+            touch.assert_not_called()
+
+            self.assertEqual(decode_with_cache(b"image"), "123")
+            touch.assert_called_once_with(key)
+
+        cache_.set(key, ("NoBarcodeData", "No data found in the barcode."))
+
+        with mock.patch.object(cache_, "touch", wraps=cache_.touch) as touch, self.assertRaises(NoBarcodeData):
+            decode_with_cache(b"image")
+
+        touch.assert_called_once_with(key)
+
+    def test_form(self):
+        errors = {
+            BarcodeServiceBusy: "Too many images are being processed right now. Please try again later.",
+            BarcodeTimeout: "The image took too long to process. Please enter the barcode manually.",
+        }
+
+        for error, message in errors.items():
+            with self.subTest(error.__name__), translation.override("en"):
+                form = CouponForm(
+                    data={"amount": "1.00", "store": self.shop.pk},
+                    files={"coupon_image": SimpleUploadedFile("coupon.png", b"\x89PNG\r\n\x1a\n" + b"\0" * 16)},
+                    user=self.user,
+                )
+
+                with mock.patch("core.forms.decode_with_cache", side_effect=error("failed")):
+                    self.assertFalse(form.is_valid())
+
+                self.assertEqual(form.non_field_errors(), [message])
+
+
+class CouponImageUploadHandlerTests(TestCase):
+    """
+    Tests that the uploaded images are kept in memory up to `COUPON_IMAGE_MAX_MEMORY_SIZE`, spooled to disk
+    above it, and dropped above `COUPON_IMAGE_MAX_SIZE`.
+    """
+    max_memory_size = 1000
+    max_size = 3000
+
+    def setUp(self):
+        for name, value in (("COUPON_IMAGE_MAX_MEMORY_SIZE", self.max_memory_size), ("COUPON_IMAGE_MAX_SIZE", self.max_size)):
+            patcher = mock.patch.object(settings, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def upload(self, size: int, field: str = "coupon_image"):
+        content = b"\x89PNG\r\n\x1a\n" + b"\0" * (size - 8)
+        request = RequestFactory().post("/", {field: SimpleUploadedFile("coupon.png", content, "image/png")})
+        uploaded_file = request.FILES[field]
+        self.addCleanup(uploaded_file.close)
+
+        return uploaded_file, content
+
+    def test_in_memory(self):
+        uploaded_file, content = self.upload(self.max_memory_size)
+
+        self.assertIsInstance(uploaded_file, InMemoryUploadedFile)
+        self.assertEqual(uploaded_file.read(), content)
+
+    def test_spooled(self):
+        uploaded_file, content = self.upload(self.max_memory_size + 1)
+
+        self.assertIsInstance(uploaded_file, TemporaryUploadedFile)
+        self.assertEqual(uploaded_file.size, len(content))
+        self.assertEqual(uploaded_file.read(), content)
+
+    def test_max_size(self):
+        uploaded_file, content = self.upload(self.max_size)
+
+        self.assertEqual(uploaded_file.read(), content)
+        self.assertEqual(CouponImageField().clean(uploaded_file), uploaded_file)
+
+    def test_too_large(self):
+        uploaded_file, _content = self.upload(self.max_size + 1)
+
+        self.assertEqual(uploaded_file.size, self.max_size + 1)
+        self.assertEqual(uploaded_file.read(), b"")
+
+        with translation.override("en"), self.assertRaisesMessage(ValidationError, "The image is too large."):
+            CouponImageField().clean(uploaded_file)
+
+    def test_other_fields(self):
+        uploaded_file, _content = self.upload(self.max_size + 1, field="archive")
+
+        self.assertEqual(uploaded_file.size, self.max_size + 1)
+        self.assertNotEqual(uploaded_file.read(), b"")
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CouponImportTests(TestCase):
+    """
+    Tests of the import of coupons from broken and too large ZIP archives.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initgroups", "--nooutput")
+
+        cls.user = get_user_model().objects.create_user(username="owner", password="password")
+        cls.shop = Shop.objects.create(title="Shop", owner=cls.user)
+
+    def setUp(self):
+        translation.activate("en")
+        self.addCleanup(translation.deactivate)
+        self.client.force_login(self.user)
+
+    def archive(self, *names: str) -> bytes:
+        buffer = io.BytesIO()
+
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
+            for name in names:
+                zip_file.writestr(name, b"not an image " * 100)
+
+        return buffer.getvalue()
+
+    def post(self, archive: bytes):
+        return self.client.post(reverse("core:coupon_import"), {
+            "store": self.shop.pk,
+            "amount": "1.00",
+            "archive": SimpleUploadedFile("coupons.zip", archive, "application/zip"),
+        })
+
+    def results(self, archive: bytes) -> list[tuple[str, str]]:
+        response = self.post(archive)
+
+        self.assertEqual(response.status_code, 200)
+        return [(result.name, str(result.error)) for result in response.context["results"]]
+
+    def test_corrupt_member(self):
+        archive = bytearray(self.archive("corrupt.png", "other.png"))
+        # Overwrite the start of the compressed data of the first member.
+        start = 30 + len("corrupt.png")
+        archive[start:start + 16] = b"\xff" * 16
+
+        with self.assertLogs("core.importing", "WARNING"):
+            results = self.results(bytes(archive))
+
+        self.assertEqual(results, [
+            ("corrupt.png", "The image could not be read."),
+            ("other.png", "The file is not a supported image."),
+        ])
+        self.assertFalse(Coupon.objects.exists())
+
+    def test_encrypted_member(self):
+        archive = bytearray(self.archive("encrypted.png"))
+        # Set the encryption flag of the member in the central directory.
+        directory = archive.index(b"PK\x01\x02")
+        archive[directory + 8] |= 0x1
+
+        with self.assertLogs("core.importing", "WARNING") as logs:
+            results = self.results(bytes(archive))
+
+        self.assertEqual(results, [("encrypted.png", "The image could not be read.")])
+        self.assertIn("password required", logs.output[0])
+
+    def test_too_many_members(self):
+        with mock.patch.object(settings, "COUPON_IMPORT_MAX_FILES", 2):
+            response = self.post(self.archive("1.png", "2.png", "3.png"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["form"].non_field_errors(), ["You can upload at most 2 images at once."])
+        self.assertNotIn("results", response.context)
+
+    def test_many_images(self):
+        images = [SimpleUploadedFile(f"{ index }.png", b"not an image", "image/png") for index in range(150)]
+
+        response = self.client.post(reverse("core:coupon_import"), {"store": self.shop.pk, "amount": "1.00", "images": images})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["results"]), 150)
+
+    def test_hidden_members_not_counted(self):
+        with mock.patch.object(settings, "COUPON_IMPORT_MAX_FILES", 2):
+            results = self.results(self.archive("1.png", "2.png", ".hidden", "__MACOSX/1.png"))
+
+        self.assertEqual([name for name, _error in results], ["1.png", "2.png"])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CouponImportDecodingTests(TestCase):
+    """
+    Tests that the import decodes in the shared barcode pool and stops at its deadline.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initgroups", "--nooutput")
+
+        cls.user = get_user_model().objects.create_user(username="owner", password="password")
+        cls.shop = Shop.objects.create(title="Shop", owner=cls.user)
+
+    def setUp(self):
+        translation.activate("en")
+        self.addCleanup(translation.deactivate)
+        caches[settings.BARCODE_CACHE].clear()
+
+        self.clock = 0
+        self.service = BarcodeDecodingService(workers=0, queue_depth=2, timeout=1)
+        self.addCleanup(self.service.shutdown)
+
+        # Every image takes 4 seconds to decode.
+        def decode_image(source):
+            self.clock += 4
+            return source[8:].decode()
+
+        for patcher in (
+            mock.patch("core.importing.time.monotonic", side_effect=lambda: self.clock),
+            mock.patch("core.barcode.decode_image", side_effect=decode_image),
+        ):
+            self.decode_image = patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def files(self, count: int) -> list[ImportFile]:
+        images = [b"\x89PNG\r\n\x1a\n" + str(index).encode() for index in range(count)]
+        return [ImportFile(f"{ index }.png", image, len(image)) for index, image in enumerate(images)]
+
+    def barcodes(self, results) -> list[str | None]:
+        return [result.coupon and result.coupon.barcode for result in results]
+
+    def test_shared_service(self):
+        with mock.patch("core.importing.get_barcode_service", return_value=self.service) as get_barcode_service:
+            results = import_coupons(self.user, self.shop, Decimal("1.00"), self.files(3))
+
+        get_barcode_service.assert_called_once_with()
+        self.assertEqual(self.barcodes(results), ["0", "1", "2"])
+        self.assertEqual(UserCouponStats.objects.get(user=self.user).coupon_count, 3)
+
+    def test_deadline(self):
+        files = self.files(5)
+        results = import_coupons(self.user, self.shop, Decimal("1.00"), files, service=self.service, batch_size=2, deadline=10)
+
+        # The first batch was inserted. The third image finished decoding after the deadline and was inserted
+        # with the second batch, the other images were not decoded.
+        self.assertEqual(self.decode_image.call_count, 3)
+        self.assertEqual(self.barcodes(results), ["0", "1", "2", None, None])
+        self.assertEqual(
+            [str(result.error) for result in results[3:]],
+            ["Not imported, the import took too long. Upload the image again."] * 2,
+        )
+        self.assertEqual(sorted(Coupon.objects.values_list("barcode", flat=True)), ["0", "1", "2"])
+        self.assertEqual(UserCouponStats.objects.get(user=self.user).coupon_count, 3)
+
+    def test_window(self):
+        read = []
+
+        def files():
+            for file in self.files(7):
+                read.append(file.name)
+                yield file
+
+        # Every decoded image was read at most as many images before as the queue of the service holds.
+        ahead = []
+        self.decode_image.side_effect = lambda source: ahead.append(len(read) - len(ahead)) or source[8:].decode()
+
+        results = import_coupons(self.user, self.shop, Decimal("1.00"), files(), service=self.service, batch_size=3)
+
+        self.assertEqual(self.barcodes(results), [str(index) for index in range(7)])
+        self.assertLessEqual(max(ahead), 2)
+        self.assertEqual(Coupon.objects.count(), 7)
+
+    def test_cached_images_after_deadline(self):
+        import_coupons(self.user, self.shop, Decimal("1.00"), self.files(1), service=self.service)
+
+        results = import_coupons(self.user, self.shop, Decimal("1.00"), self.files(2), service=self.service, deadline=self.clock)
+
+        # The cached barcode needs no decoding, so it is imported after the deadline.
+        self.assertEqual(self.decode_image.call_count, 1)
+        self.assertEqual(self.barcodes(results), ["0", None])
+
+    def test_view_time_limit(self):
+        self.client.force_login(self.user)
+        images = [SimpleUploadedFile(file.name, file.source, "image/png") for file in self.files(2)]
+        data = {"store": self.shop.pk, "amount": "1.00", "images": images}
+
+        with mock.patch.object(settings, "COUPON_IMPORT_TIME_LIMIT", 0), \
+                mock.patch("core.importing.get_barcode_service", return_value=self.service):
+            response = self.client.post(reverse("core:coupon_import"), data)
+
+        self.assertEqual(response.status_code, 200)
+        self.decode_image.assert_not_called()
+        self.assertFalse(Coupon.objects.exists())
+        self.assertIn(
+            "The import took too long, 2 images were not imported. Upload them again.",
+            [str(message) for message in response.context["messages"]],
+        )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ImportCouponsCommandTests(TestCase):
+    """
+    Tests of the arguments of the importcoupons command.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initgroups", "--nooutput")
+
+        cls.user = get_user_model().objects.create_user(username="owner", password="password")
+        cls.shop = Shop.objects.create(title="Shop", owner=cls.user)
+
+    def setUp(self):
+        caches[settings.BARCODE_CACHE].clear()
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+        for index in range(3):
+            (self.directory / f"{ index }.png").write_bytes(b"\x89PNG\r\n\x1a\n" + str(index).encode())
+
+        patcher = mock.patch("core.barcode.decode_image", side_effect=lambda source: Path(source).read_bytes()[8:].decode())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def call(self, *args) -> str:
+        stdout = io.StringIO()
+        call_command("importcoupons", *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_without_workers(self):
+        output = self.call("owner", str(self.shop.pk), "1.00", str(self.directory), "--workers", "0")
+
+        self.assertIn("Imported 3 of 3 coupons.", output)
+        self.assertEqual(sorted(Coupon.objects.values_list("barcode", flat=True)), ["0", "1", "2"])
+
+    def test_invalid_amount(self):
+        for amount in ("NaN", "-5", "1.234", "1e12", "abc"):
+            with self.subTest(amount), self.assertRaisesMessage(CommandError, f"{ amount } is not a valid amount"):
+                self.call("owner", str(self.shop.pk), amount, str(self.directory))
+
+        self.assertFalse(Coupon.objects.exists())
+
+    def test_negative_workers(self):
+        with self.assertRaisesMessage(CommandError, "The number of workers cannot be negative."):
+            self.call("owner", str(self.shop.pk), "1.00", str(self.directory), "--workers", "-1")
+
+
+class DecodeBarcodeTests(SimpleTestCase):
+    """
+    Tests of the decoding passes, on a generated 800x600 image with a barcode-like block of bars.
+    The zbar decoder is replaced with one that records the images it gets from every pass.
+    """
+
+    def setUp(self):
+        self.image = numpy.full((600, 800), 255, numpy.uint8)
+
+        # 30 bars, 4 pixels wide, in the block from (320, 240) to (556, 340).
+        for x in range(320, 560, 8):
+            self.image[240:340, x:x + 4] = 0
+
+        self.shapes = []
+        self.found = {}
+
+        def decode(image):
+            self.shapes.append(image.shape)
+            return self.found.get(len(self.shapes), [])
+
+        patcher = mock.patch("core.utils.decode", side_effect=decode)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def encoded(self, image=None):
+        _, buffer = cv2.imencode(".png", self.image if image is None else image)
+        return numpy.frombuffer(buffer.tobytes(), numpy.uint8)
+
+    def test_pass_order(self):
+        with self.assertRaises(NoBarcodeDetected):
+            decode_barcode(self.encoded())
+
+        self.assertEqual([name for name, _pass in DECODE_PASSES], ["reduced_4", "reduced_2", "region", "full"])
+        self.assertEqual(len(self.shapes), 4)
+        self.assertEqual(self.shapes[0], (150, 200))
+        self.assertEqual(self.shapes[1], (300, 400))
+        self.assertLess(self.shapes[2][0] * self.shapes[2][1], 600 * 800 / 4)
+        self.assertEqual(self.shapes[3], (600, 800))
+
+    def test_decode_pass(self):
+        for call, name in enumerate(["reduced_4", "reduced_2", "region", "full"], start=1):
+            with self.subTest(name):
+                self.shapes.clear()
+                self.found = {call: [Decoded(name.encode())]}
+
+                self.assertEqual(decode_barcode(self.encoded()), DecodeResult(name, name))
+                # The later passes are not tried.
+                self.assertEqual(len(self.shapes), call)
+
+    def test_region_scaled_to_full_resolution(self):
+        context = DecodeContext(self.encoded())
+        x, y, width, height = find_barcode_region(context.variant(cv2.IMREAD_REDUCED_GRAYSCALE_4))
+
+        region = _region_pass(context)
+
+        # The box found in the quarter size image is cut out of the full size one.
+        self.assertEqual(region.shape, (height * 4, width * 4))
+        self.assertTrue(numpy.shares_memory(region, context.variant(cv2.IMREAD_GRAYSCALE)))
+        # It holds all the bars and less than a quarter of the image.
+        self.assertEqual((region < 128).sum(), (self.image < 128).sum())
+        self.assertLess(region.size, self.image.size / 4)
+
+    def test_no_region(self):
+        blank = numpy.full((600, 800), 255, numpy.uint8)
+
+        self.assertIsNone(_region_pass(DecodeContext(self.encoded(blank))))
+
+        with self.assertRaises(NoBarcodeDetected):
+            decode_barcode(self.encoded(blank))
+
+        # The region pass is skipped, it found nothing to crop.
+        self.assertEqual(self.shapes, [(150, 200), (300, 400), (600, 800)])
+
+    def test_no_barcode_data(self):
+        self.found = {call: [Decoded(b"")] for call in range(1, 5)}
+
+        with self.assertRaisesMessage(NoBarcodeData, "No data found in the barcode."):
+            decode_barcode(self.encoded())
+
+        # A barcode without data does not stop the search.
+        self.assertEqual(len(self.shapes), 4)
+
+    def test_data_after_empty_barcode(self):
+        self.found = {1: [Decoded(b"")], 3: [Decoded(b""), Decoded(b"123")]}
+
+        self.assertEqual(decode_barcode(self.encoded()), DecodeResult("123", "region"))
+
+    def test_no_barcode_detected(self):
+        with self.assertRaisesMessage(NoBarcodeDetected, "No barcode detected in the image."):
+            decode_barcode(self.encoded())
+
+    def test_variants_decoded_once(self):
+        context = DecodeContext(self.encoded())
+
+        with mock.patch("core.utils.cv2.imdecode", wraps=cv2.imdecode) as imdecode:
+            for _name, decode_pass in DECODE_PASSES:
+                run_decode_pass(decode_pass, context)
+
+        # The region pass reuses the quarter and the full size images.
+        self.assertEqual(imdecode.call_count, 3)
+
+
+
+@override_settings(CACHES=TEST_CACHES)
+class QuerystringTagTests(TestCase):
+    """
+    Tests that the links built with the `querystring` tag keep the other parameters of the request.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initgroups", "--nooutput")
+
+        cls.user = get_user_model().objects.create_user(username="user", password="password")
+
+    def render(self, path: str, template: str) -> str:
+        request = RequestFactory().get(path)
+        return Template("{% load core_extras %}" + template).render(Context({"request": request}))
+
+    def test_replace(self):
+        self.assertEqual(self.render("/shops/?page=2&currency=EUR", '{% querystring currency="USD" %}'), "?page=2&amp;currency=USD")
+
+    def test_add(self):
+        self.assertEqual(self.render("/shops/?page=2", '{% querystring currency="USD" %}'), "?page=2&amp;currency=USD")
+        self.assertEqual(self.render("/shops/", '{% querystring currency="USD" %}'), "?currency=USD")
+
+    def test_remove(self):
+        self.assertEqual(self.render("/shops/?page=2&currency=EUR", "{% querystring page=None %}"), "?currency=EUR")
+
+    def test_currency_links(self):
+        cache.set(RATES_CACHE_KEY, RateTable({"USD": Decimal("1.08")}, timezone.now()), None)
+        self.client.force_login(self.user)
+        translation.activate("en")
+        self.addCleanup(translation.deactivate)
+
+        response = self.client.get(reverse("core:shop_list"), {"page": 1, "currency": "EUR"})
+
+        self.assertContains(response, 'href="?page=1&amp;currency=USD"')
+        self.assertNotContains(response, 'href="?currency=')
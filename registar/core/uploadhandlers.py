@@ -0,0 +1,96 @@
+from io import BytesIO
+
+from django.core.files.uploadedfile import (InMemoryUploadedFile,
+                                            TemporaryUploadedFile)
+from django.core.files.uploadhandler import (FileUploadHandler,
+                                             StopFutureHandlers)
+
+import registar.settings as settings
+
+
+class CouponImageUploadHandler(FileUploadHandler):
+    """
+    Upload handler for coupon images.
+
+    Small images are kept in a single in-memory buffer, larger ones are spooled to a temporary file.
+    Data above `COUPON_IMAGE_MAX_SIZE` is dropped as it arrives, the returned file is then empty
+    but keeps the received size, so the form can reject it. Other file fields are left to the next handlers.
+    """
+    field_names = {"coupon_image", "images"}
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.activated = field_name in self.field_names
+
+        if self.activated:
+            self.size = 0
+            self.file = BytesIO()
+            raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.activated:
+            return raw_data
+
+        self.size += len(raw_data)
+
+        if self.size > settings.COUPON_IMAGE_MAX_SIZE:
+            self._discard()
+            return None
+
+        if self.size > settings.COUPON_IMAGE_MAX_MEMORY_SIZE and isinstance(self.file, BytesIO):
+            self._spool_to_disk()
+
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        if not self.activated:
+            return None
+
+        if self.file is None:
+            return InMemoryUploadedFile(
+                BytesIO(), self.field_name, self.file_name, self.content_type,
+                self.size, self.charset, self.content_type_extra
+            )
+
+        self.file.seek(0)
+
+        if isinstance(self.file, TemporaryUploadedFile):
+            self.file.size = file_size
+            return self.file
+
+        return InMemoryUploadedFile(
+            self.file, self.field_name, self.file_name, self.content_type,
+            file_size, self.charset, self.content_type_extra
+        )
+
+    def upload_interrupted(self):
+        if self.activated:
+            self._discard()
+
+    def _spool_to_disk(self):
+        temporary_file = TemporaryUploadedFile(self.file_name, self.content_type, 0, self.charset, self.content_type_extra)
+        temporary_file.write(self.file.getbuffer())
+
+        self.file = temporary_file
+
+    def _discard(self):
+        if isinstance(self.file, TemporaryUploadedFile):
+            self.file.close()
+
+        self.file = None
+
+
+def image_source(uploaded_file):
+    """
+    Returns what the barcode decoder should read the uploaded image from, without copying it:
+    the path of a temporary file, or the buffer of an in-memory upload.
+    """
+    if hasattr(uploaded_file, "temporary_file_path"):
+        return uploaded_file.temporary_file_path()
+
+    # BytesIO hands out its internal bytes object here, instead of a copy of the data.
+    if isinstance(uploaded_file.file, BytesIO):
+        return uploaded_file.file.getvalue()
+
+    uploaded_file.seek(0)
+    return uploaded_file.read()
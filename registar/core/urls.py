@@ -23,6 +23,7 @@ urlpatterns = [
     path("coupons/", views.CouponListView.as_view(), name="coupon_list"),
     path("coupons/<uuid:pk>/", views.CouponDetailView.as_view(), name="coupon_detail"),
     path("coupons/create/", views.CouponCreateView.as_view(), name="coupon_create"),
+    path("coupons/import/", views.CouponImportView.as_view(), name="coupon_import"),
     path("coupons/<uuid:pk>/update/", views.CouponUpdateView.as_view(), name="coupon_update"),
     path("coupons/<uuid:pk>/delete/", views.CouponDeleteView.as_view(), name="coupon_delete"),
     path("coupons/<uuid:pk>/pin/", views.CouponPinView.as_view(), name="coupon_pin"),
@@ -1,9 +1,13 @@
-from typing import Type
+import logging
+from typing import Callable, NamedTuple, Type
 from django.forms import CheckboxInput, Form, Select, SelectMultiple
 
 import cv2 
 from pyzbar.pyzbar import decode 
 
+logger = logging.getLogger(__name__)
+
+
 class NoBarcodeDetected(Exception):
     pass
 
@@ -11,6 +15,34 @@ class NoBarcodeData(Exception):
     pass
 
 
+# Leading bytes of the image formats, that OpenCV can decode.
+IMAGE_SIGNATURES = {
+    "jpeg": (b"\xff\xd8\xff",),
+    "png": (b"\x89PNG\r\n\x1a\n",),
+    "bmp": (b"BM",),
+    "tiff": (b"II*\x00", b"MM\x00*"),
+}
+
+
+def sniff_image_format(header: bytes) -> str | None:
+    """
+    Returns the image format, guessed from the first bytes of the file, or `None` if it is not a supported image.
+    """
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "webp"
+
+    for image_format, signatures in IMAGE_SIGNATURES.items():
+        if header.startswith(signatures):
+            return image_format
+
+    return None
+
+
+class DecodeResult(NamedTuple):
+    data: str
+    decode_pass: str
+
+
 def bootstrapify_form(form: Form, floating: bool = False) -> Form:
     """
     Adds `Bootstrap` classes to form field's instances. Returns form, that was bootstrapified.
@@ -34,15 +66,124 @@ def bootstrapify_form(form: Form, floating: bool = False) -> Form:
     return form
 
 
-def extract_barcode(image):
-    img = cv2.imdecode(image, cv2.IMREAD_COLOR)
-    detectedBarcodes = decode(img)
+class DecodeContext:
+    """
+    Holds an encoded image and the decoded variants of it, that are created only when a pass needs them.
+    """
+
+    def __init__(self, image):
+        self.image = image
+        self._variants = {}
+
+    def variant(self, flag: int):
+        if flag not in self._variants:
+            self._variants[flag] = cv2.imdecode(self.image, flag)
+
+        return self._variants[flag]
+
+
+def find_barcode_region(gray, padding: float = 0.1):
+    """
+    Returns the bounding box `(x, y, width, height)` of the most barcode-like area of
+    the grayscale image, or `None` if nothing resembling a barcode is found.
+    """
+    gradient_x = cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=-1)
+    gradient_y = cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=-1)
+    gradient = cv2.convertScaleAbs(cv2.subtract(gradient_x, gradient_y))
+
+    blurred = cv2.blur(gradient, (9, 9))
+    _, thresholded = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (21, 7))
+    closed = cv2.morphologyEx(thresholded, cv2.MORPH_CLOSE, kernel)
+    closed = cv2.erode(closed, None, iterations=4)
+    closed = cv2.dilate(closed, None, iterations=4)
+
+    contours, _ = cv2.findContours(closed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    if not contours:
+        return None
+
+    x, y, width, height = cv2.boundingRect(max(contours, key=cv2.contourArea))
+    pad_x, pad_y = int(width * padding), int(height * padding)
+
+    return max(x - pad_x, 0), max(y - pad_y, 0), width + 2 * pad_x, height + 2 * pad_y
+
 
-    if not detectedBarcodes:
-        raise NoBarcodeDetected("No barcode detected in the image.")
+def _reduced_pass(flag: int):
+    def decode_pass(context: DecodeContext):
+        return context.variant(flag)
 
-    for barcode in detectedBarcodes:
-        if barcode.data == "":
-            raise NoBarcodeData("No data found in the barcode.")
+    return decode_pass
+
+
+def _region_pass(context: DecodeContext):
+    reduced = context.variant(cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    full = context.variant(cv2.IMREAD_GRAYSCALE)
+
+    if reduced is None or full is None:
+        return None
+
+    region = find_barcode_region(reduced)
+
+    if region is None:
+        return None
+
+    scale = full.shape[1] / reduced.shape[1]
+    x, y, width, height = (int(value * scale) for value in region)
+
+    return full[y:y + height, x:x + width]
+
+
+def _full_pass(context: DecodeContext):
+    return context.variant(cv2.IMREAD_GRAYSCALE)
+
+
+# Passes are tried in order, from the cheapest one to the full resolution image.
+DECODE_PASSES: list[tuple[str, Callable]] = [
+    ("reduced_4", _reduced_pass(cv2.IMREAD_REDUCED_GRAYSCALE_4)),
+    ("reduced_2", _reduced_pass(cv2.IMREAD_REDUCED_GRAYSCALE_2)),
+    ("region", _region_pass),
+    ("full", _full_pass),
+]
+
+
+def run_decode_pass(decode_pass: Callable, context: DecodeContext) -> list:
+    """
+    Returns the barcodes found by a single pass.
+    """
+    img = decode_pass(context)
+
+    if img is None or not img.size:
+        return []
+
+    return decode(img)
+
+
+def decode_barcode(image) -> DecodeResult:
+    """
+    Extracts the barcode from the encoded image, trying the passes from `DECODE_PASSES`
+    until one of them finds a barcode. Returns the barcode data with the name of the pass that found it.
+    """
+    context = DecodeContext(image)
+    found_empty_barcode = False
+
+    for name, decode_pass in DECODE_PASSES:
+        for barcode in run_decode_pass(decode_pass, context):
+            if not barcode.data:
+                found_empty_barcode = True
+                continue
+
+            return DecodeResult(barcode.data.decode("utf-8"), name)
+
+    if found_empty_barcode:
+        raise NoBarcodeData("No data found in the barcode.")
+
+    raise NoBarcodeDetected("No barcode detected in the image.")
+
+
+def extract_barcode(image):
+    result = decode_barcode(image)
+    logger.debug("Barcode decoded in the '%s' pass", result.decode_pass)
 
-        return barcode.data.decode("utf-8") 
+    return result.data
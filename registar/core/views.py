@@ -1,34 +1,41 @@
 import logging
+import time
 from itertools import chain
 from typing import Any
 
-import requests
 from django.contrib import messages
+from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import (LoginRequiredMixin,
                                         PermissionRequiredMixin,
                                         UserPassesTestMixin)
 from django.contrib.messages.views import SuccessMessageMixin
-from django.db.models import Case, Count, IntegerField, Q, Sum, Value, When
-from django.db.models.functions import Coalesce
+from django.db.models import Count, OuterRef, Q, Sum
 from django.db.models.query import QuerySet
 from django.forms import BaseForm
 from django.http import HttpRequest, HttpResponse
-from django.shortcuts import get_object_or_404, redirect
+from django.shortcuts import redirect
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
-from django.views.generic import (CreateView, DeleteView, DetailView, ListView,
-                                  TemplateView, UpdateView, View)
+from django.views.generic import (CreateView, DeleteView, DetailView, FormView,
+                                  ListView, TemplateView, UpdateView, View)
+from exchange.mixins import CurrencyMixin
 from groups.models import Group, GroupMembership
 
 import registar.settings as settings
 
-from .forms import CouponForm
+from .forms import CouponForm, CouponImportForm
+from .importing import (ERROR_MESSAGES, files_from_archive, files_from_uploads,
+                        import_coupons)
+from .mixins import CachedObjectMixin, ConditionalGetMixin
+from .aggregates import count_subquery
+from .conditional import fingerprint
 from .models import Coupon, Shop
+from .stats import get_stats
 
 logger = logging.getLogger(__name__)
 
 
-class IndexView(TemplateView):
+class IndexView(CurrencyMixin, TemplateView):
     """
     A view that renders the index page.
     """
@@ -41,8 +48,8 @@ class IndexView(TemplateView):
         context["coupons"] = self.get_coupons()
         context["groups"] = self.get_groups()
 
-        amount_of_coupons = Sum('amount',  default=0)
-        context["total_amount_returned"] = Coupon.objects.filter(owner=self.request.user.pk, is_used=True).aggregate(amount_of_coupons)['amount__sum']
+        context["total_amount_returned"] = get_stats(self.request.user.pk).returned_amount if self.request.user.is_authenticated else 0
+        context["total_amount_returned_converted"] = self.convert(context["total_amount_returned"])
 
         context["recent_coupons"] = Coupon.objects.filter(owner=self.request.user.pk).order_by('-date_added')[:3]
         context["pinned_coupons"] = Coupon.objects.filter(owner=self.request.user.pk, is_pinned=True)[:3]
@@ -76,7 +83,7 @@ class IndexView(TemplateView):
         number_of_remaining_shops = max_shops_in_index - pinned_shops.count()
         unpinned_shops = all_shops.filter(is_pinned=False)[:number_of_remaining_shops]
 
-        return list(chain(pinned_shops, unpinned_shops))
+        return self.convert_objects(chain(pinned_shops, unpinned_shops), "amount_unused")
     
     def get_coupons(self):
         max_coupons_in_index = settings.MAX_COUPONS_IN_INDEX
@@ -92,64 +99,15 @@ class IndexView(TemplateView):
         number_of_remaining_coupons = max_coupons_in_index - pinned_coupons.count()
         unpinned_coupons = all_coupons.filter(is_pinned=False)[:number_of_remaining_coupons]
 
-        return list(chain(pinned_coupons, unpinned_coupons))
+        return self.convert_objects(chain(pinned_coupons, unpinned_coupons), "amount")
 
     def get_groups(self):
-        
-        # owned_groups = Group.objects.raw(
-        #     f"""
-        #     SELECT
-        #         g.id,
-        #         g.title,
-        #         g.is_pinned,
-        #         g.date_added,
-        #         COUNT(DISTINCT m.user_id) AS member_count,
-        #         COUNT(DISTINCT s.id) AS shop_count,
-        #         COALESCE(SUM(CASE WHEN c.is_used = False THEN c.amount ELSE NULL END), 0) as money_amount
-        #     FROM
-        #         groups_group g
-        #     LEFT JOIN
-        #         groups_groupmembership m
-        #     ON
-        #         g.id = m.group_id
-        #     LEFT JOIN
-        #         groups_shopgroup s
-        #     ON
-        #         g.id = s.group_id
-        #     LEFT JOIN
-        #         core_shop sh
-        #     ON
-        #         s.shop_id = sh.id
-        #     LEFT JOIN
-        #         core_coupon c
-        #     ON
-        #         sh.id = c.store_id
-        #     WHERE
-        #         g.owner_id = {self.request.user.pk}
-        #     GROUP BY
-        #         g.id
-        #     ORDER BY
-        #         g.is_pinned DESC,
-        #         g.date_added DESC
-        #     """
-        # )
-
-        owned_groups = Group.objects.filter(owner_id=self.request.user.pk).annotate(
-                member_count=Count('groupmembership__user_id', distinct=True),
-                shop_count=Count('shopgroup__id', distinct=True),
-                money_amount=Coalesce(Sum(
-                    Case(
-                        When(shops__coupon__is_used=False, then='shops__coupon__amount'),
-                        default=Value(0),
-                        output_field=IntegerField()
-                    )
-                ), 0)
-            ).order_by('-is_pinned', '-date_added')
+        owned_groups = Group.objects.filter(owner_id=self.request.user.pk).order_by('-is_pinned', '-date_added')
 
-        return owned_groups[:6]
+        return self.convert_objects(owned_groups[:6], "unused_amount")
 
 
-class OverviewView(LoginRequiredMixin, TemplateView):
+class OverviewView(LoginRequiredMixin, CurrencyMixin, TemplateView):
     """
     A view that renders the overview page.
     """
@@ -158,32 +116,37 @@ class OverviewView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
         context = super().get_context_data(**kwargs)
 
-        amount_of_coupons = Sum('amount',  default=0)
-        
-        total_amount = Coupon.objects.filter(owner=self.request.user.pk).aggregate(amount_of_coupons).get('amount__sum') or 0
-        context["total_amount"] = total_amount
-        
-        total_amount_returned = Coupon.objects.filter(owner=self.request.user.pk, is_used=True).aggregate(amount_of_coupons).get('amount__sum') or 0
-        context["total_amount_returned"] = total_amount_returned
-        
-        total_amount_remaining = total_amount - total_amount_returned
-        context["total_amount_remaining"] = total_amount_remaining
+        user_pk = self.request.user.pk
 
-        context["returned_percentage"] = round(total_amount_returned / total_amount * 100, 2) if total_amount else 0
+        # The coupon statistics are kept up to date in a single row, see `core.stats`.
+        stats = get_stats(user_pk)
 
-        context["total_shops"] = Shop.objects.filter(owner=self.request.user.pk).count()
-        context["total_shops_pinned"] = Shop.objects.filter(owner=self.request.user.pk, is_pinned=True).count()
-    
-        context["total_coupons"] = Coupon.objects.filter(owner=self.request.user.pk).count()
-        context["total_shared_coupons"] = Coupon.objects.filter(owner=self.request.user.pk, is_shared=True).count()
-        context["total_pinned_coupons"] = Coupon.objects.filter(owner=self.request.user.pk, is_pinned=True).count()
-        context["total_used_coupons"] = Coupon.objects.filter(owner=self.request.user.pk, is_used=True).count()
-        context["total_unused_coupons"] = Coupon.objects.filter(owner=self.request.user.pk, is_used=False).count()
-        
+        context["total_amount"] = total_amount = stats.total_amount
+        context["total_amount_returned"] = total_amount_returned = stats.returned_amount
+        context["total_amount_remaining"] = total_amount_remaining = stats.remaining_amount
+
+        context["total_coupons"] = stats.coupon_count
+        context["total_shared_coupons"] = stats.shared_count
+        context["total_pinned_coupons"] = stats.pinned_count
+        context["total_used_coupons"] = stats.used_count
+        context["total_unused_coupons"] = stats.unused_count
+
+        context["total_amount_converted"] = self.convert(total_amount)
+        context["total_amount_returned_converted"] = self.convert(total_amount_returned)
+        context["total_amount_remaining_converted"] = self.convert(total_amount_remaining)
+
+        context["returned_percentage"] = round(total_amount_returned / total_amount * 100, 2) if total_amount else 0
         context["used_percentage"] = round(context["total_used_coupons"] / context["total_coupons"] * 100, 2) if context["total_coupons"] else 0
 
-        context["total_groups"] = Group.objects.filter(owner=self.request.user.pk).count()
-        context["total_memberships"] = GroupMembership.objects.filter(group__owner=self.request.user.pk).count()
+        # The remaining counts are independent subqueries of a single query, so their joins do not multiply each other.
+        context.update(
+            get_user_model().objects.filter(pk=user_pk).annotate(
+                total_shops=count_subquery(Shop.objects.filter(owner=OuterRef('pk')), 'owner'),
+                total_shops_pinned=count_subquery(Shop.objects.filter(owner=OuterRef('pk'), is_pinned=True), 'owner'),
+                total_groups=count_subquery(Group.objects.filter(owner=OuterRef('pk')), 'owner'),
+                total_memberships=count_subquery(GroupMembership.objects.filter(group__owner=OuterRef('pk')), 'group__owner'),
+            ).values('total_shops', 'total_shops_pinned', 'total_groups', 'total_memberships').get()
+        )
 
         return context
 
@@ -191,7 +154,7 @@ class OverviewView(LoginRequiredMixin, TemplateView):
 # ========== Shop views ==========
 
 
-class ShopListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
+class ShopListView(LoginRequiredMixin, PermissionRequiredMixin, CurrencyMixin, ListView):
     """
     A view that renders a list of shops.
     """
@@ -224,24 +187,38 @@ class ShopListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
             "-date_added"
         )
 
+    def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
+        context = super().get_context_data(**kwargs)
+
+        # Only the shops of the current page are converted, all with the same rate.
+        page = context["page_obj"]
+        page.object_list = context["shops"] = self.convert_objects(page.object_list, "amount_unused")
+
+        return context
+
 
-class ShopDetailView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, DetailView):
+class ShopDetailView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, ConditionalGetMixin, CachedObjectMixin, DetailView):
     """
     A view that renders a list of coupons for a shop.
     """
     model = Shop
+    select_related = ("owner",)
     context_object_name = "shop"
     permission_required = "core.view_shop"
 
     def test_func(self) -> bool:
-        shop = self.get_object()
-        return shop.owner.pk == self.request.user.pk or shop.groups.filter(members=self.request.user.pk).exists()
+        return self.get_object().is_visible_to(self.request.user)
+
+    def get_coupons(self) -> QuerySet[Any]:
+        return self.get_object().coupon_set.filter(owner=self.request.user.pk)
+
+    def get_fingerprint(self) -> tuple:
+        return (self.get_object().date_modified, *fingerprint(self.get_coupons()).values())
     
     def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
         context = super().get_context_data(**kwargs)
-        shop = self.get_object()
 
-        context["coupons"] = shop.coupon_set.filter(owner=self.request.user.pk).order_by('-is_pinned', '-date_added')
+        context["coupons"] = self.get_coupons().order_by('-is_pinned', '-date_added')
         
         return context
 
@@ -271,11 +248,12 @@ class ShopCreateView(LoginRequiredMixin, PermissionRequiredMixin, SuccessMessage
         return super().get(request, *args, **kwargs)
 
 
-class ShopUpdateView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, UpdateView):
+class ShopUpdateView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, CachedObjectMixin, UpdateView):
     """
     A view that updates a shop.
     """
     model = Shop
+    select_related = ("owner",)
     fields = ['title', 'is_pinned']
     success_message = _("Shop updated successfully")
     permission_required = "core.change_shop"
@@ -298,20 +276,22 @@ class ShopUpdateView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTest
         return super().get(request, *args, **kwargs)
     
     def form_valid(self, form: BaseForm) -> HttpResponse:
+        # The form already changed the cached object, its title before the update is in the initial data.
         logger.info("User %s (pk: %d) updated shop %s (pk: %s)",
                     self.request.user,
                     self.request.user.pk,
-                    self.get_object().title,
+                    form.initial.get("title"),
                     self.get_object().pk
         )
         return super().form_valid(form)
 
 
-class ShopDeleteView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, DeleteView):
+class ShopDeleteView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, CachedObjectMixin, DeleteView):
     """
     A view that deletes a shop.
     """
     model = Shop
+    select_related = ("owner",)
     success_url = '/shops/'
     success_message = _("Shop deleted successfully")
     permission_required = "core.delete_shop"
@@ -338,10 +318,12 @@ class ShopDeleteView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTest
         return super().form_valid(form)
 
 
-class ShopPinView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, View):
+class ShopPinView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, CachedObjectMixin, View):
     """
     A view that pins a shop.
     """
+    model = Shop
+    select_related = ("owner",)
     success_message = _("Shop pinned successfully!")
     permission_required = "core.change_shop"
 
@@ -363,14 +345,13 @@ class ShopPinView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMix
         )
         return redirect('core:shop_detail', pk=shop.pk)
 
-    def get_object(self, queryset=None):
-        return Shop.objects.get(pk=self.kwargs['pk'])
-    
 
-class ShopUnpinView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, View):
+class ShopUnpinView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, CachedObjectMixin, View):
     """
     A view that unpins a shop.
     """
+    model = Shop
+    select_related = ("owner",)
     success_message = _("Shop unpinned successfully!")
     permission_required = "core.change_shop"
 
@@ -392,14 +373,13 @@ class ShopUnpinView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestM
         )
         return redirect('core:shop_detail', pk=shop.pk)
 
-    def get_object(self, queryset=None):
-        return Shop.objects.get(pk=self.kwargs['pk'])
 
-
-class ShopUploadToMarketplaceView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, View):
+class ShopUploadToMarketplaceView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, CachedObjectMixin, View):
     """
     A view that uploads a shop to the marketplace.
     """
+    model = Shop
+    select_related = ("owner",)
     success_message = _("Shop uploaded to the marketplace successfully!")
     permission_required = "core.upload_to_marketplace_shop"
 
@@ -423,14 +403,13 @@ class ShopUploadToMarketplaceView(LoginRequiredMixin, PermissionRequiredMixin, U
         )
         return redirect('core:shop_detail', pk=shop.pk)
 
-    def get_object(self, queryset=None):
-        return Shop.objects.get(pk=self.kwargs['pk'])
-    
 
-class ShopRemoveFromMarketplaceView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, View):
+class ShopRemoveFromMarketplaceView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, CachedObjectMixin, View):
     """
     A view that removes a shop from the marketplace.
     """
+    model = Shop
+    select_related = ("owner",)
     success_message = _("Shop removed from the marketplace successfully!")
     permission_required = "core.remove_from_marketplace_shop"
 
@@ -454,9 +433,6 @@ class ShopRemoveFromMarketplaceView(LoginRequiredMixin, PermissionRequiredMixin,
         )
         return redirect('core:shop_detail', pk=shop.pk)
 
-    def get_object(self, queryset=None):
-        return Shop.objects.get(pk=self.kwargs['pk'])
-
 
 # ========== Coupon views ==========
 
@@ -480,17 +456,21 @@ class CouponListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
         )
 
 
-class CouponDetailView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, DetailView):
+class CouponDetailView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, CurrencyMixin, ConditionalGetMixin, CachedObjectMixin, DetailView):
     """
     A view that renders a list of coupons for a shop.
     """
     model = Coupon
+    select_related = ("owner", "store")
     context_object_name = "coupon"
     permission_required = "core.view_coupon"
 
     def test_func(self) -> bool:
+        return self.get_object().is_visible_to(self.request.user)
+
+    def get_fingerprint(self) -> tuple:
         coupon = self.get_object()
-        return coupon.owner.pk == self.request.user.pk or coupon.store.groups.filter(members=self.request.user.pk).exists()
+        return (coupon.date_modified, coupon.store.date_modified)
 
     def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
         context = super().get_context_data(**kwargs)
@@ -499,18 +479,7 @@ class CouponDetailView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTe
         shared_url = self.request.build_absolute_uri(reverse('core:coupon_shared_detail', kwargs={'pk': coupon.pk}))
         context["shared_url"] = shared_url
 
-        # Get the exchange rate
-        url = "https://api.frankfurter.app/latest"
-        params = {
-            'amount': coupon.amount,
-            'from': 'EUR',
-            'to': 'USD'
-        }
-
-        response = requests.get(url, params=params)
-        data = response.json()
-
-        context["in_usd"] = round(data['rates']['USD'], 2)
+        context["amount_converted"] = self.convert(coupon.amount)
 
         return context
 
@@ -528,7 +497,7 @@ class CouponCreateView(LoginRequiredMixin, PermissionRequiredMixin, SuccessMessa
         form.instance.owner = self.request.user
         
         if not form.instance.title:
-            form.instance.title = f"Unnamed coupon for shop {form.instance.store.title} ({form.instance.amount}€)"
+            form.instance.title = form.instance.get_default_title()
         
         logger.info("User %s (pk: %d) created a coupon %s (pk: %s)",
                     self.request.user,
@@ -548,11 +517,52 @@ class CouponCreateView(LoginRequiredMixin, PermissionRequiredMixin, SuccessMessa
         return super().get(request, *args, **kwargs)
 
 
-class CouponUpdateView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, UpdateView):
+class CouponImportView(LoginRequiredMixin, PermissionRequiredMixin, FormView):
+    """
+    A view that imports coupons from a ZIP archive or from several images.
+    """
+    form_class = CouponImportForm
+    template_name = 'core/coupon_import.html'
+    permission_required = "core.add_coupon"
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['user'] = self.request.user
+        return kwargs
+
+    def form_valid(self, form) -> HttpResponse:
+        files = files_from_uploads(form.cleaned_data["images"])
+
+        if form.cleaned_data["archive"]:
+            files = chain(files_from_archive(form.cleaned_data["archive"]), files)
+
+        # The images are decoded within the request, up to a time limit below the timeout of the server.
+        results = import_coupons(
+            self.request.user,
+            form.cleaned_data["store"],
+            form.cleaned_data["amount"],
+            files,
+            deadline=time.monotonic() + settings.COUPON_IMPORT_TIME_LIMIT,
+        )
+
+        imported = sum(result.coupon is not None for result in results)
+        messages.success(self.request, _("Imported %(imported)d of %(total)d coupons") % {'imported': imported, 'total': len(results)})
+
+        if skipped := sum(result.error == ERROR_MESSAGES["time_limit"] for result in results):
+            messages.warning(
+                self.request,
+                _("The import took too long, %(skipped)d images were not imported. Upload them again.") % {'skipped': skipped},
+            )
+
+        return self.render_to_response(self.get_context_data(form=form, results=results))
+
+
+class CouponUpdateView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, CachedObjectMixin, UpdateView):
     """
     A view that updates a coupon.
     """
     model = Coupon
+    select_related = ("owner",)
     form_class = CouponForm
     success_message = _("Coupon updated successfully")
     permission_required = "core.change_coupon"
@@ -581,28 +591,23 @@ class CouponUpdateView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTe
     
     def form_valid(self, form: BaseForm) -> HttpResponse:
         if not form.instance.title:
-            form.instance.title = f"Unnamed coupon for shop {form.instance.store.title} ({form.instance.amount}€)"
-        
-        logger.info("User %s (pk: %d) created a coupon %s (pk: %s)",
-                    self.request.user,
-                    self.request.user.pk,
-                    form.instance.title,
-                    form.instance.pk
-        )
+            form.instance.title = form.instance.get_default_title()
 
+        # The form already changed the cached object, its title before the update is in the initial data.
         logger.info("User %s (pk: %d) updated coupon %s (pk: %s)",
                     self.request.user, self.request.user.pk,
-                    self.get_object().title,
+                    form.initial.get("title"),
                     self.get_object().pk
         )
         return super().form_valid(form)
 
 
-class CouponDeleteView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, DeleteView):
+class CouponDeleteView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, CachedObjectMixin, DeleteView):
     """
     A view that deletes a coupon.
     """
     model = Coupon
+    select_related = ("owner",)
     success_url = '/coupons/'
     success_message = _("Coupon deleted successfully")
     permission_required = "core.delete_coupon"
@@ -629,10 +634,12 @@ class CouponDeleteView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTe
         return super().form_valid(form)
 
 
-class CouponShareView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, View):
+class CouponShareView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, CachedObjectMixin, View):
     """
     A view that shares a coupon.
     """
+    model = Coupon
+    select_related = ("owner",)
     success_message = _("Coupon shared successfully! Access URL: %(url)s")
     permission_required = "core.share_coupon"
 
@@ -654,8 +661,6 @@ class CouponShareView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTes
         )
         return redirect('core:coupon_detail', pk=coupon.pk)
 
-    def get_object(self, queryset=None):
-        return Coupon.objects.get(pk=self.kwargs['pk'])
 
     def get_success_message(self, cleaned_data):
         coupon = self.get_object()
@@ -663,10 +668,12 @@ class CouponShareView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTes
         return self.success_message % {'url': shared_url}
 
 
-class CouponUnshareView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, View):
+class CouponUnshareView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, CachedObjectMixin, View):
     """
     A view that unshares a coupon.
     """
+    model = Coupon
+    select_related = ("owner",)
     success_message = _("Coupon unshared successfully!")
     permission_required = "core.unshare_coupon"
 
@@ -688,20 +695,18 @@ class CouponUnshareView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesT
         )
         return redirect('core:coupon_detail', pk=coupon.pk)
 
-    def get_object(self, queryset=None):
-        return Coupon.objects.get(pk=self.kwargs['pk'])
-
 
-class CouponSharedDetailView(DetailView):
+class CouponSharedDetailView(CachedObjectMixin, DetailView):
     """
     A view that renders a shared coupon.
     """
     model = Coupon
+    select_related = ("owner", "store")
     context_object_name = "coupon"
     template_name = 'core/coupon_detail.html'
 
-    def get_object(self, queryset=None):
-        return get_object_or_404(Coupon, pk=self.kwargs['pk'], is_shared=True)
+    def get_queryset(self) -> QuerySet[Any]:
+        return super().get_queryset().filter(is_shared=True)
     
     def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
         context = super().get_context_data(**kwargs)
@@ -721,10 +726,12 @@ class CouponSharedDetailView(DetailView):
         return super().get(request, *args, **kwargs)
 
 
-class CouponUseView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, View):
+class CouponUseView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, CachedObjectMixin, View):
     """
     A view that marks a coupon as used.
     """
+    model = Coupon
+    select_related = ("owner",)
     success_message = _("Coupon marked as used successfully!")
     permission_required = "core.change_coupon"
 
@@ -746,14 +753,13 @@ class CouponUseView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestM
         )
         return redirect('core:coupon_detail', pk=coupon.pk)
 
-    def get_object(self, queryset=None):
-        return Coupon.objects.get(pk=self.kwargs['pk'])
-
 
-class CouponUnuseView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, View):
+class CouponUnuseView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, CachedObjectMixin, View):
     """
     A view that marks a coupon as unused.
     """
+    model = Coupon
+    select_related = ("owner",)
     success_message = _("Coupon marked as unused successfully!")
     permission_required = "core.change_coupon"
 
@@ -775,14 +781,13 @@ class CouponUnuseView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTes
         )
         return redirect('core:coupon_detail', pk=coupon.pk)
 
-    def get_object(self, queryset=None):
-        return Coupon.objects.get(pk=self.kwargs['pk'])
-
 
-class CouponPinView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, View):
+class CouponPinView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, CachedObjectMixin, View):
     """
     A view that pins a coupon.
     """
+    model = Coupon
+    select_related = ("owner",)
     success_message = _("Coupon pinned successfully!")
     permission_required = "core.change_coupon"
 
@@ -804,14 +809,13 @@ class CouponPinView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestM
         )
         return redirect('core:coupon_detail', pk=coupon.pk)
 
-    def get_object(self, queryset=None):
-        return Coupon.objects.get(pk=self.kwargs['pk'])
-
 
-class CouponUnpinView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, View):
+class CouponUnpinView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, CachedObjectMixin, View):
     """
     A view that unpins a coupon.
     """
+    model = Coupon
+    select_related = ("owner",)
     success_message = _("Coupon unpinned successfully!")
     permission_required = "core.change_coupon"
 
@@ -832,6 +836,3 @@ class CouponUnpinView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTes
                     coupon.pk
         )
         return redirect('core:coupon_detail', pk=coupon.pk)
-
-    def get_object(self, queryset=None):
-        return Coupon.objects.get(pk=self.kwargs['pk'])
@@ -0,0 +1,20 @@
+from django.contrib import admin
+from django.utils.translation import gettext_lazy as _
+
+from .models import ExchangeRate
+
+
+class ExchangeRateAdmin(admin.ModelAdmin):
+    """
+    Exchange rate admin.
+    """
+    list_display = ["currency", "rate", "date_fetched"]
+    readonly_fields = ["currency", "rate", "date_fetched"]
+    search_fields = ["currency"]
+    search_help_text = _("Search by currency")
+
+    def has_add_permission(self, request):
+        return False
+
+
+admin.site.register(ExchangeRate, ExchangeRateAdmin)
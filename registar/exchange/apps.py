@@ -0,0 +1,33 @@
+import os
+import sys
+from pathlib import Path
+
+from django.apps import AppConfig
+from django.utils.translation import gettext_lazy as _
+
+import registar.settings as settings
+
+
+def is_serving_process() -> bool:
+    """
+    Returns whether the process serves requests: a WSGI or ASGI server, or the `runserver` process that
+    is restarted by the autoreloader, not its parent. Other management commands and the tests do not.
+    """
+    if Path(sys.argv[0]).name not in ("manage.py", "django-admin"):
+        return True
+
+    if sys.argv[1:2] != ["runserver"]:
+        return False
+
+    return os.environ.get("RUN_MAIN") == "true" or "--noreload" in sys.argv
+
+
+class ExchangeConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'exchange'
+    verbose_name = _('exchange rates')
+
+    def ready(self):
+        if settings.EXCHANGE_RATE_SCHEDULER and is_serving_process():
+            from .scheduler import scheduler
+            scheduler.start()
@@ -0,0 +1,13 @@
+import registar.settings as settings
+
+from .services import get_currency
+
+
+def currency(request):
+    """
+    Adds the currency picked by the user and the currencies to pick from.
+    """
+    return {
+        "currency": get_currency(request),
+        "currencies": settings.EXCHANGE_RATE_CURRENCIES,
+    }
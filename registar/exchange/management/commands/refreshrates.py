@@ -0,0 +1,55 @@
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.utils.translation import gettext as _
+
+import registar.settings as settings
+from exchange.providers import RateProviderError
+from exchange.services import claim_refresh, get_rates_age, load_rates, refresh_rates
+
+
+class Command(BaseCommand):
+    """
+    Refreshes the exchange rates.
+    """
+    help = _('Fetches the exchange rates from the configured provider.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help=_("Keep running and refresh the rates whenever they get stale."),
+        )
+        parser.add_argument(
+            "--status",
+            action="store_true",
+            help=_("Only print the age of the current rates."),
+        )
+
+    def handle(self, *args, **options):
+        if options["status"]:
+            age = get_rates_age()
+            self.stdout.write("No rates fetched yet" if age is None else f"Rates are { age:.0f} seconds old")
+            return
+
+        if not options["loop"]:
+            self._refresh(fail=True)
+            return
+
+        while True:
+            # The workers refresh stale rates too, only one of them or this loop asks the provider.
+            if load_rates(record=False).is_stale() and claim_refresh():
+                self._refresh(fail=False)
+
+            time.sleep(settings.EXCHANGE_RATE_CHECK_INTERVAL)
+
+    def _refresh(self, fail):
+        try:
+            table = refresh_rates()
+            self.stdout.write(f"Fetched { len(table.rates) } rates")
+
+        except RateProviderError as exc:
+            if fail:
+                raise CommandError(str(exc)) from exc
+
+            self.stderr.write(str(exc))
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.6 on 2026-10-17 17:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exchange', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RefreshLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('locked_until', models.DateTimeField(verbose_name='locked until')),
+            ],
+            options={
+                'verbose_name': 'refresh lock',
+                'verbose_name_plural': 'refresh locks',
+            },
+        ),
+    ]
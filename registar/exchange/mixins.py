@@ -0,0 +1,23 @@
+from functools import cached_property
+
+from .services import RateTable, get_currency, get_rates
+
+
+class CurrencyMixin:
+    """
+    Converts amounts into the currency picked by the user. The rates are looked up once per request.
+    """
+
+    @cached_property
+    def currency(self) -> str:
+        return get_currency(self.request)
+
+    @cached_property
+    def rates(self) -> RateTable:
+        return get_rates()
+
+    def convert(self, amount):
+        return self.rates.convert(amount or 0, self.currency)
+
+    def convert_objects(self, objects, field: str) -> list:
+        return self.rates.convert_objects(objects, field, self.currency)
@@ -0,0 +1,31 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class ExchangeRate(models.Model):
+    """
+    Last known exchange rate of a currency against the base currency.
+    """
+    currency        = models.CharField(max_length=3, unique=True, verbose_name=_('currency'))
+    rate            = models.DecimalField(max_digits=18, decimal_places=8, verbose_name=_('rate'))
+    date_fetched    = models.DateTimeField(verbose_name=_('fetched at'))
+
+    class Meta:
+        ordering = ["currency"]
+        verbose_name = _('exchange rate')
+        verbose_name_plural = _('exchange rates')
+
+    def __str__(self) -> str:
+        return f"{ self.currency } { self.rate }"
+
+
+class RefreshLock(models.Model):
+    """
+    Time until which no other process may refresh the exchange rates, one row claimed by the process
+    that refreshes them with a conditional update.
+    """
+    locked_until    = models.DateTimeField(verbose_name=_('locked until'))
+
+    class Meta:
+        verbose_name = _('refresh lock')
+        verbose_name_plural = _('refresh locks')
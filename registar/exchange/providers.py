@@ -0,0 +1,51 @@
+from decimal import Decimal
+
+import requests
+
+import registar.settings as settings
+
+
+class RateProviderError(Exception):
+    pass
+
+
+class RateProvider:
+    """
+    Base class of the exchange rate sources.
+    """
+
+    def fetch(self, base: str) -> dict[str, Decimal]:
+        """
+        Returns the rates of all known currencies against the `base` currency.
+        """
+        raise NotImplementedError
+
+
+class FrankfurterProvider(RateProvider):
+    """
+    Fetches the rates published by the European Central Bank from the Frankfurter API.
+    """
+    url = "https://api.frankfurter.app/latest"
+
+    def __init__(self):
+        self.session = requests.Session()
+
+    def fetch(self, base: str) -> dict[str, Decimal]:
+        try:
+            response = self.session.get(self.url, params={'from': base}, timeout=settings.EXCHANGE_RATE_TIMEOUT)
+            response.raise_for_status()
+            data = response.json(parse_float=Decimal)
+
+        except (requests.RequestException, ValueError) as exc:
+            raise RateProviderError(f"Could not fetch the exchange rates: { exc }") from exc
+
+        return {currency: Decimal(rate) for currency, rate in data['rates'].items()}
+
+
+class StaticProvider(RateProvider):
+    """
+    Returns the rates from `EXCHANGE_RATE_STATIC_RATES`, for tests and offline deployments.
+    """
+
+    def fetch(self, base: str) -> dict[str, Decimal]:
+        return {currency: Decimal(rate) for currency, rate in settings.EXCHANGE_RATE_STATIC_RATES.items()}
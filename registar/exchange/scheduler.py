@@ -0,0 +1,42 @@
+import logging
+import threading
+
+import registar.settings as settings
+
+from .services import load_rates, trigger_refresh
+
+logger = logging.getLogger(__name__)
+
+
+class RateScheduler:
+    """
+    Checks the age of the exchange rates periodically and triggers a refresh when they get stale.
+    """
+
+    def __init__(self, check_interval: float):
+        self.check_interval = check_interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="exchange-rate-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while True:
+            try:
+                if load_rates(record=False).is_stale():
+                    trigger_refresh()
+
+            except Exception:
+                logger.exception("Checking the exchange rates failed")
+
+            if self._stopped.wait(self.check_interval):
+                return
+
+
+scheduler = RateScheduler(check_interval=settings.EXCHANGE_RATE_CHECK_INTERVAL)
@@ -0,0 +1,252 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import NamedTuple
+
+from core.bulk import bulk_upsert
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from metrics.collectors import EXCHANGE_RATE_CACHE, EXCHANGE_RATE_FETCH_SECONDS
+
+import registar.settings as settings
+
+from .models import ExchangeRate, RefreshLock
+from .providers import RateProvider, RateProviderError
+
+logger = logging.getLogger(__name__)
+
+RATES_CACHE_KEY = "exchange:rates"
+REFRESH_LOCK_ID = 1
+CURRENCY_SESSION_KEY = "currency"
+CENT = Decimal("0.01")
+
+
+class RateTable(NamedTuple):
+    """
+    Rates of the currencies against `EXCHANGE_RATE_BASE_CURRENCY`.
+    """
+    rates: dict[str, Decimal]
+    date_fetched: datetime | None
+
+    def is_stale(self) -> bool:
+        if self.date_fetched is None:
+            return True
+
+        return timezone.now() - self.date_fetched > timedelta(seconds=settings.EXCHANGE_RATE_REFRESH_INTERVAL)
+
+    def convert(self, amount, currency: str) -> Decimal | None:
+        """
+        Converts the amount in the base currency, returns `None` if the rate of the currency is not known.
+        """
+        if currency == settings.EXCHANGE_RATE_BASE_CURRENCY:
+            return Decimal(amount)
+
+        rate = self.rates.get(currency)
+
+        if rate is None:
+            return None
+
+        return (Decimal(amount) * rate).quantize(CENT)
+
+    def convert_many(self, amounts, currency: str) -> list[Decimal | None]:
+        """
+        Converts all the amounts with a single rate lookup, the result is in the same order.
+        """
+        amounts = [Decimal(amount or 0) for amount in amounts]
+
+        if currency == settings.EXCHANGE_RATE_BASE_CURRENCY:
+            return amounts
+
+        rate = self.rates.get(currency)
+
+        if rate is None:
+            return [None] * len(amounts)
+
+        return [(amount * rate).quantize(CENT) for amount in amounts]
+
+    def convert_objects(self, objects, field: str, currency: str) -> list:
+        """
+        Stores the converted value of the `field` of every object as `<field>_converted`. Returns the objects as a list.
+        """
+        objects = list(objects)
+
+        for obj, converted in zip(objects, self.convert_many([getattr(obj, field) for obj in objects], currency)):
+            setattr(obj, f"{ field }_converted", converted)
+
+        return objects
+
+
+_provider = None
+
+
+def get_provider() -> RateProvider:
+    """
+    Returns the configured rate provider, the instance is reused to keep its connections open.
+    """
+    global _provider
+
+    if _provider is None:
+        _provider = import_string(settings.EXCHANGE_RATE_PROVIDER)()
+
+    return _provider
+
+
+def load_rates(record: bool = True) -> RateTable:
+    """
+    Returns the local copy of the rates, from the cache or from the database. The cache lookup is counted
+    in `EXCHANGE_RATE_CACHE` unless `record` is false, for the lookups of the monitoring and the scheduler.
+    """
+    table = cache.get(RATES_CACHE_KEY)
+
+    if record:
+        EXCHANGE_RATE_CACHE.labels("miss" if table is None else "hit").inc()
+
+    if table is None:
+        exchange_rates = list(ExchangeRate.objects.all())
+        table = RateTable(
+            {exchange_rate.currency: exchange_rate.rate for exchange_rate in exchange_rates},
+            min((exchange_rate.date_fetched for exchange_rate in exchange_rates), default=None),
+        )
+        cache.set(RATES_CACHE_KEY, table, None)
+
+    return table
+
+
+def refresh_rates() -> RateTable:
+    """
+    Fetches the rates from the provider and stores them, the currencies the provider no longer returns
+    are removed. Raises `RateProviderError` if the provider fails.
+    """
+    start = time.perf_counter()
+    result = "error"
+
+    try:
+        rates = get_provider().fetch(settings.EXCHANGE_RATE_BASE_CURRENCY)
+        result = "ok"
+
+    finally:
+        EXCHANGE_RATE_FETCH_SECONDS.labels(result).observe(time.perf_counter() - start)
+
+    date_fetched = timezone.now()
+
+    with transaction.atomic():
+        bulk_upsert(
+            ExchangeRate,
+            [ExchangeRate(currency=currency, rate=rate, date_fetched=date_fetched) for currency, rate in rates.items()],
+            unique_field="currency",
+            update_fields=["rate", "date_fetched"],
+        )
+        ExchangeRate.objects.exclude(currency__in=rates).delete()
+
+    table = RateTable(rates, date_fetched)
+    cache.set(RATES_CACHE_KEY, table, None)
+
+    logger.info("Fetched %d exchange rates", len(rates))
+    return table
+
+
+_refresh_lock = threading.Lock()
+
+
+def claim_refresh() -> bool:
+    """
+    Returns whether the caller may refresh the rates, which is the case for the first process that asks
+    during every `EXCHANGE_RATE_RETRY_INTERVAL`, so the provider is not asked by several processes at once.
+    The lock is a row claimed by a single conditional update, which the database runs atomically, unlike
+    the `add()` of the file based cache.
+    """
+    now = timezone.now()
+    locked_until = now + timedelta(seconds=settings.EXCHANGE_RATE_RETRY_INTERVAL)
+
+    if RefreshLock.objects.filter(pk=REFRESH_LOCK_ID, locked_until__lte=now).update(locked_until=locked_until):
+        return True
+
+    try:
+        with transaction.atomic():
+            RefreshLock.objects.create(pk=REFRESH_LOCK_ID, locked_until=locked_until)
+
+    except IntegrityError:
+        return False
+
+    return True
+
+
+def _refresh_in_background():
+    try:
+        refresh_rates()
+
+    except RateProviderError as exc:
+        logger.warning("%s, keeping the rates fetched at %s", exc, load_rates().date_fetched)
+
+    except Exception:
+        logger.exception("Refreshing the exchange rates failed")
+
+    finally:
+        _refresh_lock.release()
+
+
+def trigger_refresh() -> bool:
+    """
+    Starts refreshing the rates in a background thread, unless a refresh is already running in this process
+    or was started by any process during the last `EXCHANGE_RATE_RETRY_INTERVAL`. Returns whether it was started.
+    """
+    if not _refresh_lock.acquire(blocking=False):
+        return False
+
+    if not claim_refresh():
+        _refresh_lock.release()
+        return False
+
+    threading.Thread(target=_refresh_in_background, name="exchange-rate-refresh", daemon=True).start()
+    return True
+
+
+def get_rates() -> RateTable:
+    """
+    Returns the local copy of the rates. If they are older than `EXCHANGE_RATE_REFRESH_INTERVAL`
+    a background refresh is triggered, the stale rates are returned in the meantime.
+    """
+    table = load_rates()
+
+    if table.is_stale():
+        trigger_refresh()
+
+    return table
+
+
+def get_rates_age() -> float | None:
+    """
+    Returns the age of the local rates in seconds, `None` if no rates were fetched yet. The lookup is not
+    counted as a cache hit, so scraping the age does not skew the hit ratio.
+    """
+    date_fetched = load_rates(record=False).date_fetched
+
+    if date_fetched is None:
+        return None
+
+    return (timezone.now() - date_fetched).total_seconds()
+
+
+def convert(amount, currency: str) -> Decimal | None:
+    """
+    Converts the amount in the base currency, returns `None` if the rate of the currency is not known.
+    """
+    return get_rates().convert(amount, currency)
+
+
+def get_currency(request) -> str:
+    """
+    Returns the currency the user wants to see the amounts in. It is picked with the `currency`
+    query parameter and remembered in the session, `EXCHANGE_RATE_DEFAULT_CURRENCY` is used otherwise.
+    """
+    currency = request.GET.get("currency", "").upper()
+
+    if currency in settings.EXCHANGE_RATE_CURRENCIES:
+        request.session[CURRENCY_SESSION_KEY] = currency
+        return currency
+
+    return request.session.get(CURRENCY_SESSION_KEY, settings.EXCHANGE_RATE_DEFAULT_CURRENCY)
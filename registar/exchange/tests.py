@@ -0,0 +1,184 @@
+from decimal import Decimal
+from unittest import mock
+
+from core.tests import TEST_CACHES
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+import registar.settings as settings
+
+from . import services
+from .apps import is_serving_process
+from .models import ExchangeRate, RefreshLock
+from .providers import RateProviderError
+from .services import RateTable
+
+
+class RateTableTests(SimpleTestCase):
+    """
+    Tests of the conversion of amounts in the base currency.
+    """
+
+    def setUp(self):
+        self.table = RateTable({"USD": Decimal("1.0812"), "CZK": Decimal("25.3")}, timezone.now())
+
+    def test_convert(self):
+        self.assertEqual(self.table.convert("10.00", settings.EXCHANGE_RATE_BASE_CURRENCY), Decimal("10.00"))
+        self.assertEqual(self.table.convert("10.00", "USD"), Decimal("10.81"))
+        self.assertEqual(self.table.convert(Decimal("0.05"), "USD"), Decimal("0.05"))
+        self.assertIsNone(self.table.convert("10.00", "GBP"))
+
+    def test_convert_many(self):
+        self.assertEqual(
+            self.table.convert_many(["1.00", None, Decimal("2.50")], "CZK"),
+            [Decimal("25.30"), Decimal("0.00"), Decimal("63.25")],
+        )
+        self.assertEqual(self.table.convert_many(["1.00", None], settings.EXCHANGE_RATE_BASE_CURRENCY), [Decimal("1.00"), 0])
+        self.assertEqual(self.table.convert_many(["1.00", "2.00"], "GBP"), [None, None])
+        self.assertEqual(self.table.convert_many([], "USD"), [])
+
+    def test_is_stale(self):
+        self.assertTrue(RateTable({}, None).is_stale())
+        self.assertFalse(self.table.is_stale())
+
+        fetched = timezone.now() - timezone.timedelta(seconds=settings.EXCHANGE_RATE_REFRESH_INTERVAL + 1)
+        self.assertTrue(RateTable({}, fetched).is_stale())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RefreshTests(TestCase):
+    """
+    Tests of fetching, storing and refreshing the rates.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def provider(self, rates: dict | None = None, error: Exception | None = None):
+        provider = mock.Mock()
+        provider.fetch.return_value = rates
+        provider.fetch.side_effect = error
+
+        patcher = mock.patch.object(services, "get_provider", return_value=provider)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def release_refresh(self):
+        RefreshLock.objects.update(locked_until=timezone.now())
+
+    def stored(self) -> dict:
+        return dict(ExchangeRate.objects.values_list("currency", "rate"))
+
+    def test_refresh(self):
+        self.provider({"USD": Decimal("1.08"), "GBP": Decimal("0.85")})
+        services.refresh_rates()
+
+        self.provider({"USD": Decimal("1.10"), "CZK": Decimal("25.00")})
+        second = services.refresh_rates()
+
+        # The known currencies are updated, the new ones added and the others removed.
+        self.assertEqual(self.stored(), {"USD": Decimal("1.10"), "CZK": Decimal("25.00")})
+        self.assertEqual(ExchangeRate.objects.get(currency="USD").date_fetched, second.date_fetched)
+        self.assertEqual(services.load_rates(), second)
+
+        # The database describes the same table as the cache.
+        cache.clear()
+        self.assertEqual(services.load_rates(), second)
+
+    def test_provider_failure_keeps_last_rates(self):
+        self.provider({"USD": Decimal("1.08")})
+        rates = services.refresh_rates()
+
+        self.provider(error=RateProviderError("Could not fetch the exchange rates"))
+
+        with self.assertRaises(RateProviderError):
+            services.refresh_rates()
+
+        services._refresh_lock.acquire()
+
+        with self.assertLogs("exchange.services", "WARNING") as logs:
+            services._refresh_in_background()
+
+        self.assertIn("keeping the rates fetched at", logs.output[0])
+        self.assertEqual(services.load_rates(), rates)
+        self.assertEqual(self.stored(), {"USD": Decimal("1.08")})
+        # The lock is released for the next attempt.
+        self.assertFalse(services._refresh_lock.locked())
+
+    def test_single_flight(self):
+        with mock.patch("threading.Thread") as thread:
+            self.assertTrue(services.trigger_refresh())
+            self.addCleanup(lambda: services._refresh_lock.locked() and services._refresh_lock.release())
+
+            # A refresh is running in this process.
+            self.assertFalse(services.trigger_refresh())
+
+            # It finished, but another attempt was made during the retry interval by some process.
+            services._refresh_lock.release()
+            self.assertFalse(services.trigger_refresh())
+            self.assertFalse(services._refresh_lock.locked())
+
+            self.release_refresh()
+            self.assertTrue(services.trigger_refresh())
+
+        self.assertEqual(thread.return_value.start.call_count, 2)
+
+    def test_loop_single_flight(self):
+        self.provider({"USD": Decimal("1.08")})
+
+        def loop():
+            with mock.patch("time.sleep", side_effect=KeyboardInterrupt), self.assertRaises(KeyboardInterrupt):
+                call_command("refreshrates", "--loop")
+
+        # A worker started a refresh during the retry interval.
+        self.assertTrue(services.claim_refresh())
+        loop()
+        self.assertEqual(self.stored(), {})
+
+        self.release_refresh()
+        loop()
+        self.assertEqual(self.stored(), {"USD": Decimal("1.08")})
+
+    def test_claim_refresh(self):
+        self.assertTrue(services.claim_refresh())
+        self.assertFalse(services.claim_refresh())
+
+        # The retry interval passed.
+        RefreshLock.objects.update(locked_until=timezone.now() - timezone.timedelta(seconds=1))
+        self.assertTrue(services.claim_refresh())
+        self.assertEqual(RefreshLock.objects.count(), 1)
+
+    def test_stale_rates_trigger_refresh(self):
+        fetched = timezone.now() - timezone.timedelta(seconds=settings.EXCHANGE_RATE_REFRESH_INTERVAL + 1)
+        cache.set(services.RATES_CACHE_KEY, RateTable({"USD": Decimal("1.08")}, fetched), None)
+
+        with mock.patch.object(services, "trigger_refresh") as trigger_refresh:
+            self.assertEqual(services.get_rates().date_fetched, fetched)
+
+        trigger_refresh.assert_called_once_with()
+
+
+class SchedulerProcessTests(SimpleTestCase):
+    """
+    Tests that the rate scheduler is started only in the process that serves the requests.
+    """
+
+    def serving(self, argv: list[str], environ: dict | None = None) -> bool:
+        with mock.patch("sys.argv", argv), mock.patch.dict("os.environ", environ or {}, clear=True):
+            return is_serving_process()
+
+    def test_server(self):
+        self.assertTrue(self.serving(["/usr/local/bin/gunicorn", "registar.wsgi"]))
+
+    def test_management_commands(self):
+        self.assertFalse(self.serving(["manage.py", "migrate"]))
+        self.assertFalse(self.serving(["manage.py", "test"]))
+        self.assertFalse(self.serving(["/usr/local/bin/django-admin", "compilemessages"]))
+
+    def test_runserver(self):
+        self.assertFalse(self.serving(["manage.py", "runserver"]))
+        self.assertTrue(self.serving(["manage.py", "runserver"], {"RUN_MAIN": "true"}))
+        self.assertTrue(self.serving(["manage.py", "runserver", "--noreload"]))
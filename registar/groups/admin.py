@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.hashers import make_password
 
@@ -7,11 +8,15 @@ from .models import Group, Invitation, ShopGroup, GroupMembership
 
 @admin.action(description=_("Pin selected item"))
 def pin(modeladmin, request, queryset):
-    queryset.update(is_pinned=True)
+    queryset.update(is_pinned=True, date_modified=timezone.now())
 
 @admin.action(description=_("Unpin selected item"))
 def unpin(modeladmin, request, queryset):
-    queryset.update(is_pinned=False)
+    queryset.update(is_pinned=False, date_modified=timezone.now())
+
+@admin.action(description=_("Recompute member, shop and unused amount counters"))
+def reconcile_counters(modeladmin, request, queryset):
+    queryset.reconcile()
 
 @admin.action(description=_("Accept invitation"))
 def accept_invitation(modeladmin, request, queryset):
@@ -36,24 +41,17 @@ class GroupAdmin(admin.ModelAdmin):
     """
     Group admin.
     """
-    actions = [pin, unpin]
+    actions = [pin, unpin, reconcile_counters]
     inlines = [GroupMembershipInline, ShopGroupInline]
     date_hierarchy = "date_added"
     exclude = ["date_added, date_modified"]
-    list_display = ["title", "owner", "is_pinned", "get_members_count", "get_shop_count", "date_added"]
+    list_display = ["title", "owner", "is_pinned", "member_count", "shop_count", "unused_amount", "date_added"]
     list_filter = ["is_pinned"]
+    readonly_fields = ["member_count", "shop_count", "unused_amount"]
     save_as = True
     search_fields = ["title", "owner__username", "owner__email"]
     search_help_text = _("Search by title, barcode, owner username, owner email")
 
-    @admin.display(description=_("Members"))
-    def get_members_count(self, obj):
-        return obj.members.count()
-
-    @admin.display(description=_("Shops"))
-    def get_shop_count(self, obj):
-        return obj.shops.count()
-
     def save_model(self, request, obj, form, change):
         if form.cleaned_data["access_password"]:
             access_password = make_password(form.cleaned_data["access_password"])
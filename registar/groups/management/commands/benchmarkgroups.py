@@ -0,0 +1,116 @@
+import time
+import uuid
+from decimal import Decimal
+
+from core.models import Coupon, Shop
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils.translation import gettext as _
+
+from groups.models import Group, GroupMembership, ShopGroup, group_rollups
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    """
+    Benchmarks the group list aggregation against the former joined aggregation.
+    """
+    help = _('Compares the plans, timings and results of the group aggregations on generated data, which is rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument("--members", type=int, default=50, help=_("Number of members of the group."))
+        parser.add_argument("--shops", type=int, default=20, help=_("Number of shops of the group."))
+        parser.add_argument("--coupons", type=int, default=10000, help=_("Number of coupons in the shops."))
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help=_("How many times every query is run, the best time is reported."),
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                group = self._create_group(options["members"], options["shops"], options["coupons"])
+                self._compare(group, max(options["repeat"], 1))
+                raise Rollback()
+
+        except Rollback:
+            pass
+
+    def _compare(self, group, repeat):
+        queries = {
+            "joined": Group.objects.filter(pk=group.pk).annotate(
+                rollup_member_count=Count('groupmembership__user_id', distinct=True),
+                rollup_shop_count=Count('shopgroup__id', distinct=True),
+                rollup_unused_amount=Coalesce(Sum(
+                    Case(
+                        When(shops__coupon__is_used=False, then='shops__coupon__amount'),
+                        default=Value(0),
+                        output_field=IntegerField()
+                    )
+                ), 0)
+            ),
+            "subqueries": Group.objects.filter(pk=group.pk).annotate(
+                **{f"rollup_{ name }": expression for name, expression in group_rollups().items()}
+            ),
+            "counters": Group.objects.filter(pk=group.pk).annotate(
+                rollup_member_count=F("member_count"),
+                rollup_shop_count=F("shop_count"),
+                rollup_unused_amount=F("unused_amount"),
+            ),
+        }
+        expected = Coupon.objects.filter(store__groups=group, is_used=False).aggregate(total=Sum("amount"))["total"]
+
+        self.stdout.write(f"Expected unused amount: { expected }\n")
+
+        for name, queryset in queries.items():
+            self.stdout.write(f"==== { name } ====")
+            self.stdout.write(queryset.explain())
+
+            best, result = None, None
+
+            for _run in range(repeat):
+                start = time.perf_counter()
+                result = queryset.values("rollup_member_count", "rollup_shop_count", "rollup_unused_amount").get()
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+
+            self.stdout.write(
+                f"{ best * 1000:.1f} ms, { result['rollup_member_count'] } members, { result['rollup_shop_count'] } shops, "
+                f"{ result['rollup_unused_amount'] } unused\n"
+            )
+
+    @staticmethod
+    def _create_group(members, shops, coupons):
+        User = get_user_model()
+        prefix = uuid.uuid4().hex[:8]
+
+        users = User.objects.bulk_create(User(username=f"benchmark-{ prefix }-{ index }") for index in range(members + 1))
+        owner, users = users[0], users[1:]
+
+        group = Group.objects.create(title="Benchmark", owner=owner)
+        GroupMembership.objects.bulk_create(GroupMembership(user=user, group=group) for user in users)
+
+        shops = Shop.objects.bulk_create(Shop(title=f"Shop { index }", owner=owner) for index in range(shops))
+        ShopGroup.objects.bulk_create(ShopGroup(shop=shop, group=group) for shop in shops)
+
+        Coupon.objects.bulk_create(
+            (
+                Coupon(barcode=str(index), amount=Decimal("1.25"), store=shops[index % len(shops)], owner=owner, is_used=index % 3 == 0)
+                for index in range(coupons)
+            ),
+            batch_size=1000,
+        )
+
+        # The rows were inserted without signals, so the counters are computed once at the end.
+        Group.objects.filter(pk=group.pk).reconcile()
+        group.refresh_from_db()
+
+        return group
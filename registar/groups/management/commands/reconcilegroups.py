@@ -0,0 +1,35 @@
+from django.core.management import BaseCommand
+from django.utils.translation import gettext as _
+
+from groups.models import Group
+
+
+class Command(BaseCommand):
+    """
+    Detects and repairs drift of the group counters.
+    """
+    help = _('Compares the member, shop and unused amount counters of the groups with the actual values and repairs them.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help=_("Only report the groups whose counters drifted."),
+        )
+
+    def handle(self, *args, **options):
+        drifted = list(Group.objects.drifted().order_by("pk"))
+
+        for group in drifted:
+            self.stdout.write(
+                f"{ group.pk } { group.title }: "
+                f"members { group.member_count } -> { group.actual_member_count }, "
+                f"shops { group.shop_count } -> { group.actual_shop_count }, "
+                f"unused amount { group.unused_amount } -> { group.actual_unused_amount }"
+            )
+
+        if drifted and not options["dry_run"]:
+            Group.objects.filter(pk__in=[group.pk for group in drifted]).reconcile()
+
+        action = "found" if options["dry_run"] else "repaired"
+        self.stdout.write(f"Drift { action } in { len(drifted) } groups.\n")
@@ -0,0 +1,53 @@
+# Generated by Django 5.0.6 on 2026-10-17 15:01
+
+from django.db import migrations, models
+from django.db.models import (Count, DecimalField, IntegerField, OuterRef,
+                              Subquery, Sum, Value)
+from django.db.models.functions import Coalesce
+
+
+def compute_counters(apps, schema_editor):
+    Group = apps.get_model('groups', 'Group')
+    GroupMembership = apps.get_model('groups', 'GroupMembership')
+    ShopGroup = apps.get_model('groups', 'ShopGroup')
+    Coupon = apps.get_model('core', 'Coupon')
+
+    members = GroupMembership.objects.filter(group=OuterRef('pk')).order_by().values('group').annotate(count=Count('pk')).values('count')
+    shops = ShopGroup.objects.filter(group=OuterRef('pk')).order_by().values('group').annotate(count=Count('pk')).values('count')
+    unused = Coupon.objects.filter(
+        store__shopgroup__group=OuterRef('pk'),
+        is_used=False,
+    ).order_by().values('store__shopgroup__group').annotate(total=Sum('amount')).values('total')
+
+    Group.objects.update(
+        member_count=Coalesce(Subquery(members), Value(0), output_field=IntegerField()),
+        shop_count=Coalesce(Subquery(shops), Value(0), output_field=IntegerField()),
+        unused_amount=Coalesce(Subquery(unused), Value(0), output_field=DecimalField(max_digits=12, decimal_places=2)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_usercouponstats'),
+        ('groups', '0010_alter_group_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='member_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='members'),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='shop_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='shops'),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='unused_amount',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12, verbose_name='unused amount'),
+        ),
+        migrations.RunPython(compute_counters, migrations.RunPython.noop),
+    ]
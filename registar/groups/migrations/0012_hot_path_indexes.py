@@ -0,0 +1,32 @@
+# Generated by Django 5.0.6 on 2026-10-17 15:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_hot_path_indexes'),
+        ('groups', '0011_group_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='group',
+            index=models.Index(fields=['owner', '-is_pinned', '-date_added'], name='group_owner_pinned_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='groupmembership',
+            index=models.Index(fields=['user', '-is_pinned', '-date_joined'], name='membership_user_pinned_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invitation',
+            index=models.Index(fields=['recipient', 'is_processed', '-date_sent'], name='invitation_recipient_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shopgroup',
+            index=models.Index(fields=['group', '-is_pinned', '-date_added'], name='shopgroup_group_pinned_idx'),
+        ),
+    ]
@@ -1,4 +1,7 @@
-from django.db import models
+from core.aggregates import count_subquery, sum_subquery
+from core.models import Coupon
+from django.db import models, transaction
+from django.db.models import F, OuterRef, Q
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
@@ -7,6 +10,53 @@ from django.utils import timezone
 import uuid
 
 
+def group_rollups(group: str = "pk") -> dict:
+    """
+    Returns the actual values of the `member_count`, `shop_count` and `unused_amount` counters of a group,
+    where `group` is the field that refers to the group. Every metric is a separate correlated subquery,
+    so the rows of one metric do not multiply the other ones and the cost grows linearly with the data.
+    """
+    return {
+        "member_count": count_subquery(GroupMembership.objects.filter(group=OuterRef(group)), "group"),
+        "shop_count": count_subquery(ShopGroup.objects.filter(group=OuterRef(group)), "group"),
+        "unused_amount": sum_subquery(
+            Coupon.objects.filter(store__shopgroup__group=OuterRef(group), is_used=False),
+            "store__shopgroup__group",
+            "amount",
+        ),
+    }
+
+
+class GroupQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """
+        Returns the groups the user owns or is a member of, see `core.models.shared_with`.
+        """
+        return self.filter(Q(owner=user) | Q(pk__in=GroupMembership.objects.filter(user=user).values("group")))
+
+    def with_actual_rollups(self):
+        """
+        Annotates the actual values of the counters as `actual_<counter>`, see `group_rollups`.
+        """
+        return self.annotate(**{f"actual_{ name }": expression for name, expression in group_rollups().items()})
+
+    def drifted(self):
+        """
+        Returns the groups whose counters differ from the actual values.
+        """
+        return self.with_actual_rollups().exclude(
+            member_count=F("actual_member_count"),
+            shop_count=F("actual_shop_count"),
+            unused_amount=F("actual_unused_amount"),
+        )
+
+    def reconcile(self) -> int:
+        """
+        Sets the counters of the groups to the actual values.
+        """
+        return self.update(**group_rollups())
+
+
 class Group(models.Model):
     """
     Group model.
@@ -18,13 +68,22 @@ class Group(models.Model):
     access_password = models.CharField(max_length=128, verbose_name=_('access password'), help_text=_("optional"), null=True, blank=True)
     members         = models.ManyToManyField(get_user_model(), verbose_name=_('members'), related_name='memberships', through='GroupMembership')
     shops           = models.ManyToManyField('core.Shop', verbose_name=_('shops'), related_name='groups', through='ShopGroup')
+    member_count    = models.PositiveIntegerField(default=0, editable=False, verbose_name=_('members'))
+    shop_count      = models.PositiveIntegerField(default=0, editable=False, verbose_name=_('shops'))
+    unused_amount   = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False, verbose_name=_('unused amount'))
     date_added      = models.DateTimeField(auto_now_add=True, verbose_name=_('created at'))
     date_modified   = models.DateTimeField(auto_now=True, verbose_name=_('updated at'))
 
+    objects = GroupQuerySet.as_manager()
+
     class Meta:
         ordering = ["-date_added", "title"]
         verbose_name = _('group')
         verbose_name_plural = _('groups')
+
+        indexes = [
+            models.Index(fields=['owner', '-is_pinned', '-date_added'], name='group_owner_pinned_idx'),
+        ]
         
         permissions = [
             ("invite_user_group", _("Can invite user to a group")),
@@ -38,6 +97,9 @@ class Group(models.Model):
     def get_absolute_url(self):
         return reverse('groups:group_detail', kwargs={'pk': self.pk})
 
+    def is_visible_to(self, user) -> bool:
+        return self.owner_id == user.pk or Group.objects.filter(pk=self.pk).visible_to(user).exists()
+
     def __str__(self) -> str:
         return self.title
 
@@ -55,6 +117,9 @@ class GroupMembership(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['user', 'group'], name='unique_group_membership'),
         ]
+        indexes = [
+            models.Index(fields=['user', '-is_pinned', '-date_joined'], name='membership_user_pinned_idx'),
+        ]
         verbose_name = _('group membership')
         verbose_name_plural = _('group memberships')
         
@@ -75,6 +140,9 @@ class ShopGroup(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['shop', 'group'], name='unique_shop_group'),
         ]
+        indexes = [
+            models.Index(fields=['group', '-is_pinned', '-date_added'], name='shopgroup_group_pinned_idx'),
+        ]
         verbose_name = _('shop group')
         verbose_name_plural = _('shop groups')
  
@@ -94,11 +162,15 @@ class Invitation(models.Model):
     date_sent       = models.DateTimeField(auto_now_add=True, verbose_name=_('sent at'))
     date_accepted   = models.DateTimeField(null=True, blank=True, verbose_name=_('accepted at'))
     date_rejected   = models.DateTimeField(null=True, blank=True, verbose_name=_('rejected at'))
+    date_modified   = models.DateTimeField(auto_now=True, verbose_name=_('updated at'))
     
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=['group', 'recipient'], name='unique_invitation'),
         ]
+        indexes = [
+            models.Index(fields=['recipient', 'is_processed', '-date_sent'], name='invitation_recipient_idx'),
+        ]
         verbose_name = _('invitation')
         verbose_name_plural = _('invitations')
         
@@ -110,6 +182,7 @@ class Invitation(models.Model):
     def __str__(self) -> str:
         return f"{ self.sender.username } invited { self.recipient.username } to { self.group.title }"
 
+    @transaction.atomic
     def accept(self):
         self.group.members.add(self.recipient)
         self.date_accepted = timezone.now()
@@ -118,6 +191,7 @@ class Invitation(models.Model):
         self.is_processed = True
         self.save()
 
+    @transaction.atomic
     def reject(self):
         self.group.members.remove(self.recipient)
         self.date_rejected = timezone.now()
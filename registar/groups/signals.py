@@ -0,0 +1,171 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from core.aggregates import sum_subquery
+from core.models import Coupon, Shop
+from core.signals import deleted_in_cascade
+from core.stats import coupon_states_changed
+from django.contrib.auth import get_user_model
+from django.db.models import F, Sum
+from django.db.models.functions import Greatest
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import Group, GroupMembership, ShopGroup
+
+# Member and shop links are counted on post_save and post_delete of the through models. `members.add()`
+# and `shops.add()` insert the links with `bulk_create`, which sends no post_save, so they are counted on
+# `m2m_changed` instead. `remove()` and `clear()` delete them through the ORM, which sends post_delete.
+# The links and coupons deleted with their shop or owner are counted once per shop or owner on pre_delete.
+
+COUNT_FIELDS = ("member_count", "shop_count")
+
+
+def unused_amounts(shop_ids) -> dict:
+    """
+    Returns the amount of the unused coupons of every shop.
+    """
+    rows = Coupon.objects.filter(store__in=shop_ids, is_used=False).order_by().values("store").annotate(total=Sum("amount"))
+    return {row["store"]: row["total"] for row in rows}
+
+
+def decremented(field: str, count: int = 1):
+    """
+    Returns the value of the positive counter `field` minus `count`, clamped to 0 if the counter drifted below
+    it, `reconcile()` fixes the drift. The minimum is taken before the subtraction, as MySQL fails on an unsigned
+    column that goes below 0 even inside `GREATEST()`.
+    """
+    return Greatest(F(field), count) - count
+
+
+def update_counters(group_id, **deltas):
+    changes = {
+        field: decremented(field, -delta) if delta < 0 and field in COUNT_FIELDS else F(field) + delta
+        for field, delta in deltas.items() if delta
+    }
+
+    if changes:
+        Group.objects.filter(pk=group_id).update(**changes)
+
+
+@receiver(post_save, sender=GroupMembership)
+def count_created_membership(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        update_counters(instance.group_id, member_count=1)
+
+
+@receiver(post_delete, sender=GroupMembership)
+def count_deleted_membership(sender, instance, **kwargs):
+    update_counters(instance.group_id, member_count=-1)
+
+
+@receiver(post_save, sender=ShopGroup)
+def count_created_shop_group(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        update_counters(
+            instance.group_id,
+            shop_count=1,
+            unused_amount=unused_amounts([instance.shop_id]).get(instance.shop_id, 0),
+        )
+
+
+@receiver(post_delete, sender=ShopGroup)
+def count_deleted_shop_group(sender, instance, origin=None, **kwargs):
+    if deleted_in_cascade(origin, ShopGroup):
+        return
+
+    update_counters(
+        instance.group_id,
+        shop_count=-1,
+        unused_amount=-unused_amounts([instance.shop_id]).get(instance.shop_id, 0),
+    )
+
+
+@receiver(m2m_changed, sender=GroupMembership)
+def count_added_members(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Counts the members added by `group.members.add()` or `user.memberships.add()`.
+    """
+    if action != "post_add" or not pk_set:
+        return
+
+    if reverse:
+        Group.objects.filter(pk__in=pk_set).update(member_count=F("member_count") + 1)
+    else:
+        update_counters(instance.pk, member_count=len(pk_set))
+
+
+@receiver(m2m_changed, sender=ShopGroup)
+def count_added_shops(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Counts the shops added by `group.shops.add()` or `shop.groups.add()`.
+    """
+    if action != "post_add" or not pk_set:
+        return
+
+    if reverse:
+        unused_amount = unused_amounts([instance.pk]).get(instance.pk, 0)
+        Group.objects.filter(pk__in=pk_set).update(shop_count=F("shop_count") + 1, unused_amount=F("unused_amount") + unused_amount)
+    else:
+        update_counters(instance.pk, shop_count=len(pk_set), unused_amount=sum(unused_amounts(pk_set).values()))
+
+
+@receiver(coupon_states_changed)
+def count_unused_amounts(sender, old_states, new_states, **kwargs):
+    """
+    Applies the changes of the unused coupons to the groups their shops are in.
+    """
+    deltas = defaultdict(Decimal)
+
+    for old_state, new_state in zip(old_states, new_states):
+        if old_state is not None and not old_state.is_used:
+            deltas[old_state.store_id] -= Decimal(str(old_state.amount))
+        if new_state is not None and not new_state.is_used:
+            deltas[new_state.store_id] += Decimal(str(new_state.amount))
+
+    update_unused_amounts(deltas)
+
+
+def update_unused_amounts(deltas: dict):
+    """
+    Adds the changes of the unused amounts of the shops, given as `{shop_id: delta}`, to their groups.
+    """
+    deltas = {shop_id: delta for shop_id, delta in deltas.items() if delta}
+
+    if not deltas:
+        return
+
+    group_deltas = defaultdict(Decimal)
+
+    for group_id, shop_id in ShopGroup.objects.filter(shop__in=deltas).values_list("group", "shop"):
+        group_deltas[group_id] += deltas[shop_id]
+
+    for group_id, delta in group_deltas.items():
+        update_counters(group_id, unused_amount=delta)
+
+
+@receiver(pre_delete, sender=Shop)
+def count_deleted_shop(sender, instance, **kwargs):
+    """
+    Removes the deleted shop and its unused coupons from its groups with a single update, the amount
+    is summed by a subquery that does not depend on the group, so it is computed once.
+    """
+    unused_amount = sum_subquery(Coupon.objects.filter(store=instance.pk, is_used=False), "store", "amount")
+
+    Group.objects.filter(pk__in=ShopGroup.objects.filter(shop=instance).values("group")).update(
+        shop_count=decremented("shop_count"),
+        unused_amount=F("unused_amount") - unused_amount,
+    )
+
+
+@receiver(pre_delete, sender=get_user_model())
+def count_deleted_owner_coupons(sender, instance, **kwargs):
+    """
+    Removes the unused coupons of the deleted user from the groups of the shops of other users they are in.
+    The shops of the user are removed by `count_deleted_shop`.
+    """
+    rows = (
+        Coupon.objects.filter(owner=instance, is_used=False).exclude(store__owner=instance)
+        .order_by().values("store").annotate(total=Sum("amount"))
+    )
+    update_unused_amounts({row["store"]: -row["total"] for row in rows})
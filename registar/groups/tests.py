@@ -1,3 +1,333 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from core.models import Coupon, Shop
+from core.tests import TEST_CACHES, ViewQueriesTestCase
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Group, GroupMembership, Invitation, group_rollups
+
+
+class GroupViewQueriesTests(ViewQueriesTestCase):
+    """
+    Tests that the group views read the group once per request.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initgroups", "--nooutput")
+
+        cls.user = get_user_model().objects.create_user(username="owner", password="password")
+        cls.member = get_user_model().objects.create_user(username="member", password="password")
+        get_user_model().objects.create_user(username="invited", password="password")
+
+        cls.shop = Shop.objects.create(title="Shop", owner=cls.user)
+        cls.other_shop = Shop.objects.create(title="Other shop", owner=cls.user)
+        Coupon.objects.create(barcode="1", amount=Decimal("10.00"), store=cls.shop, owner=cls.user)
+
+        cls.group = Group.objects.create(title="Group", owner=cls.user)
+        cls.group.shops.add(cls.shop)
+        GroupMembership.objects.create(user=cls.member, group=cls.group)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def url(self, name: str) -> str:
+        return reverse(f"groups:{ name }", kwargs={"pk": self.group.pk})
+
+    def test_detail(self):
+        self.assertQueries("get", self.url("group_detail"), "groups_group", queries=9)
+
+        self.client.force_login(self.member)
+        self.assertQueries("get", self.url("group_detail"), "groups_group", queries=11)
+
+    def test_update(self):
+        self.assertQueries("get", self.url("group_update"), "groups_group", queries=5)
+        self.assertQueries("post", self.url("group_update"), "groups_group", queries=6, data={"title": "Updated"})
+
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.title, "Updated")
+
+    def test_delete(self):
+        self.assertQueries("get", self.url("group_delete"), "groups_group", queries=5)
+        self.assertQueries("post", self.url("group_delete"), "groups_group", queries=15)
+
+        self.assertFalse(Group.objects.filter(pk=self.group.pk).exists())
+
+    def test_pin(self):
+        self.assertQueries("post", self.url("group_pin"), "groups_group", queries=6)
+        self.assertQueries("post", self.url("group_unpin"), "groups_group", queries=6)
+
+    def test_leave(self):
+        self.client.force_login(self.member)
+        self.assertQueries("post", self.url("group_leave"), "groups_group", queries=10)
+
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.member_count, 0)
+
+    def test_invite(self):
+        self.assertQueries("get", self.url("group_invite"), "groups_group", queries=5)
+        self.assertQueries("post", self.url("group_invite"), "groups_group", queries=11, data={"username": "invited"})
+
+        self.assertTrue(Invitation.objects.filter(group=self.group, recipient__username="invited").exists())
+
+    def test_remove_member(self):
+        self.assertQueries("get", self.url("group_remove_member"), "groups_group", queries=6)
+        self.assertQueries("post", self.url("group_remove_member"), "groups_group", queries=12, data={"user": self.member.pk})
+
+        self.assertFalse(self.group.members.exists())
+
+    def test_shops(self):
+        self.assertQueries("get", self.url("group_add_shop"), "groups_group", queries=6)
+        self.assertQueries("post", self.url("group_add_shop"), "groups_group", queries=12, data={"shop": self.other_shop.pk})
+        self.assertQueries("get", self.url("group_remove_shop"), "groups_group", queries=6)
+        self.assertQueries("post", self.url("group_remove_shop"), "groups_group", queries=13, data={"shop": self.shop.pk})
+
+        self.assertQuerySetEqual(self.group.shops.all(), [self.other_shop])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class GroupCounterDeletionTests(TestCase):
+    """
+    Tests that deleting a shop or a user updates the group counters once, not once per deleted coupon.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initgroups", "--nooutput")
+
+        cls.owner = get_user_model().objects.create_user(username="owner", password="password")
+        cls.member = get_user_model().objects.create_user(username="member", password="password")
+
+        cls.shop = Shop.objects.create(title="Shop", owner=cls.owner)
+        cls.other_shop = Shop.objects.create(title="Other shop", owner=cls.member)
+
+        Coupon.objects.create(barcode="1", amount=Decimal("10.00"), store=cls.shop, owner=cls.member)
+        Coupon.objects.create(barcode="2", amount=Decimal("5.00"), store=cls.other_shop, owner=cls.owner)
+        Coupon.objects.create(barcode="3", amount=Decimal("2.50"), store=cls.other_shop, owner=cls.member)
+        Coupon.objects.create(barcode="4", amount=Decimal("1.00"), store=cls.other_shop, owner=cls.owner, is_used=True)
+
+        Coupon.objects.bulk_create(
+            Coupon(barcode=str(index), amount=Decimal("1.00"), store=cls.shop, owner=cls.owner)
+            for index in range(100, 300)
+        )
+
+        cls.group = Group.objects.create(title="Group", owner=cls.member)
+        cls.other_group = Group.objects.create(title="Other group", owner=cls.member)
+        cls.group.shops.add(cls.shop, cls.other_shop)
+        cls.other_group.shops.add(cls.shop)
+        Group.objects.reconcile()
+
+    def delete(self, obj, updates: int):
+        with CaptureQueriesContext(connection) as context:
+            obj.delete()
+
+        self.assertEqual(
+            len([query for query in context.captured_queries if query["sql"].startswith('UPDATE "groups_group"')]),
+            updates,
+        )
+        self.assertFalse(Group.objects.drifted().exists())
+
+    def test_delete_shop(self):
+        self.delete(self.shop, updates=1)
+
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.shop_count, 1)
+        self.assertEqual(self.group.unused_amount, Decimal("7.50"))
+
+    def test_delete_user(self):
+        self.delete(self.owner, updates=2)
+
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.shop_count, 1)
+        self.assertEqual(self.group.unused_amount, Decimal("2.50"))
+
+    def test_delete_coupon(self):
+        self.delete(Coupon.objects.get(barcode="2"), updates=1)
+
+    def test_save_deferred_coupon(self):
+        coupon = Coupon.objects.only("pk", "is_used").get(barcode="2")
+        coupon.is_used = True
+        coupon.save()
+
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.unused_amount, Decimal("212.50"))
+        self.assertFalse(Group.objects.drifted().exists())
+
+    def test_remove_shop(self):
+        self.group.shops.remove(self.shop)
+
+        self.assertFalse(Group.objects.drifted().exists())
+
+    def test_drifted_counters_clamped(self):
+        self.group.members.add(self.owner)
+        Group.objects.update(member_count=0, shop_count=0)
+
+        self.group.members.remove(self.owner)
+        self.group.shops.remove(self.other_shop)
+        self.shop.delete()
+
+        self.assertEqual(
+            list(Group.objects.order_by("title").values_list("member_count", "shop_count")),
+            [(0, 0), (0, 0)],
+        )
+        Group.objects.reconcile()
+        self.assertFalse(Group.objects.drifted().exists())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class GroupRollupsTests(TestCase):
+    """
+    Tests that the actual counter values are not multiplied by the members, shops and coupons of a group.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initgroups", "--nooutput")
+
+        User = get_user_model()
+        cls.owner = User.objects.create_user(username="owner", password="password")
+        members = [User.objects.create_user(username=f"member{ index }", password="password") for index in range(3)]
+
+        cls.group = Group.objects.create(title="Group", owner=cls.owner)
+        cls.other_group = Group.objects.create(title="Other group", owner=cls.owner)
+        cls.empty_group = Group.objects.create(title="Empty group", owner=cls.owner)
+
+        amounts = [
+            # Unused, used.
+            ([Decimal("10.00"), Decimal("2.50")], [Decimal("100.00")]),
+            ([Decimal("1.25")], []),
+            ([Decimal("3.00"), Decimal("4.00"), Decimal("5.00")], [Decimal("7.00"), Decimal("8.00")]),
+        ]
+        shops = []
+
+        for index, (unused, used) in enumerate(amounts):
+            shop = Shop.objects.create(title=f"Shop { index }", owner=cls.owner)
+            shops.append(shop)
+
+            for amount in unused:
+                Coupon.objects.create(barcode=f"{ shop.pk }{ amount }", amount=amount, store=shop, owner=cls.owner)
+            for amount in used:
+                Coupon.objects.create(barcode=f"{ shop.pk }{ amount }u", amount=amount, store=shop, owner=cls.owner, is_used=True)
+
+        cls.group.shops.add(*shops)
+        cls.group.members.add(*members)
+        cls.other_group.shops.add(shops[0])
+        cls.other_group.members.add(members[0])
+
+    def rollups(self, queryset) -> dict:
+        return {
+            group.title: (group.actual_member_count, group.actual_shop_count, group.actual_unused_amount)
+            for group in queryset.with_actual_rollups()
+        }
+
+    def test_rollups(self):
+        self.assertEqual(self.rollups(Group.objects.all()), {
+            "Group": (3, 3, Decimal("25.75")),
+            "Other group": (1, 1, Decimal("12.50")),
+            "Empty group": (0, 0, Decimal("0")),
+        })
+
+    def test_memberships(self):
+        memberships = GroupMembership.objects.filter(group=self.group).annotate(**group_rollups("group"))
+
+        self.assertEqual(
+            {(membership.member_count, membership.shop_count, membership.unused_amount) for membership in memberships},
+            {(3, 3, Decimal("25.75"))},
+        )
+
+    def test_reconcile(self):
+        Group.objects.update(member_count=9, shop_count=9, unused_amount=999)
+        self.assertEqual(Group.objects.drifted().count(), 3)
+
+        self.assertEqual(Group.objects.reconcile(), 3)
+
+        self.assertFalse(Group.objects.drifted().exists())
+        self.assertEqual(
+            list(Group.objects.order_by("title").values_list("title", "member_count", "shop_count", "unused_amount")),
+            [
+                ("Empty group", 0, 0, Decimal("0")),
+                ("Group", 3, 3, Decimal("25.75")),
+                ("Other group", 1, 1, Decimal("12.50")),
+            ],
+        )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class GroupVisibilityTests(TestCase):
+    """
+    Tests that the groups are visible to their owner and members, and to nobody else.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initgroups", "--nooutput")
+
+        User = get_user_model()
+        cls.owner = User.objects.create_user(username="owner", password="password")
+        cls.member = User.objects.create_user(username="member", password="password")
+        cls.former_member = User.objects.create_user(username="former", password="password")
+        cls.stranger = User.objects.create_user(username="stranger", password="password")
+
+        cls.group = Group.objects.create(title="Group", owner=cls.owner)
+        cls.group.members.add(cls.member, cls.former_member)
+        cls.group.members.remove(cls.former_member)
+
+        cls.other_group = Group.objects.create(title="Other group", owner=cls.member)
+        cls.other_group.members.add(cls.former_member)
+
+    def test_visible_to(self):
+        visible = {
+            self.owner: {self.group},
+            self.member: {self.group, self.other_group},
+            self.former_member: {self.other_group},
+            self.stranger: set(),
+        }
+
+        for user, expected in visible.items():
+            with self.subTest(user=user.username):
+                self.assertEqual(set(Group.objects.visible_to(user)), expected)
+                self.assertEqual({group for group in Group.objects.all() if group.is_visible_to(user)}, expected)
+
+
+class InvitationViewQueriesTests(ViewQueriesTestCase):
+    """
+    Tests that the invitation views read the invitation once per request.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initgroups", "--nooutput")
+
+        owner = get_user_model().objects.create_user(username="owner", password="password")
+        cls.user = get_user_model().objects.create_user(username="invited", password="password")
+
+        cls.group = Group.objects.create(title="Group", owner=owner)
+        cls.invitation = Invitation.objects.create(sender=owner, recipient=cls.user, group=cls.group)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def url(self, name: str) -> str:
+        return reverse(f"groups:{ name }", kwargs={"pk": self.invitation.pk})
+
+    def test_detail(self):
+        self.assertQueries("get", self.url("invitation_detail"), "groups_invitation", queries=5)
+
+    def test_accept(self):
+        self.assertQueries("get", self.url("invitation_accept"), "groups_invitation", queries=12)
+
+        self.assertTrue(self.group.members.filter(pk=self.user.pk).exists())
+
+    def test_reject(self):
+        self.assertQueries("get", self.url("invitation_reject"), "groups_invitation", queries=10)
+
+        self.invitation.refresh_from_db()
+        self.assertTrue(self.invitation.is_processed)
+        self.assertFalse(self.invitation.is_accepted)
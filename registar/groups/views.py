@@ -1,6 +1,7 @@
 import logging
 from typing import Any
 
+from core.mixins import CachedObjectMixin
 from core.models import Shop
 from django.contrib import messages
 from django.contrib.auth import get_user_model
@@ -9,8 +10,7 @@ from django.contrib.auth.mixins import (LoginRequiredMixin,
                                         PermissionRequiredMixin,
                                         UserPassesTestMixin)
 from django.contrib.messages.views import SuccessMessageMixin
-from django.db.models import Q, Count, Sum, Case, When, Value, IntegerField
-from django.db.models.functions import Coalesce
+from django.db.models import Q, Count, Sum
 from django.db.models.query import QuerySet
 from django.forms import BaseForm
 from django.http import HttpRequest, HttpResponse
@@ -53,17 +53,7 @@ class GroupsListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
     def get_queryset(self) -> QuerySet[Any]:
         queryset = super().get_queryset()
 
-        owned_groups = Group.objects.filter(owner=self.request.user).annotate(
-            member_count=Count('groupmembership__user_id', distinct=True),
-            shop_count=Count('shopgroup__id', distinct=True),
-            money_amount=Coalesce(Sum(
-                Case(
-                    When(shops__coupon__is_used=False, then='shops__coupon__amount'),
-                    default=Value(0),
-                    output_field=IntegerField()
-                )
-            ), 0)
-        ).order_by('-is_pinned', '-date_added')
+        owned_groups = Group.objects.filter(owner=self.request.user).order_by('-is_pinned', '-date_added')
 
         return owned_groups
 
@@ -73,16 +63,8 @@ class GroupsListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
 
         memberships = GroupMembership.objects.filter(
             user=self.request.user
-        ).annotate(
-            member_count=Count('group__groupmembership__user_id', distinct=True),
-            shop_count=Count('group__shopgroup__id', distinct=True),
-            money_amount=Coalesce(Sum(
-                Case(
-                    When(group__shops__coupon__is_used=False, then='group__shops__coupon__amount'),
-                    default=Value(0),
-                    output_field=IntegerField()
-                )
-            ), 0)
+        ).select_related(
+            'group__owner'
         ).order_by('-is_pinned', '-date_joined')
 
         context['memberships'] = memberships
@@ -90,11 +72,13 @@ class GroupsListView(LoginRequiredMixin, PermissionRequiredMixin, ListView):
         return context
 
 
-class GroupDetailView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, DetailView):
+class GroupDetailView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, CachedObjectMixin, DetailView):
     """
     A view that renders a list of coupons for a group.
     """
     model = Group
+    select_related = ("owner",)
+    prefetch_related = ("members",)
     context_object_name = "group"
     permission_required = "groups.view_group"
 
@@ -125,7 +109,7 @@ class GroupDetailView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTes
         ).order_by('-is_pinned', '-date_added')
         
         if self.request.user.pk != self.get_object().owner.pk:
-            context['membership'] = get_object_or_404(GroupMembership, user=self.request.user, group=self.get_object())
+            context['membership'] = get_object_or_404(self.get_object().groupmembership_set, user=self.request.user)
 
         return context
 
@@ -160,11 +144,12 @@ class GroupCreateView(LoginRequiredMixin, PermissionRequiredMixin, SuccessMessag
         return super().get(request, *args, **kwargs)
 
 
-class GroupUpdateView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, UpdateView):
+class GroupUpdateView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, CachedObjectMixin, UpdateView):
     """
     A view that updates a group.
     """
     model = Group
+    select_related = ("owner",)
     form_class = GroupForm
     success_message = _("Group updated successfully")
     permission_required = "groups.change_group"
@@ -197,11 +182,12 @@ class GroupUpdateView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTes
         return super().get(request, *args, **kwargs)
 
 
-class GroupDeleteView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, DeleteView):
+class GroupDeleteView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, CachedObjectMixin, DeleteView):
     """
     A view that deletes a group.
     """
     model = Group
+    select_related = ("owner",)
     success_message = _("Group deleted successfully")
     success_url = reverse_lazy('groups:group_list')
     permission_required = "groups.delete_group"
@@ -211,11 +197,11 @@ class GroupDeleteView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTes
         return group.owner.pk == self.request.user.pk
 
     def form_valid(self, form: BaseForm) -> HttpResponse:
-        logger.info("User %s (pk: %d) deleted the group %s (pk: %d)",
+        logger.info("User %s (pk: %d) deleted the group %s (pk: %s)",
                     self.request.user,
                     self.request.user.pk,
-                    form.instance.title,
-                    form.instance.pk
+                    self.get_object().title,
+                    self.get_object().pk
         )
         return super().form_valid(form)
 
@@ -229,10 +215,12 @@ class GroupDeleteView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTes
         return super().get(request, *args, **kwargs)
 
 
-class GroupLeaveView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, View):
+class GroupLeaveView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, CachedObjectMixin, View):
     """
     A view that allows a user to leave a group.
     """
+    model = Group
+    select_related = ("owner",)
     success_message = _("You have left the group %(group)s")
     permission_required = "groups.leave_group"
     success_url = reverse_lazy('groups:group_list')
@@ -256,19 +244,20 @@ class GroupLeaveView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTest
                     group.title,
                     group.pk
         )
+
+        self.invalidate_object()
         return redirect('groups:group_list')
 
     def get_success_message(self, cleaned_data = None):
         return self.success_message % {'group': self.get_object().title}
 
-    def get_object(self):
-        return get_object_or_404(Group, pk=self.kwargs['pk'])
 
-
-class GroupPinView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, View):
+class GroupPinView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, CachedObjectMixin, View):
     """
     A view that pins a group.
     """
+    model = Group
+    select_related = ("owner",)
     success_message = _("Group pinned successfully!")
     permission_required = "groups.change_group"
 
@@ -305,14 +294,13 @@ class GroupPinView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMi
 
         return redirect('groups:group_detail', pk=group.pk)
 
-    def get_object(self, queryset=None):
-        return Group.objects.get(pk=self.kwargs['pk'])
-
 
-class GroupUnpinView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, View):
+class GroupUnpinView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, CachedObjectMixin, View):
     """
     A view that unpins a group.
     """
+    model = Group
+    select_related = ("owner",)
     success_message = _("Group unpinned successfully!")
     permission_required = "groups.change_group"
 
@@ -348,14 +336,13 @@ class GroupUnpinView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTest
 
         return redirect('groups:group_detail', pk=group.pk)
 
-    def get_object(self, queryset=None):
-        return Group.objects.get(pk=self.kwargs['pk'])
-
 
-class GroupInviteView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, FormView):
+class GroupInviteView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, CachedObjectMixin, FormView):
     """
     A view that renders the group invitation page.
     """
+    model = Group
+    select_related = ("owner",)
     template_name = 'groups/invite.html'
     form_class = InvitationForm
     success_message = _("Invitation sent successfully")
@@ -364,11 +351,11 @@ class GroupInviteView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTes
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
         kwargs['user'] = self.request.user
-        kwargs['group'] = get_object_or_404(Group, pk=self.kwargs['pk'])
+        kwargs['group'] = self.get_object()
         return kwargs
 
     def test_func(self) -> bool:
-        group = get_object_or_404(Group, pk=self.kwargs['pk'])
+        group = self.get_object()
         return group.owner.pk == self.request.user.pk
 
     def get_success_url(self):
@@ -376,43 +363,39 @@ class GroupInviteView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTes
 
     def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
         context = super().get_context_data(**kwargs)
-        context['group'] = get_object_or_404(Group, pk=self.kwargs['pk'])
+        context['group'] = self.get_object()
         return context
 
     def form_valid(self, form):
-        try:
-            user = get_user_model().objects.get(username=form.cleaned_data['username'])
-            group = Group.objects.get(pk=self.kwargs['pk'])
-     
-            Invitation.objects.create(sender=self.request.user, recipient=user, group=group)
-
-            logger.info("User %s (pk: %d) invited user %s (pk: %d) to the group %s (pk: %d)",
-                        self.request.user,
-                        self.request.user.pk,
-                        user,
-                        user.pk,
-                        group.title,
-                        group.pk
-            )
+        user = get_user_model().objects.get(username=form.cleaned_data['username'])
+        group = self.get_object()
 
-        except Group.DoesNotExist:
-            return HttpResponse(status=404)
-        
+        Invitation.objects.create(sender=self.request.user, recipient=user, group=group)
 
+        logger.info("User %s (pk: %d) invited user %s (pk: %d) to the group %s (pk: %d)",
+                    self.request.user,
+                    self.request.user.pk,
+                    user,
+                    user.pk,
+                    group.title,
+                    group.pk
+        )
         return super().form_valid(form)
 
 
-class GroupRemoveMemberView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, FormView):
+class GroupRemoveMemberView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, CachedObjectMixin, FormView):
     """
     A view that removes a member from a group.
     """
+    model = Group
+    select_related = ("owner",)
     template_name = 'groups/remove_member.html'
     form_class = RemoveMemberForm
     success_message = _("Member removed successfully")
     permission_required = "groups.remove_user_group"
 
     def test_func(self) -> bool:
-        group = get_object_or_404(Group, pk=self.kwargs['pk'])
+        group = self.get_object()
         return group.owner.pk == self.request.user.pk
 
     def get_success_url(self):
@@ -420,21 +403,21 @@ class GroupRemoveMemberView(LoginRequiredMixin, PermissionRequiredMixin, UserPas
     
     def get_form(self, form_class=None):
         form = super().get_form()
-        form.fields['user'].queryset = get_object_or_404(Group, pk=self.kwargs['pk']).members.all()
+        form.fields['user'].queryset = self.get_object().members.all()
         return form
     
     def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
         context = super().get_context_data(**kwargs)
-        context['group'] = get_object_or_404(Group, pk=self.kwargs['pk'])
+        context['group'] = self.get_object()
         return context
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
-        kwargs['group'] = get_object_or_404(Group, pk=self.kwargs['pk'])
+        kwargs['group'] = self.get_object()
         return kwargs
 
     def form_valid(self, form: BaseForm):
-        group = get_object_or_404(Group, pk=self.kwargs['pk'])
+        group = self.get_object()
         user = form.cleaned_data['user']
         group.members.remove(user)
 
@@ -454,25 +437,28 @@ class GroupRemoveMemberView(LoginRequiredMixin, PermissionRequiredMixin, UserPas
         except Invitation.DoesNotExist:
             pass
 
+        self.invalidate_object()
         return super().form_valid(form)
 
 
-class GroupAddShopView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, FormView):
+class GroupAddShopView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, CachedObjectMixin, FormView):
     """
     A view that adds a shop to a group.
     """
+    model = Group
+    select_related = ("owner",)
     template_name = 'groups/add_shop.html'
     form_class = AddShopForm
     success_message = _("Shop added successfully")
     permission_required = "groups.add_shop_group"
 
     def test_func(self) -> bool:
-        group = get_object_or_404(Group, pk=self.kwargs['pk'])
+        group = self.get_object()
         return group.owner.pk == self.request.user.pk
 
     def get_form(self, form_class=None):
         form = super().get_form(form_class)
-        form.fields['shop'].queryset = Shop.objects.filter(owner=self.request.user).exclude(pk__in=get_object_or_404(Group, pk=self.kwargs['pk']).shops.all())
+        form.fields['shop'].queryset = Shop.objects.filter(owner=self.request.user).exclude(pk__in=self.get_object().shops.all())
         return form
 
     def get_success_url(self):
@@ -480,17 +466,17 @@ class GroupAddShopView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTe
 
     def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
         context = super().get_context_data(**kwargs)
-        context['group'] = get_object_or_404(Group, pk=self.kwargs['pk'])
+        context['group'] = self.get_object()
         return context
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
         kwargs['user'] = self.request.user
-        kwargs['group'] = get_object_or_404(Group, pk=self.kwargs['pk'])
+        kwargs['group'] = self.get_object()
         return kwargs
 
     def form_valid(self, form):
-        group = get_object_or_404(Group, pk=self.kwargs['pk'])
+        group = self.get_object()
         shop = form.cleaned_data['shop']
         is_pinned = form.cleaned_data['is_pinned']
         group.shops.add(shop, through_defaults={'is_pinned': is_pinned})
@@ -503,25 +489,29 @@ class GroupAddShopView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTe
                     group.title,
                     group.pk
         )
+
+        self.invalidate_object()
         return super().form_valid(form)
 
 
-class GroupRemoveShopView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, FormView):
+class GroupRemoveShopView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, CachedObjectMixin, FormView):
     """
     A view that removes a shop from a group.
     """
+    model = Group
+    select_related = ("owner",)
     template_name = 'groups/remove_shop.html'
     form_class = RemoveShopForm
     success_message = _("Shop removed successfully")
     permission_required = "groups.remove_shop_group"
 
     def test_func(self) -> bool:
-        group = get_object_or_404(Group, pk=self.kwargs['pk'])
+        group = self.get_object()
         return group.owner.pk == self.request.user.pk
 
     def get_form(self, form_class=None):
         form = super().get_form(form_class)
-        form.fields['shop'].queryset = get_object_or_404(Group, pk=self.kwargs['pk']).shops.all()
+        form.fields['shop'].queryset = self.get_object().shops.all()
         return form
 
     def get_success_url(self):
@@ -529,17 +519,17 @@ class GroupRemoveShopView(LoginRequiredMixin, PermissionRequiredMixin, UserPasse
 
     def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
         context = super().get_context_data(**kwargs)
-        context['group'] = get_object_or_404(Group, pk=self.kwargs['pk'])
+        context['group'] = self.get_object()
         return context
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
         kwargs['user'] = self.request.user
-        kwargs['group'] = get_object_or_404(Group, pk=self.kwargs['pk'])
+        kwargs['group'] = self.get_object()
         return kwargs
 
     def form_valid(self, form):
-        group = get_object_or_404(Group, pk=self.kwargs['pk'])
+        group = self.get_object()
         shop = form.cleaned_data['shop']
         group.shops.remove(shop)
         
@@ -551,6 +541,8 @@ class GroupRemoveShopView(LoginRequiredMixin, PermissionRequiredMixin, UserPasse
                     group.title,
                     group.pk
         )
+
+        self.invalidate_object()
         return super().form_valid(form)
 
 
@@ -573,11 +565,12 @@ class InvitationsListView(LoginRequiredMixin, PermissionRequiredMixin, ListView)
         return context
    
 
-class InvitationDetailView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, DetailView):
+class InvitationDetailView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, CachedObjectMixin, DetailView):
     """
     A view that renders the invitation detail page.
     """
     model = Invitation
+    select_related = ("recipient", "sender", "group")
     context_object_name = "invitation"
     permission_required = "groups.view_invitation"
 
@@ -586,21 +579,23 @@ class InvitationDetailView(LoginRequiredMixin, PermissionRequiredMixin, UserPass
         return invitation.recipient.pk == self.request.user.pk and not invitation.is_processed
 
 
-class InvitationAcceptView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, View):
+class InvitationAcceptView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, CachedObjectMixin, View):
     """
     A view that accepts an invitation.
     """
+    model = Invitation
+    select_related = ("recipient", "group")
     permission_required = "groups.accept_invitation"
 
     def test_func(self) -> bool:
-        invitation = get_object_or_404(Invitation, pk=self.kwargs['pk'])
+        invitation = self.get_object()
         return invitation.recipient.pk == self.request.user.pk and not invitation.is_processed
 
     def get_success_url(self):
         return reverse_lazy('groups:invitation_list')
 
     def get(self, request, *args, **kwargs):
-        invitation = get_object_or_404(Invitation, pk=kwargs['pk'])
+        invitation = self.get_object()
         group = invitation.group
 
         if not group.access_password:
@@ -619,7 +614,7 @@ class InvitationAcceptView(LoginRequiredMixin, PermissionRequiredMixin, UserPass
             return render(request, 'groups/accept.html', {'form': InvitationAcceptForm(), 'invitation': invitation})
 
     def post(self, request, *args, **kwargs):
-        invitation = get_object_or_404(Invitation, pk=kwargs['pk'])
+        invitation = self.get_object()
         group = invitation.group
         form = InvitationAcceptForm(request.POST)
 
@@ -641,19 +636,21 @@ class InvitationAcceptView(LoginRequiredMixin, PermissionRequiredMixin, UserPass
         return render(request, 'groups/accept.html', {'form': form, 'invitation': invitation})
 
 
-class InvitationDeclineView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, View):
+class InvitationDeclineView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, SuccessMessageMixin, CachedObjectMixin, View):
     """
     A view that declines an invitation.
     """
+    model = Invitation
+    select_related = ("recipient", "group")
     success_message = _("Invitation declined successfully")
     permission_required = "groups.reject_invitation"
 
     def test_func(self) -> bool:
-        invitation = get_object_or_404(Invitation, pk=self.kwargs['pk'])
+        invitation = self.get_object()
         return invitation.recipient.pk == self.request.user.pk and not invitation.is_processed
     
     def get(self, request, *args, **kwargs):
-        invitation = get_object_or_404(Invitation, pk=kwargs['pk'])
+        invitation = self.get_object()
         invitation.reject()
         messages.add_message(request, messages.WARNING, _("Invitation was declined"))
         
@@ -1,3 +1,80 @@
-from django.test import TestCase
+from core.models import Shop
+from core.tests import ViewQueriesTestCase
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group as Role
+from django.core.management import call_command
+from django.urls import reverse
 
-# Create your tests here.
+import registar.settings as settings
+
+
+class ShopViewQueriesTests(ViewQueriesTestCase):
+    """
+    Tests that the marketplace views read the shop once per request.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initgroups", "--nooutput")
+
+        owner = get_user_model().objects.create_user(username="owner", password="password")
+        cls.user = get_user_model().objects.create_superuser(username="user", password="password")
+
+        cls.shop = Shop.objects.create(title="Shop", owner=owner, is_on_marketplace=True)
+        cls.private_shop = Shop.objects.create(title="Private shop", owner=owner)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def test_detail(self):
+        self.assertQueries("get", reverse("marketplace:shop_detail", kwargs={"pk": self.shop.pk}), "core_shop", queries=3)
+
+    def test_use(self):
+        self.assertQueries("post", reverse("marketplace:shop_use", kwargs={"pk": self.shop.pk}), "core_shop", queries=4)
+
+        self.assertTrue(Shop.objects.filter(owner=self.user, title="Shop").exists())
+
+    def test_use_private_shop(self):
+        response = self.client.post(reverse("marketplace:shop_use", kwargs={"pk": self.private_shop.pk}))
+        self.assertEqual(response.status_code, 404)
+
+
+class ShopViewPermissionsTests(ViewQueriesTestCase):
+    """
+    Tests that the marketplace views are allowed by the permissions `initgroups` grants the regular users.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initgroups", "--nooutput")
+
+        owner = get_user_model().objects.create_user(username="owner", password="password")
+        cls.regular_user = get_user_model().objects.create_user(username="regular", password="password")
+        cls.user_without_role = get_user_model().objects.create_user(username="norole", password="password")
+
+        # New users are added to the role, see accounts.signals.
+        Role.objects.get(name=settings.REGULAR_USER_ROLE).user_set.remove(cls.user_without_role)
+
+        cls.shop = Shop.objects.create(title="Shop", owner=owner, is_on_marketplace=True)
+
+    def test_detail(self):
+        url = reverse("marketplace:shop_detail", kwargs={"pk": self.shop.pk})
+
+        self.client.force_login(self.regular_user)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.client.force_login(self.user_without_role)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_use(self):
+        url = reverse("marketplace:shop_use", kwargs={"pk": self.shop.pk})
+
+        self.client.force_login(self.user_without_role)
+        self.assertEqual(self.client.post(url).status_code, 403)
+        self.assertFalse(Shop.objects.filter(owner=self.user_without_role).exists())
+
+        self.client.force_login(self.regular_user)
+        response = self.client.post(url)
+        new_shop = Shop.objects.get(owner=self.regular_user)
+        self.assertRedirects(response, reverse("core:shop_detail", kwargs={"pk": new_shop.pk}))
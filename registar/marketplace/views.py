@@ -1,12 +1,13 @@
 import logging
 
+from core.mixins import CachedObjectMixin
 from core.models import Shop
 from django.contrib import messages
 from django.contrib.auth.mixins import (LoginRequiredMixin,
                                         PermissionRequiredMixin,
                                         UserPassesTestMixin)
 from django.contrib.messages.views import SuccessMessageMixin
-from django.shortcuts import get_object_or_404, redirect
+from django.shortcuts import redirect
 from django.utils.translation import gettext_lazy as _
 from django.views.generic import DetailView, ListView, View
 
@@ -28,24 +29,26 @@ class ShopListView(ListView):
         return Shop.objects.filter(is_on_marketplace=True)
 
 
-class ShopDetailView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, DetailView):
+class ShopDetailView(LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin, CachedObjectMixin, DetailView):
     """
     A view that renders the detail page of a shop.
     """
     model = Shop
+    select_related = ("owner",)
     template_name = "marketplace/shop_detail.html"
     context_object_name = "shop"
-    permission_required = "marketplace.view_shop"
+    permission_required = "marketplace.view_shop_marketplace"
 
     def test_func(self):
         return self.get_object().is_on_marketplace
 
 
-class ShopUseView(LoginRequiredMixin, PermissionRequiredMixin, SuccessMessageMixin, UserPassesTestMixin, View):
+class ShopUseView(LoginRequiredMixin, PermissionRequiredMixin, SuccessMessageMixin, UserPassesTestMixin, CachedObjectMixin, View):
     """
     A view that adds a shop to the user's account.
     """
-    permission_required = "groups.use_shop_from_marketplace"
+    model = Shop
+    permission_required = "marketplace.use_shop_from_marketplace"
     success_message = _("Shop '%(title)s' has been added to your account.")
 
     def test_func(self):
@@ -72,5 +75,5 @@ class ShopUseView(LoginRequiredMixin, PermissionRequiredMixin, SuccessMessageMix
     def get_success_message(self, cleaned_data=None) -> str:
         return self.success_message % {"title": self.get_object().title}
 
-    def get_object(self, queryset=None):
-        return get_object_or_404(Shop, pk=self.kwargs['pk'], is_on_marketplace=True)
+    def get_queryset(self):
+        return super().get_queryset().filter(is_on_marketplace=True)
@@ -0,0 +1,83 @@
+import math
+import os
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+
+# Set for servers with several worker processes, every process writes its values to files in the directory.
+# The directory has to be emptied before the server starts.
+MULTIPROCESS_DIR = "PROMETHEUS_MULTIPROC_DIR"
+UNRESOLVED = "<unresolved>"
+
+REQUEST_SECONDS = Histogram(
+    "registar_request_duration_seconds",
+    "Time spent handling requests, per view.",
+    ["view", "method", "status"],
+)
+REQUEST_QUERIES = Histogram(
+    "registar_request_queries",
+    "Database queries run per request, per view.",
+    ["view"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+
+BARCODE_SECONDS = Histogram(
+    "registar_barcode_decode_seconds",
+    "Time spent decoding barcodes that were not cached, per result.",
+    ["result"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+BARCODE_FAILURES = Counter(
+    "registar_barcode_failures",
+    "Images no barcode could be read from, per cause, including the cached results.",
+    ["cause"],
+)
+BARCODE_CACHE = Counter("registar_barcode_cache_lookups", "Barcode cache lookups, per result.", ["result"])
+
+EXCHANGE_RATE_FETCH_SECONDS = Histogram(
+    "registar_exchange_rate_fetch_duration_seconds",
+    "Time spent fetching the exchange rates from the provider, per result.",
+    ["result"],
+)
+EXCHANGE_RATE_CACHE = Counter("registar_exchange_rate_cache_lookups", "Exchange rate cache lookups, per result.", ["result"])
+
+SERIALIZER_SECONDS = Histogram(
+    "registar_api_serializer_duration_seconds",
+    "Time spent serializing the API responses, per view.",
+    ["view"],
+)
+
+
+class ExchangeRateCollector:
+    """
+    Reports the age of the exchange rates when the metrics are scraped.
+    """
+    name = "registar_exchange_rate_age_seconds"
+    documentation = "Age of the local exchange rates, NaN if no rates were fetched yet."
+
+    def describe(self):
+        yield GaugeMetricFamily(self.name, self.documentation)
+
+    def collect(self):
+        from exchange.services import get_rates_age
+
+        age = get_rates_age()
+
+        yield GaugeMetricFamily(self.name, self.documentation, value=math.nan if age is None else age)
+
+
+REGISTRY.register(ExchangeRateCollector())
+
+
+def get_registry() -> CollectorRegistry:
+    """
+    Returns the registry to scrape, merging the values of all worker processes in multi-process mode.
+    """
+    if MULTIPROCESS_DIR not in os.environ:
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(ExchangeRateCollector())
+
+    return registry
@@ -0,0 +1,38 @@
+import time
+
+from django.db import connection
+
+from .collectors import REQUEST_QUERIES, REQUEST_SECONDS, UNRESOLVED
+
+
+class QueryCounter:
+    def __init__(self):
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """
+    Records the duration and the number of queries of every request, labelled with the name of the view.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        start = time.perf_counter()
+
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        view = match.view_name if match is not None else UNRESOLVED
+
+        REQUEST_SECONDS.labels(view, request.method, f"{ response.status_code // 100 }xx").observe(time.perf_counter() - start)
+        REQUEST_QUERIES.labels(view).observe(counter.queries)
+
+        return response
@@ -0,0 +1,90 @@
+from unittest import mock
+
+from core.barcode import barcode_cache_key, decode_with_cache
+from core.tests import TEST_CACHES
+from core.utils import NoBarcodeDetected
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone, translation
+from exchange.services import RATES_CACHE_KEY, RateTable, load_rates
+from prometheus_client import REGISTRY
+
+import registar.settings as settings
+
+
+@override_settings(CACHES=TEST_CACHES)
+class MetricsTests(TestCase):
+    """
+    Tests of the metrics endpoint and the recorded metrics.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("initgroups", "--nooutput")
+
+        cls.user = get_user_model().objects.create_user(username="user", password="password")
+
+    def sample(self, name: str, **labels) -> float:
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_requests(self):
+        labels = {"view": "core:shop_list", "method": "GET", "status": "2xx"}
+        requests = self.sample("registar_request_duration_seconds_count", **labels)
+        queries = self.sample("registar_request_queries_sum", view="core:shop_list")
+
+        self.client.force_login(self.user)
+
+        with translation.override("en"):
+            self.client.get(reverse("core:shop_list"))
+
+        self.assertEqual(self.sample("registar_request_duration_seconds_count", **labels), requests + 1)
+        self.assertGreater(self.sample("registar_request_queries_sum", view="core:shop_list"), queries)
+
+        with mock.patch.object(settings, "METRICS_TOKEN", None), mock.patch.object(settings, "DEBUG", True):
+            response = self.client.get(reverse("metrics"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'registar_request_duration_seconds_count{method="GET",status="2xx",view="core:shop_list"}', response.content)
+        self.assertRegex(response.content.decode(), r"\nregistar_exchange_rate_age_seconds (NaN|[\d.]+)\n")
+
+    def test_rates_age_not_counted_as_cache_hit(self):
+        caches["default"].set(RATES_CACHE_KEY, RateTable({}, timezone.now()), None)
+        hits = self.sample("registar_exchange_rate_cache_lookups_total", result="hit")
+        misses = self.sample("registar_exchange_rate_cache_lookups_total", result="miss")
+
+        with mock.patch.object(settings, "METRICS_TOKEN", None), mock.patch.object(settings, "DEBUG", True):
+            self.assertEqual(self.client.get(reverse("metrics")).status_code, 200)
+
+        self.assertEqual(self.sample("registar_exchange_rate_cache_lookups_total", result="hit"), hits)
+        self.assertEqual(self.sample("registar_exchange_rate_cache_lookups_total", result="miss"), misses)
+
+        load_rates()
+        self.assertEqual(self.sample("registar_exchange_rate_cache_lookups_total", result="hit"), hits + 1)
+
+    def test_closed_without_token(self):
+        with mock.patch.object(settings, "METRICS_TOKEN", None):
+            self.assertEqual(self.client.get(reverse("metrics")).status_code, 404)
+
+            with mock.patch.object(settings, "DEBUG", True):
+                self.assertEqual(self.client.get(reverse("metrics")).status_code, 200)
+
+    def test_token(self):
+        with mock.patch.object(settings, "METRICS_TOKEN", "secret"), mock.patch.object(settings, "DEBUG", True):
+            self.assertEqual(self.client.get(reverse("metrics")).status_code, 401)
+            self.assertEqual(self.client.get(reverse("metrics"), headers={"Authorization": "Bearer other"}).status_code, 401)
+            self.assertEqual(self.client.get(reverse("metrics"), headers={"Authorization": "Bearer secret"}).status_code, 200)
+
+    def test_cached_barcode_failure(self):
+        image = b"image"
+        caches[settings.BARCODE_CACHE].set(barcode_cache_key(image), (NoBarcodeDetected.__name__, "No barcode"))
+        failures = self.sample("registar_barcode_failures_total", cause="NoBarcodeDetected")
+        hits = self.sample("registar_barcode_cache_lookups_total", result="hit")
+
+        with self.assertRaises(NoBarcodeDetected):
+            decode_with_cache(image)
+
+        self.assertEqual(self.sample("registar_barcode_failures_total", cause="NoBarcodeDetected"), failures + 1)
+        self.assertEqual(self.sample("registar_barcode_cache_lookups_total", result="hit"), hits + 1)
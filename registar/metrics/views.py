@@ -0,0 +1,31 @@
+import logging
+
+from django.http import Http404, HttpRequest, HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views import View
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+import registar.settings as settings
+
+from .collectors import get_registry
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsView(View):
+    """
+    Metrics in the Prometheus text format. Requires the `METRICS_TOKEN` as a bearer token. Without a token
+    the endpoint is only served with `DEBUG`, otherwise it does not exist.
+    """
+
+    def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        if not settings.METRICS_TOKEN:
+            if not settings.DEBUG:
+                raise Http404()
+        elif not constant_time_compare(
+            request.headers.get("Authorization", ""), f"Bearer { settings.METRICS_TOKEN }"
+        ):
+            logger.warning("Metrics requested without a valid token from %s", request.META.get("REMOTE_ADDR"))
+            return HttpResponse(status=401)
+
+        return HttpResponse(generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST)
@@ -47,11 +47,16 @@ INSTALLED_APPS = [
     'rest_framework',
     'api.apps.ApiConfig',
     'marketplace.apps.MarketplaceConfig',
+    'exchange.apps.ExchangeConfig',
+    'benchmarks.apps.BenchmarksConfig',
+    'metrics.apps.MetricsConfig',
     'django.contrib.admin',
     'django.contrib.auth',
 ]
 
 MIDDLEWARE = [
+    'metrics.middleware.MetricsMiddleware',
+    'benchmarks.profiler.ProfilerMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
@@ -78,6 +83,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'exchange.context_processors.currency',
             ],
         },
     },
@@ -97,6 +103,28 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+# File based caches are shared by all gunicorn workers of the container.
+CACHES = {
+    # Holds the exchange rates, which the workers share with the process running `refreshrates --loop`,
+    # see exchange.services.
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / "persistance" / "cache" / "default",
+    },
+    'barcodes': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / "persistance" / "cache" / "barcodes",
+        'TIMEOUT': 60 * 60 * 24,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -180,8 +208,18 @@ ROLES_PERMISSIONS = {
 # REST framework
 
 REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 10
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetPagination',
+    'PAGE_SIZE': 10,
+    # orjson is used if it is installed, the JSON module of the standard library otherwise.
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 # Logging
@@ -214,6 +252,10 @@ LOGGING = {
             "format": "[{levelname} {asctime} {name}] {filename} {message}",
             "style": "{",
         },
+        "profile": {
+            "format": "{message}",
+            "style": "{",
+        },
     },
 
     "handlers": {
@@ -250,6 +292,15 @@ LOGGING = {
             "filters": ["only_info", "disable_autoreload"],
             "formatter": "audit",
         },
+        "profile_log": {
+            "level": "INFO",
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": BASE_DIR / "logs" / "profile.log",
+            "maxBytes": 1024 * 1024 * 10,
+            "backupCount": 5,
+            "encoding": "utf-8",
+            "formatter": "profile",
+        },
     },
 
     "loggers": {
@@ -258,6 +309,11 @@ LOGGING = {
             "handlers": ["audit_log", "error_log", "console", "warning_log"],
             "propagate": True,
         },
+        "benchmarks.profiler": {
+            "level": "INFO",
+            "handlers": ["profile_log"],
+            "propagate": False,
+        },
     },
 }
 
@@ -267,5 +323,82 @@ PAGINATE_BY = 6
 MAX_SHOPS_IN_INDEX = 6
 MAX_COUPONS_IN_INDEX = 6
 
+# Barcode decoding
+
+BARCODE_WORKERS = int(os.getenv("BARCODE_WORKERS", 2))
+BARCODE_QUEUE_DEPTH = int(os.getenv("BARCODE_QUEUE_DEPTH", 8))
+BARCODE_TIMEOUT = float(os.getenv("BARCODE_TIMEOUT", 5))
+BARCODE_CACHE = "barcodes"
+
+# Coupon image uploads
+
+FILE_UPLOAD_HANDLERS = [
+    "core.uploadhandlers.CouponImageUploadHandler",
+    "django.core.files.uploadhandler.MemoryFileUploadHandler",
+    "django.core.files.uploadhandler.TemporaryFileUploadHandler",
+]
+
+COUPON_IMAGE_MAX_SIZE = 1024 * 1024 * 15
+COUPON_IMAGE_MAX_MEMORY_SIZE = 1024 * 1024 * 2
+
+# Coupon import
+
+# The web import decodes in the shared barcode worker pool and stops after COUPON_IMPORT_TIME_LIMIT seconds,
+# below the 30 seconds gunicorn waits for a request. The images not decoded by then are reported to be
+# uploaded again, larger imports run with the importcoupons command. The images are read as many at a time
+# as BARCODE_QUEUE_DEPTH, the coupons are inserted COUPON_IMPORT_BATCH_SIZE at a time.
+COUPON_IMPORT_BATCH_SIZE = 200
+COUPON_IMPORT_MAX_FILES = 1000
+COUPON_IMPORT_TIME_LIMIT = 20
+
+# Django rejects a request with more files before the form sees it, the import form also takes a ZIP archive.
+DATA_UPLOAD_MAX_NUMBER_FILES = COUPON_IMPORT_MAX_FILES + 1
+
+# Exchange rates
+
+EXCHANGE_RATE_PROVIDER = os.getenv("EXCHANGE_RATE_PROVIDER", "exchange.providers.FrankfurterProvider")
+EXCHANGE_RATE_BASE_CURRENCY = "EUR"
+EXCHANGE_RATE_REFRESH_INTERVAL = 60 * 60
+EXCHANGE_RATE_RETRY_INTERVAL = 60
+EXCHANGE_RATE_TIMEOUT = 5
+
+# Currencies the users can pick to see the amounts in
+EXCHANGE_RATE_CURRENCIES = ["EUR", "USD", "GBP", "CHF", "CZK", "PLN"]
+EXCHANGE_RATE_DEFAULT_CURRENCY = "USD"
+
+# Starts a thread that refreshes the rates before they get stale, in the process that serves the requests.
+# Meant for a single server process like `runserver`, with several workers every worker starts one, run
+# `refreshrates --loop` in its own process instead.
+EXCHANGE_RATE_SCHEDULER = os.getenv("EXCHANGE_RATE_SCHEDULER") == 'True'
+EXCHANGE_RATE_CHECK_INTERVAL = 60
+
+# Used by exchange.providers.StaticProvider
+EXCHANGE_RATE_STATIC_RATES = {
+    "USD": "1.08",
+}
+
+# Request profiling
+
+# Share of the requests measured by benchmarks.profiler.ProfilerMiddleware, 0 turns it off
+PROFILER_SAMPLE_RATE = float(os.getenv("PROFILER_SAMPLE_RATE", 0))
+# Seconds between writes of the samples of a worker to the profile log
+PROFILER_FLUSH_INTERVAL = 60
+# Call sites of duplicate queries kept per view and flush
+PROFILER_MAX_SITES = 10
+
+# Metrics
+
+# Bearer token required to scrape /metrics. Without it the endpoint answers 404, unless DEBUG is set.
+# Servers with several worker processes also set PROMETHEUS_MULTIPROC_DIR, see metrics.collectors.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# API sync
+
+# Seconds the watermark of a sync token lies before the start of the sync, so the changes of transactions
+# that were still running are sent again instead of missed
+SYNC_WATERMARK_LAG = 5
+# Days the deletions are logged for the sync, clients with older tokens download everything again
+SYNC_DELETION_LOG_DAYS = 30
+
     
 from persistance.local import *
@@ -20,6 +20,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 
 from django.conf.urls.i18n import i18n_patterns
+from metrics.views import MetricsView
 
 urlpatterns = i18n_patterns(
     path('admin/', admin.site.urls),
@@ -31,3 +32,6 @@ urlpatterns = i18n_patterns(
     path("i18n/", include("django.conf.urls.i18n")),
 )
 
+urlpatterns += [
+    path("metrics", MetricsView.as_view(), name="metrics"),
+]